@@ -0,0 +1,191 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # Offscreen drawing only
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import sys
+import json
+import time
+import timeit
+import fnmatch
+import argparse
+import platform
+import subprocess
+
+import pygame
+
+from panel_batch import PanelBatch
+from protection import SAMPLE_RATE, P127Relay, waveforms
+from panel_state import INITIAL_BITS, fields_mask
+from scheduler import EventScheduler
+from scenario import feed
+from frame_export import DEMO_SCENARIO
+from simulation import SCREEN_WIDTH, SCREEN_HEIGHT, SwitchgearPanel, SchematicRenderer, draw_schematic
+
+DC_LOST_BITS = INITIAL_BITS ^ fields_mask(('dc_ok',)) # Derived fields stale until updated
+SCENARIO_EVENTS = [(when, action, tuple(args)) for when, action, *args in DEMO_SCENARIO]
+
+# --- Benchmarks ---
+# name -> setup() returning (callable, operations per call, unit)
+BENCHMARKS = {}
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+@benchmark('logic.check_closing_interlocks')
+def _interlocks():
+    return SwitchgearPanel().check_closing_interlocks, 1, 'calls'
+
+@benchmark('logic.update_dependent_states')
+def _update():
+    panel = SwitchgearPanel()
+    states = [INITIAL_BITS, DC_LOST_BITS]
+    def call():
+        # DC alternately healthy and lost, so the incremental update has work to do
+        panel.restore(states[panel.state.bits == INITIAL_BITS])
+        panel._update_dependent_states()
+    return call, 1, 'calls'
+
+@benchmark('logic.close_trip_cycle')
+def _cycle():
+    scheduler = EventScheduler()
+    panel = SwitchgearPanel(scheduler)
+    def call():
+        panel.toggle_k1() # K1 on -> close
+        scheduler.run()
+        panel.initiate_direct_trip('trip_signal_k2', 'K2')
+        scheduler.run()
+        panel.toggle_k1() # K1 off
+    return call, 1, 'cycles'
+
+@benchmark('logic.reset_simulation')
+def _reset():
+    panel = SwitchgearPanel()
+    def call():
+        panel.restore(DC_LOST_BITS)
+        panel.reset_simulation()
+    return call, 1, 'resets'
+
+@benchmark('render.draw_schematic')
+def _draw():
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    snapshot = SwitchgearPanel().evaluate()
+    return lambda: draw_schematic(surface, snapshot), 1, 'frames'
+
+@benchmark('render.retained_frame')
+def _retained():
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    panel = SwitchgearPanel()
+    renderer = SchematicRenderer(surface)
+    def call():
+        panel.toggle_tc_healthy() # One section changes per frame
+        renderer.render(panel.evaluate())
+    return call, 1, 'frames'
+
+def _scenario(n):
+    def setup():
+        def call():
+            scheduler = EventScheduler()
+            for i in range(n):
+                feed(scheduler, SwitchgearPanel(scheduler, i), SCENARIO_EVENTS)
+            scheduler.run()
+        return call, n * len(SCENARIO_EVENTS), 'events'
+    return setup
+
+for _n in (1, 100, 10000):
+    benchmark(f'scenario.panels_{_n}')(_scenario(_n))
+
+@benchmark('scenario.batch_10000')
+def _batch():
+    batch = PanelBatch(10000)
+    def call():
+        batch.toggle_k1()
+        batch.finish_close()
+        batch.initiate_direct_trip('trip_signal_k2')
+        batch.finish_direct_trip('trip_signal_k2')
+        batch.toggle_k1()
+    return call, 10000, 'panel cycles'
+
+@benchmark('protection.p127_feed')
+def _p127():
+    relay = P127Relay()
+    currents, voltages = next(waveforms(10.0, block=10.0))
+    return lambda: relay.feed(currents, voltages), 10 * SAMPLE_RATE, 'samples'
+
+# Fresh interpreter per call (interpreter start-up included): the logic alone,
+# the renderer module, and the renderer with pygame / fonts initialized,
+# which is what importing simulation used to cost.
+STARTUP = {
+    'startup.import_panel_logic': 'import panel_logic',
+    'startup.import_simulation': 'import simulation',
+    'startup.init_renderer': 'import simulation; simulation.init_pygame()',
+}
+
+def _startup(code):
+    def setup():
+        command = [sys.executable, '-c', code]
+        here = os.path.dirname(os.path.abspath(__file__))
+        return lambda: subprocess.run(command, cwd=here, check=True), 1, 'starts'
+    return setup
+
+for _name, _code in STARTUP.items():
+    benchmark(_name)(_startup(_code))
+
+
+# --- Runner ---
+def run(pattern='*', repeat=5, min_time=0.2):
+    """Runs the matching benchmarks; best of repeat, each timed for at least min_time."""
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        call, ops, unit = setup()
+        timer = timeit.Timer(call)
+        number, elapsed = timer.autorange()
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+        best = min(timer.repeat(repeat=repeat, number=number)) / number
+        results[name] = {'ops_per_sec': ops / best, 'seconds_per_call': best, 'ops_per_call': ops,
+                         'unit': unit, 'number': number, 'repeat': repeat}
+    return {'meta': {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                     'machine': platform.machine(), 'pygame': pygame.version.ver,
+                     'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+def compare(report, baseline, tolerance=0.2):
+    """Returns (name, baseline ops/s, current ops/s) for every benchmark slower
+    than the baseline by more than tolerance (a fraction)."""
+    regressions = []
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base and result['ops_per_sec'] < base['ops_per_sec'] * (1 - tolerance):
+            regressions.append((name, base['ops_per_sec'], result['ops_per_sec']))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks for the panel logic, rendering and scenarios.")
+    parser.add_argument('--only', default='*', metavar='GLOB', help="e.g. 'logic.*'")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds per timing run")
+    parser.add_argument('--json', metavar='FILE', help="write the results as JSON ('-' for stdout)")
+    parser.add_argument('--baseline', metavar='FILE', help="fail if slower than this JSON report")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown vs baseline")
+    args = parser.parse_args()
+
+    report = run(args.only, args.repeat, args.min_time)
+    for name, result in report['results'].items():
+        print(f"{name:34} {result['ops_per_sec']:14,.0f} {result['unit']}/s", file=sys.stderr)
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for name, base, current in regressions:
+            print(f"REGRESSION {name}: {current:,.0f}/s vs baseline {base:,.0f}/s "
+                  f"({current / base - 1:+.0%})", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,310 @@
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+
+from panel_state import changed_fields
+from scheduler import EventScheduler
+from scenario import SCENARIO_ACTIONS
+from panel_logic import SwitchgearPanel
+
+# --- Protocol ---
+# Newline-delimited JSON over TCP.
+# Requests:  {"id": 1, "cmd": "toggle_k1", "panel": 5, "args": []}
+#            {"id": 2, "cmd": "subscribe", "panels": [0, 1, 2]}   ("panels": "*" for all)
+#            {"id": 3, "cmd": "unsubscribe", "panels": [...]} / {"id": 4, "cmd": "get", "panel": 5}
+# Replies:   {"id": 1, "result": ...} or {"id": 1, "error": "..."}
+# Pushes:    {"tick": 120, "t": 4.0, "deltas": {"5": {"breaker_state": "CLOSING", ...}}}
+# Panel commands are the scenario actions (scenario.SCENARIO_ACTIONS).
+
+DEFAULT_PORT = 8765
+TICK = 1 / 30 # Seconds between coalesced delta pushes
+HIGH_WATER = 256 * 1024 # Bytes queued for a client before its deltas are held back and merged
+
+
+def encode(message):
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+# --- Server ---
+class FiringScheduler(EventScheduler):
+    """ EventScheduler that remembers whose callbacks fired. Panel completions
+    (spring charged, K1 pulse end, ...) change state without settling it, so
+    the tick loop settles those panels itself. """
+    def __init__(self, start=0.0):
+        super().__init__(start)
+        self.fired = set() # Owners of the bound methods fired since the last clear()
+
+    def schedule(self, delay, callback, *args):
+        return super().schedule(delay, self._fire, callback, args)
+
+    def _fire(self, callback, args):
+        callback(*args)
+        self.fired.add(callback.__self__)
+
+class ClientSession:
+    def __init__(self, writer):
+        self.writer = writer
+        self.all_panels = False
+        self.panels = set()
+        self.pending = {} # panel id -> change mask not yet pushed
+
+    def send(self, message):
+        self.writer.write(encode(message))
+
+    @property
+    def congested(self):
+        return self.writer.transport.get_write_buffer_size() > HIGH_WATER
+
+class PanelServer:
+    """ Hosts many SwitchgearPanels on one virtual clock and serves them to
+    TCP clients. Changes are collected through panel.subscribe() and pushed
+    once per tick as per-panel field deltas. A client whose socket buffer is
+    over HIGH_WATER is skipped; its pending masks keep merging until it
+    drains, so a slow client gets fewer, larger updates and never stalls the
+    tick loop.
+    """
+    def __init__(self, panels=1000, tick=TICK):
+        self.scheduler = FiringScheduler()
+        self.panels = [SwitchgearPanel(self.scheduler, i) for i in range(panels)]
+        self.tick = tick
+        self.ticks = 0
+        self.clients = set()
+        self._changed = {} # panel id -> change mask since the last tick
+        self._touched = set() # Panels commanded since the last tick
+        for panel in self.panels:
+            panel.subscribe(self._on_change)
+
+    def _on_change(self, panel, changed):
+        self._changed[panel.panel_id] = self._changed.get(panel.panel_id, 0) | changed
+
+    def _panel_ids(self, panels):
+        if panels == '*':
+            return None
+        ids = {int(i) for i in panels}
+        if any(not 0 <= i < len(self.panels) for i in ids):
+            raise IndexError("panel id out of range")
+        return ids
+
+    def execute(self, client, message):
+        cmd = message['cmd']
+        if cmd == 'subscribe':
+            ids = self._panel_ids(message['panels'])
+            if ids is None:
+                client.all_panels = True
+                ids = range(len(self.panels))
+            else:
+                client.panels |= ids
+            return {i: dict(self.panels[i].state) for i in ids}
+        if cmd == 'unsubscribe':
+            ids = self._panel_ids(message['panels'])
+            if ids is None:
+                client.all_panels = False
+                client.panels.clear()
+            else:
+                client.panels -= ids
+            return True
+        if cmd == 'get':
+            [panel_id] = self._panel_ids([message['panel']])
+            return dict(self.panels[panel_id].state)
+        if cmd not in SCENARIO_ACTIONS:
+            raise KeyError(f"unknown command {cmd!r}")
+        args = message.get('args', [])
+        if len(args) != SCENARIO_ACTIONS[cmd]:
+            raise TypeError(f"{cmd} takes {SCENARIO_ACTIONS[cmd]} argument(s)")
+        [panel_id] = self._panel_ids([message['panel']])
+        panel = self.panels[panel_id]
+        self._touched.add(panel)
+        return getattr(panel, cmd)(*args)
+
+    async def handle(self, reader, writer):
+        client = ClientSession(writer)
+        self.clients.add(client)
+        try:
+            while line := await reader.readline():
+                message = {}
+                try:
+                    message = json.loads(line)
+                    client.send({'id': message.get('id'), 'result': self.execute(client, message)})
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    client.send({'id': message.get('id') if isinstance(message, dict) else None,
+                                 'error': str(e)})
+                if client.congested:
+                    await writer.drain() # Only this client's command stream waits
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+    def publish(self, changed):
+        """Merges this tick's changes into every client and pushes where the socket has room."""
+        values = {}
+        for client in list(self.clients):
+            pending = client.pending
+            if client.all_panels:
+                relevant = changed
+            elif len(client.panels) < len(changed):
+                relevant = {i: changed[i] for i in client.panels if i in changed}
+            else:
+                relevant = {i: mask for i, mask in changed.items() if i in client.panels}
+            for i, mask in relevant.items():
+                pending[i] = pending.get(i, 0) | mask
+            if not pending or client.congested:
+                continue
+            deltas = {}
+            for i, mask in pending.items():
+                key = (i, mask)
+                if key not in values:
+                    state = self.panels[i].state
+                    values[key] = {field: state[field] for field in changed_fields(mask)}
+                deltas[i] = values[key]
+            pending.clear()
+            try:
+                client.send({'tick': self.ticks, 't': self.scheduler.now, 'deltas': deltas})
+            except ConnectionError:
+                self.clients.discard(client)
+
+    async def run_ticks(self):
+        loop = asyncio.get_running_loop()
+        last = loop.time()
+        while True:
+            await asyncio.sleep(self.tick)
+            now = loop.time()
+            self.scheduler.advance(now - last)
+            last = now
+            for panel in self._touched | self.scheduler.fired: # Actions and completions that don't update
+                panel._update_dependent_states()
+            self._touched.clear()
+            self.scheduler.fired.clear()
+            changed, self._changed = self._changed, {}
+            self.ticks += 1
+            self.publish(changed)
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        ticker = asyncio.create_task(self.run_ticks())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            ticker.cancel()
+
+
+# --- Load Generator ---
+LOAD_COMMANDS = ('toggle_bus_v_healthy', 'toggle_service_pos', 'toggle_k1')
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+async def load_client(host, port, panels, duration, window, stats, seed):
+    """One client: subscribes to its panels and keeps window commands in flight.
+    Update latency is from a command to the first delta for its panel."""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port, limit=2 ** 24)
+    sent, awaiting = {}, {} # command id -> send time, panel id -> first unanswered send time
+    slots = asyncio.Semaphore(window)
+    writer.write(encode({'id': 0, 'cmd': 'subscribe', 'panels': panels}))
+    await reader.readline()
+
+    async def receive():
+        while line := await reader.readline():
+            now = time.perf_counter()
+            message = json.loads(line)
+            if 'deltas' in message:
+                stats['deltas'] += len(message['deltas'])
+                for i in message['deltas']:
+                    start = awaiting.pop(int(i), None)
+                    if start is not None:
+                        stats['update_latency'].append(now - start)
+            else:
+                stats['rtt'].append(now - sent.pop(message['id']))
+                stats['errors'] += 'error' in message
+                slots.release()
+
+    receiver = asyncio.create_task(receive())
+    end = time.perf_counter() + duration
+    command_id = 0
+    while time.perf_counter() < end:
+        await slots.acquire()
+        command_id += 1
+        panel = rng.choice(panels)
+        now = time.perf_counter()
+        sent[command_id] = now
+        awaiting.setdefault(panel, now)
+        writer.write(encode({'id': command_id, 'cmd': rng.choice(LOAD_COMMANDS), 'panel': panel}))
+        if writer.transport.get_write_buffer_size() > HIGH_WATER:
+            await writer.drain()
+    for _ in range(window): # Wait for the in-flight replies
+        await slots.acquire()
+    writer.close()
+    receiver.cancel()
+
+async def run_load(host, port, panels=1000, clients=100, duration=10.0, window=8, seed=0):
+    stats = {'rtt': [], 'update_latency': [], 'deltas': 0, 'errors': 0}
+    per_client = max(1, panels // clients)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        load_client(host, port, [(c * per_client + k) % panels for k in range(per_client)],
+                    duration, window, stats, seed * 100003 + c)
+        for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {'commands': len(stats['rtt']), 'commands_per_sec': len(stats['rtt']) / elapsed,
+            'errors': stats['errors'], 'deltas': stats['deltas'],
+            'rtt_p50_ms': _percentile(stats['rtt'], 50) * 1000,
+            'rtt_p99_ms': _percentile(stats['rtt'], 99) * 1000,
+            'update_p50_ms': _percentile(stats['update_latency'], 50) * 1000,
+            'update_p99_ms': _percentile(stats['update_latency'], 99) * 1000}
+
+def spawn_server(panels):
+    """Starts `control_server.py serve` on a free port; returns (process, port)."""
+    process = subprocess.Popen([sys.executable, __file__, 'serve', '--port', '0', '--panels', str(panels)],
+                               stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.startswith('listening on'):
+            return process, int(line.split()[-1])
+    process.wait()
+    raise RuntimeError("control server exited before listening")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="TCP control server for many incomer panels.")
+    sub = parser.add_subparsers(dest='mode', required=True)
+    serve = sub.add_parser('serve', help="run the server")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve.add_argument('--panels', type=int, default=1000)
+    load = sub.add_parser('load', help="run the load generator (starts a local server unless --port)")
+    load.add_argument('--host', default='127.0.0.1')
+    load.add_argument('--port', type=int, default=None)
+    load.add_argument('--panels', type=int, default=1000)
+    load.add_argument('--clients', type=int, default=100)
+    load.add_argument('--duration', type=float, default=10.0)
+    load.add_argument('--window', type=int, default=8, help="commands in flight per client")
+    args = parser.parse_args()
+
+    if args.mode == 'serve':
+        def ready(port):
+            print(f"listening on {args.host} {port}", flush=True)
+        try:
+            asyncio.run(PanelServer(args.panels).serve(args.host, args.port, ready))
+        except KeyboardInterrupt:
+            pass
+    else:
+        process, port = (None, args.port) if args.port else spawn_server(args.panels)
+        try:
+            result = asyncio.run(run_load(args.host, port, args.panels, args.clients,
+                                          args.duration, args.window))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        print(json.dumps(result, indent=2))
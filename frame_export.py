@@ -0,0 +1,171 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # Headless: must be set before pygame initializes
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1') # Keep stdout clean for raw frames
+
+import sys
+import time
+import queue
+import shutil
+import argparse
+import threading
+
+import pygame
+
+from scheduler import EventScheduler
+from scenario import read_scenario, feed
+from simulation import FPS, SCREEN_WIDTH, SCREEN_HEIGHT, SwitchgearPanel, SchematicRenderer
+
+# (time in seconds, panel method, *args)
+DEMO_SCENARIO = [
+    (0.5, 'toggle_k1'),
+    (1.5, 'toggle_k1'),
+    (3.0, 'initiate_direct_trip', 'trip_signal_k2', 'K2'),
+    (4.0, 'toggle_k1'),
+    (5.0, 'toggle_k1'),
+    (6.0, 'initiate_protection_trip'),
+    (8.0, 'reset_k86'),
+    (9.0, 'toggle_dc'),
+    (10.0, 'toggle_dc'),
+]
+
+
+# --- Frame Sinks ---
+# write(index, size, pixels): pixels is RGB bytes, or None when the frame repeats the previous one.
+class PNGSequenceSink:
+    """ Writes frame_000000.png, frame_000001.png, ... into a directory.
+    Repeated frames are hard links to the last rendered file. """
+    def __init__(self, directory, pattern='frame_%06d.png'):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.pattern = pattern
+        self._last_path = None
+
+    def write(self, index, size, pixels):
+        path = os.path.join(self.directory, self.pattern % index)
+        if pixels is None:
+            if os.path.exists(path):
+                os.remove(path)
+            try:
+                os.link(self._last_path, path)
+            except OSError:
+                shutil.copyfile(self._last_path, path)
+        else:
+            pygame.image.save(pygame.image.frombytes(pixels, size, 'RGB'), path)
+            self._last_path = path
+
+    def close(self):
+        pass
+
+class RawRGBSink:
+    """ Streams packed RGB24 frames to a binary stream, e.g. ffmpeg's stdin:
+    ``-f rawvideo -pix_fmt rgb24 -s 1300x850 -r 30 -i -``. With
+    close_stream the stream is closed with the sink (files it was handed);
+    otherwise only flushed (stdout). """
+    def __init__(self, stream, close_stream=False):
+        self.stream = stream
+        self.close_stream = close_stream
+        self._last = None
+
+    def write(self, index, size, pixels):
+        if pixels is None:
+            pixels = self._last
+        self._last = pixels
+        self.stream.write(pixels)
+
+    def close(self):
+        if self.close_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+# --- Background Writer ---
+class FrameWriter:
+    """ Drains frames to a sink on a background thread so encoding never
+    blocks the simulation. At most max_queue frames wait; beyond that
+    submit() blocks, so a slow sink holds the render loop back instead of
+    piling up raw frames in memory. """
+    def __init__(self, sink, max_queue=8):
+        self.sink = sink
+        self.error = None
+        self._queue = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name='frame-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, index, size, pixels):
+        self._queue.put((index, size, pixels))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self.error is None:
+                try:
+                    self.sink.write(*item)
+                except Exception as e: # Report on close(), keep draining
+                    self.error = e
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self.sink.close()
+        if self.error is not None:
+            raise self.error
+
+
+# --- Export ---
+def export_frames(events, sink, duration, fps=FPS, max_queue=8):
+    """Plays (time, action, args) events, e.g. from scenario.read_scenario(),
+    on the virtual clock and writes one frame per 1/fps. Events are pulled
+    one at a time, so a scenario file is streamed. Frames whose panel state
+    did not change are not re-rendered."""
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    size = surface.get_size()
+    scheduler = EventScheduler()
+    panel = SwitchgearPanel(scheduler)
+    feed(scheduler, panel, events)
+    renderer = SchematicRenderer(surface)
+    writer = FrameWriter(sink, max_queue)
+    frames, rendered = int(duration * fps), 0
+    start = time.perf_counter()
+    try:
+        for index in range(frames):
+            scheduler.run_until(index / fps)
+            panel._update_dependent_states()
+            if renderer.render(panel.evaluate()):
+                writer.submit(index, size, pygame.image.tobytes(surface, 'RGB'))
+                rendered += 1
+            else:
+                writer.submit(index, size, None)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    return {'frames': frames, 'rendered': rendered, 'elapsed': elapsed,
+            'realtime_factor': (frames / fps) / elapsed if elapsed else float('inf')}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render the incomer schematic headless from a scenario.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--png', metavar='DIR', help="write a PNG sequence into DIR")
+    target.add_argument('--raw', metavar='FILE', help="write raw RGB24 frames to FILE ('-' for stdout)")
+    parser.add_argument('--scenario', metavar='FILE', help="scenario file (default: DEMO_SCENARIO)")
+    parser.add_argument('--fps', type=int, default=FPS)
+    parser.add_argument('--duration', type=float, default=12.0, help="seconds of simulated time")
+    args = parser.parse_args()
+
+    if args.png:
+        sink = PNGSequenceSink(args.png)
+    elif args.raw == '-':
+        sink = RawRGBSink(sys.stdout.buffer)
+    else:
+        sink = RawRGBSink(open(args.raw, 'wb'), close_stream=True)
+    if args.scenario:
+        with open(args.scenario, 'rb') as f:
+            stats = export_frames(read_scenario(f), sink, args.duration, args.fps)
+    else:
+        demo = ((when, action, event_args) for when, action, *event_args in DEMO_SCENARIO)
+        stats = export_frames(demo, sink, args.duration, args.fps)
+    print(f"{stats['frames']} frames ({stats['rendered']} rendered) in {stats['elapsed']:.2f} s, "
+          f"{stats['realtime_factor']:.0f}x real time", file=sys.stderr)
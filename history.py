@@ -0,0 +1,274 @@
+import sys
+import time
+import random
+import bisect
+import argparse
+from array import array
+from operator import xor
+from functools import reduce
+
+from panel_state import PanelState, LAYOUT, STATE_BITS, changed_fields
+from scheduler import EventScheduler
+from panel_logic import SwitchgearPanel
+
+# --- Storage ---
+# A step is one settled state change. It is stored as its timestamp and the
+# XOR of the packed state before and after, i.e. exactly the changed field
+# bits. Steps are grouped into chunks of keyframe_interval steps that each
+# start with the full packed state, so any step is rebuilt from at most one
+# chunk of diffs, and whole chunks are evicted from the front once the
+# history holds max_steps. Each chunk also carries the last step before it
+# that changed each field, so changed_at() scans at most one chunk.
+DIFF_TYPECODE = 'I' if STATE_BITS <= 32 else 'Q'
+
+class _Chunk:
+    __slots__ = ('first', 'keyframe', 'times', 'diffs', 'changed_before')
+
+    def __init__(self, first, keyframe, when, diff, changed_before):
+        self.first = first # Step number of times[0]
+        self.keyframe = keyframe # Packed state at step first
+        self.times = array('d', (when,))
+        self.diffs = array(DIFF_TYPECODE, (diff,)) # diffs[0] leads into the keyframe
+        self.changed_before = changed_before # field -> last step before first that changed it
+
+    def bits(self, index):
+        return reduce(xor, self.diffs[1:index + 1], self.keyframe)
+
+    def changed_through(self):
+        """field -> last step up to the end of this chunk that changed it."""
+        last = dict(self.changed_before)
+        for k, diff in enumerate(self.diffs):
+            for field in changed_fields(diff):
+                last[field] = self.first + k
+        return last
+
+
+# --- Panel History ---
+class PanelHistory:
+    """ Time-travel history of one SwitchgearPanel.
+
+    Records every settled state change (through panel.subscribe()) as a
+    step: step 0 is the state when the history was attached. state_at() /
+    step_at() find any retained step by number or timestamp with two
+    bisections and at most keyframe_interval XORs; seek(), undo() and redo()
+    put the panel back into a recorded state. When the cursor is behind the
+    latest step, a change that reproduces the next recorded step (e.g. a
+    resumed close finishing) moves the cursor forward; any other change
+    discards the later steps, like an editor's undo.
+
+    Memory is about 16 bytes per step and bounded by max_steps; older
+    chunks are dropped and counted in ``dropped``. Timestamps are the
+    panel's virtual clock, or time.monotonic() without a scheduler.
+    """
+    def __init__(self, panel, keyframe_interval=256, max_steps=1 << 22):
+        self.panel = panel
+        self.keyframe_interval = keyframe_interval
+        self.max_chunks = max(2, -(-max_steps // keyframe_interval))
+        self.dropped = 0 # Steps evicted from the front
+        self._bits = panel.state.bits # Last recorded (or restored) state
+        self._chunks = [_Chunk(0, self._bits, self._now(), 0, {})]
+        self.cursor = 0 # Step the panel is at
+        self._callback = panel.subscribe(self._on_change)
+
+    def detach(self):
+        self.panel.unsubscribe(self._callback)
+
+    def _now(self):
+        scheduler = self.panel.scheduler
+        return scheduler.now if scheduler is not None else time.monotonic()
+
+    @property
+    def first(self):
+        """Oldest retained step."""
+        return self._chunks[0].first
+
+    @property
+    def last(self):
+        chunk = self._chunks[-1]
+        return chunk.first + len(chunk.times) - 1
+
+    def __len__(self):
+        return self.last - self.first + 1
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the recorded steps."""
+        per_step = 8 + array(DIFF_TYPECODE).itemsize
+        return sum(len(chunk.times) * per_step + 96 + sys.getsizeof(chunk.changed_before)
+                   + 32 * len(chunk.changed_before) for chunk in self._chunks)
+
+    # --- Recording ---
+    def _on_change(self, panel, mask):
+        bits = panel.state.bits
+        diff = bits ^ self._bits
+        if not diff: # A restore of ours, or a change reverted before it settled
+            return
+        if self.cursor != self.last:
+            if bits == self.state_at(self.cursor + 1): # Replaying the recorded future
+                self.cursor += 1
+                self._bits = bits
+                return
+            self._truncate(self.cursor)
+        self._bits = bits
+        when = self._now()
+        chunk = self._chunks[-1]
+        step = chunk.first + len(chunk.times)
+        if len(chunk.times) < self.keyframe_interval:
+            chunk.times.append(when)
+            chunk.diffs.append(diff)
+        else:
+            self._chunks.append(_Chunk(step, bits, when, diff, chunk.changed_through()))
+            if len(self._chunks) > self.max_chunks:
+                self.dropped += len(self._chunks.pop(0).times)
+        self.cursor = step
+
+    def _truncate(self, step):
+        """Drops every step after step."""
+        i, index = self._locate(step)
+        chunk = self._chunks[i]
+        del chunk.times[index + 1:]
+        del chunk.diffs[index + 1:]
+        del self._chunks[i + 1:]
+
+    # --- Lookup ---
+    def _locate(self, step):
+        """(chunk index, index in chunk) of a retained step."""
+        if not self.first <= step <= self.last:
+            raise IndexError(f"step {step} is not in the history ({self.first}..{self.last})")
+        i = bisect.bisect_right(self._chunks, step, key=lambda c: c.first) - 1
+        return i, step - self._chunks[i].first
+
+    def state_at(self, step):
+        """Packed panel state after step."""
+        i, index = self._locate(step)
+        return self._chunks[i].bits(index)
+
+    def time_at(self, step):
+        i, index = self._locate(step)
+        return self._chunks[i].times[index]
+
+    def step_at(self, when):
+        """Last step recorded at or before time when."""
+        i = bisect.bisect_right(self._chunks, when, key=lambda c: c.times[0]) - 1
+        if i < 0:
+            raise IndexError(f"t = {when} is before the history")
+        chunk = self._chunks[i]
+        return chunk.first + bisect.bisect_right(chunk.times, when) - 1
+
+    def changed_at(self, step, field):
+        """Last step at or before step that changed field (the oldest retained
+        step if none did). Scans at most the diffs of step's own chunk."""
+        shift, mask, _ = LAYOUT[field]
+        field_mask = mask << shift
+        i, index = self._locate(step)
+        chunk = self._chunks[i]
+        for k in range(index, -1, -1):
+            if chunk.diffs[k] & field_mask:
+                return chunk.first + k
+        return max(chunk.changed_before.get(field, self.first), self.first)
+
+    def changes(self, step):
+        """Fields changed by step: {field: (before, after)}."""
+        i, index = self._locate(step)
+        chunk = self._chunks[i]
+        after = PanelState(chunk.bits(index))
+        before = PanelState(after.bits ^ chunk.diffs[index])
+        return {field: (before[field], after[field]) for field in changed_fields(chunk.diffs[index])}
+
+    def steps(self, start=None, stop=None):
+        """Yields (step, time, packed state) from start to stop (inclusive),
+        applying the diffs in order instead of seeking every step."""
+        start = self.first if start is None else start
+        stop = self.last if stop is None else stop
+        i, index = self._locate(start)
+        bits = self._chunks[i].bits(index)
+        step = start
+        for chunk in self._chunks[i:]:
+            for when, diff in zip(chunk.times[index:], chunk.diffs[index:]):
+                if step > stop:
+                    return
+                if step != start:
+                    bits ^= diff
+                yield step, when, bits
+                step += 1
+            index = 0
+
+    # --- Time Travel ---
+    def seek(self, step):
+        """Puts the panel into its state after step. With a scheduler, the
+        panel's own pending completions are cancelled and those of the
+        operations in progress at step (close, trip, spring charge, K1 pulse)
+        are rescheduled for the time they had left then. The clock and any
+        other events on the scheduler are left alone."""
+        bits = self.state_at(step)
+        panel = self.panel
+        if panel.scheduler is not None:
+            panel.cancel_pending()
+        self.cursor = step
+        self._bits = bits
+        panel.restore(bits)
+        panel._update_dependent_states() # Notifies renderers; recorded states are already settled
+        when = self.time_at(step)
+        panel.resume(lambda field: when - self.time_at(self.changed_at(step, field)))
+        return bits
+
+    def seek_time(self, when):
+        return self.seek(self.step_at(when))
+
+    def undo(self):
+        """Steps the panel back one transition; False at the oldest retained step."""
+        if self.cursor <= self.first:
+            return False
+        self.seek(self.cursor - 1)
+        return True
+
+    def redo(self):
+        """Steps forward again after undo(); False at the latest step."""
+        if self.cursor >= self.last:
+            return False
+        self.seek(self.cursor + 1)
+        return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Record a long random panel session and time history seeks.")
+    parser.add_argument('--operations', type=int, default=2_000_000)
+    parser.add_argument('--max-steps', type=int, default=1 << 22)
+    parser.add_argument('--keyframe-interval', type=int, default=256)
+    parser.add_argument('--seeks', type=int, default=100_000)
+    args = parser.parse_args()
+
+    actions = ('toggle_k1', 'toggle_k1', 'initiate_protection_trip', 'reset_k86', 'toggle_bus_v_healthy',
+               'toggle_service_pos', 'toggle_dc')
+    rng = random.Random(0)
+    scheduler = EventScheduler()
+    panel = SwitchgearPanel(scheduler)
+    history = PanelHistory(panel, args.keyframe_interval, args.max_steps)
+    start = time.perf_counter()
+    for _ in range(args.operations):
+        getattr(panel, rng.choice(actions))()
+        scheduler.advance(rng.random())
+        panel._update_dependent_states()
+    elapsed = time.perf_counter() - start
+    print(f"{args.operations:,} operations in {elapsed:.2f} s: {len(history):,} steps retained "
+          f"({history.dropped:,} dropped), {history.nbytes / 2 ** 20:.1f} MiB")
+
+    # Sequential replay is the reference for the random seeks
+    reference = array(DIFF_TYPECODE, (bits for _, _, bits in history.steps()))
+    picks = [rng.randint(history.first, history.last) for _ in range(args.seeks)]
+    start = time.perf_counter()
+    ok = all(history.state_at(step) == reference[step - history.first] for step in picks)
+    elapsed = time.perf_counter() - start
+    print(f"{args.seeks:,} state_at() seeks: {elapsed / args.seeks * 1e6:.1f} us each, match replay: {ok}")
+    times = [history.time_at(step) for step in picks]
+    start = time.perf_counter()
+    for when in times:
+        history.step_at(when)
+    elapsed = time.perf_counter() - start
+    print(f"{args.seeks:,} step_at() lookups: {elapsed / args.seeks * 1e6:.1f} us each")
+
+    target = history.last - 10
+    history.seek(target)
+    undone = sum(history.undo() for _ in range(5))
+    print(f"seek to step {target:,} then {undone} undo: panel at step {history.cursor:,}, "
+          f"breaker {panel.state['breaker_state']}, matches history: {panel.state.bits == reference[history.cursor - history.first]}")
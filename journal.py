@@ -0,0 +1,136 @@
+import json
+import time
+import struct
+
+# --- Event Codes ---
+# (name, console formatter). The formatters reproduce the messages the panel
+# used to print().
+EVENTS = (
+    ('reset', lambda: "--- Resetting Simulation ---"),
+    ('spring_recharging', lambda: "  Spring Recharging..."),
+    ('spring_recharged', lambda: "  Spring Recharged."),
+    ('closing', lambda: "  Closing Breaker..."),
+    ('close_blocked', lambda: "  Close Blocked! Interlocks not met."),
+    ('breaker_state', lambda state: f"  Breaker state changed to: {state}"),
+    ('direct_trip', lambda flag, reason: f"\n--- Trip Command Received ({reason}) ---"),
+    ('protection_trip', lambda: "\n--- Protection Trip Command Received (-> K86) ---"),
+    ('protection_trip_done', lambda state: f"  Breaker state changed to: {state} - K86 LATCHED"),
+    ('k86_reset', lambda: "\n--- Resetting K86 ---\n  K86 Relay Reset."),
+    ('dc_toggled', lambda ok: f"\n--- DC Power Toggled {'ON' if ok else 'OFF'} ---"),
+    ('tc_toggled', lambda ok: f"\n--- Trip Coil Supervision Toggled: {'OK' if ok else 'FAIL'} ---"),
+    ('k1_toggled', lambda on: f"\n--- K1 Relay Toggled {'ON' if on else 'OFF'} ---"),
+    ('close_pulse_start', lambda: "  (Close command pulse initiated)"),
+    ('close_pulse_end', lambda: "  (Close command pulse ended)"),
+    ('service_toggled', lambda on: f"\n--- Service Position Toggled: {'SERVICE' if on else 'TEST/DRAWN'} ---"),
+    ('bus_earth_toggled', lambda ok: f"\n--- Bus Earth Status Toggled: {'Not Earthed (OK)' if ok else 'EARTHED (Block)'} ---"),
+    ('bus_voltage_toggled', lambda ok: f"\n--- Bus Voltage Toggled: {'Healthy (OK)' if ok else 'Low (Block)'} ---"),
+    ('buscoupler_toggled', lambda ok: f"\n--- Bus Coupler Interlock (NC) Toggled: {'CLOSED (OK)' if ok else 'OPEN (Block)'} ---"),
+    ('pt_toggled', lambda phase, ok: f"\n--- PT {phase} Phase Toggled: {'OK' if ok else 'FAIL'} ---"),
+    ('button_clicked', lambda text: f"Button '{text}' clicked"),
+    ('draw_error', lambda error: f"Error during drawSchematic: {error}"),
+)
+(RESET, SPRING_RECHARGING, SPRING_RECHARGED, CLOSING, CLOSE_BLOCKED, BREAKER_STATE,
+ DIRECT_TRIP, PROTECTION_TRIP, PROTECTION_TRIP_DONE, K86_RESET, DC_TOGGLED, TC_TOGGLED,
+ K1_TOGGLED, CLOSE_PULSE_START, CLOSE_PULSE_END, SERVICE_TOGGLED, BUS_EARTH_TOGGLED,
+ BUS_VOLTAGE_TOGGLED, BUSCOUPLER_TOGGLED, PT_TOGGLED, BUTTON_CLICKED, DRAW_ERROR) = range(len(EVENTS))
+EVENT_NAMES = tuple(name for name, _ in EVENTS)
+
+# Binary record: timestamp, event code, panel id, length of the JSON-encoded args
+RECORD_HEADER = struct.Struct('<dHIH')
+
+
+# --- Ring Buffer Journal ---
+class EventJournal:
+    """ Fixed-size ring buffer of (timestamp, event code, panel id, args).
+
+    Disabled by default: call sites check ``journal.active`` first, so a
+    disabled journal costs one attribute read. When the buffer is full the
+    oldest records are overwritten and counted in ``dropped``. The console
+    sink prints each event the way the panel used to, for the GUI.
+    """
+    def __init__(self, size=65536):
+        self.enabled = False
+        self.console = False
+        self.active = False
+        self._start = time.monotonic()
+        self.resize(size)
+
+    def resize(self, size):
+        """Preallocates an empty buffer of size records."""
+        self.size = size
+        self._time = [0.0] * size
+        self._code = [0] * size
+        self._panel = [0] * size
+        self._args = [()] * size
+        self._next = 0 # Total records written
+        self._first = 0 # Oldest record still in the buffer
+        self.dropped = 0
+
+    def configure(self, enabled=None, console=None):
+        if enabled is not None:
+            self.enabled = enabled
+        if console is not None:
+            self.console = console
+        self.active = self.enabled or self.console
+
+    def record(self, code, panel, *args):
+        """Journals an event. panel supplies the id and, with a scheduler, the
+        virtual timestamp; None for events outside a panel."""
+        if not self.active:
+            return
+        if panel is not None and panel.scheduler is not None:
+            timestamp = panel.scheduler.now
+        else:
+            timestamp = time.monotonic() - self._start
+        if self.enabled:
+            i = self._next % self.size
+            self._time[i], self._code[i] = timestamp, code
+            self._panel[i] = panel.panel_id if panel is not None else 0
+            self._args[i] = args
+            self._next += 1
+            if self._next - self._first > self.size:
+                self._first += 1
+                self.dropped += 1
+        if self.console:
+            print(EVENTS[code][1](*args))
+
+    def __len__(self):
+        return self._next - self._first
+
+    def drain(self):
+        """Removes and returns the buffered records, oldest first."""
+        records = []
+        for n in range(self._first, self._next):
+            i = n % self.size
+            records.append((self._time[i], self._code[i], self._panel[i], self._args[i]))
+        self._first = self._next
+        return records
+
+    def drain_jsonl(self, stream):
+        """Writes the buffered records to a text stream, one JSON object per line."""
+        records = self.drain()
+        stream.writelines(json.dumps({'t': t, 'event': EVENT_NAMES[code], 'panel': panel, 'args': args}) + '\n'
+                          for t, code, panel, args in records)
+        return len(records)
+
+    def drain_binary(self, stream):
+        """Writes the buffered records to a binary stream (see read_binary)."""
+        records = self.drain()
+        chunks = []
+        for t, code, panel, args in records:
+            payload = json.dumps(args, separators=(',', ':')).encode() if args else b''
+            chunks.append(RECORD_HEADER.pack(t, code, panel, len(payload)))
+            chunks.append(payload)
+        stream.write(b''.join(chunks))
+        return len(records)
+
+def read_binary(stream):
+    """Yields (timestamp, event code, panel id, args) from drain_binary output."""
+    while True:
+        header = stream.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return
+        t, code, panel, length = RECORD_HEADER.unpack(header)
+        yield t, code, panel, tuple(json.loads(stream.read(length))) if length else ()
+
+journal = EventJournal()
@@ -0,0 +1,190 @@
+import math
+import time
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+from scheduler import OperationTimings, EventScheduler
+
+# Imports only NumPy (and the scheduler types): runs in headless and worker processes.
+
+# --- Mechanism Parameters ---
+# Spring-operated mechanism of a vacuum breaker, reduced to the moving
+# contact's travel coordinate s (0 = open, stroke = closed and latched):
+#   closing spring  pushes to close:  close_force - close_rate * s
+#   opening spring  pushes to open:   trip_force + trip_rate * s (charged by closing)
+#   contact springs push to open:     wipe_rate * (s - (stroke - wipe)) once the contacts touch
+# with viscous damping and Coulomb friction. The charging motor compresses
+# the closing spring through a gearbox along its own coordinate x (0 to
+# charge_travel); motor force and speed scale with the DC supply voltage.
+# Every field may be a float or an array over a batch of breakers.
+MechanismParams = namedtuple('MechanismParams', (
+    'mass stroke wipe close_force close_rate trip_force trip_rate wipe_rate damping friction '
+    'close_latch trip_latch motor_stall motor_speed charge_rate charge_travel charge_friction'))
+
+DEFAULT_PARAMS = MechanismParams(
+    mass=2.0, # Moving mass referred to the contact (kg)
+    stroke=0.014, wipe=0.003, # Contact travel and wipe (m)
+    close_force=1500.0, close_rate=40000.0, # Closing spring (N, N/m)
+    trip_force=300.0, trip_rate=30000.0, # Opening spring (N, N/m)
+    wipe_rate=100000.0, # Contact pressure springs (N/m)
+    damping=40.0, friction=50.0, # N/(m/s), N
+    close_latch=0.035, trip_latch=0.020, # Coil pickup + latch release (s, at rated DC)
+    motor_stall=800.0, motor_speed=0.1, # Charging motor stall force (N), no-load speed (m/s)
+    charge_rate=4000.0, charge_travel=0.1, charge_friction=20.0, # Closing spring on the motor side
+)
+K86_OPERATE_TIME = 0.015 # Lockout relay between the protection trip and the trip coil (s)
+
+def sample_params(n, spread=0.05, seed=0, base=DEFAULT_PARAMS):
+    """n breakers with every parameter scattered normally by spread (relative sigma)."""
+    rng = np.random.default_rng(seed)
+    return MechanismParams(*(value * np.clip(rng.normal(1.0, spread, n), 0.5, 1.5) for value in base))
+
+
+# --- Integrators ---
+# Every breaker of the batch is stepped together with fixed dt; each one's
+# event times are interpolated between the two steps around its crossing.
+def _charge(p, dc, dt):
+    """Spring charging: quasi-static motor, dx/dt = speed * (u - load / stall)
+    with u the DC voltage per unit; RK4. Returns the time x reaches
+    charge_travel, inf where the motor stalls first."""
+    n = np.broadcast(*p, dc).shape
+    x = np.zeros(n)
+    done = np.full(n, np.inf)
+    def rate(x):
+        return np.maximum(p.motor_speed * (dc - (p.charge_rate * x + p.charge_friction) / p.motor_stall), 0.0)
+    # Stalls where the motor cannot beat the fully charged spring
+    stalls = dc * p.motor_stall <= p.charge_rate * p.charge_travel + p.charge_friction
+    t = 0.0
+    active = ~stalls
+    while active.any():
+        k1 = rate(x)
+        k2 = rate(x + 0.5 * dt * k1)
+        k3 = rate(x + 0.5 * dt * k2)
+        k4 = rate(x + dt * k3)
+        x_next = x + dt / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+        crossed = active & (x_next >= p.charge_travel)
+        done[crossed] = t + dt * ((p.charge_travel - x) / (x_next - x))[crossed]
+        active &= ~crossed
+        x = np.where(active, x_next, x)
+        t += dt
+    return done
+
+def _travel(force, p, distance, marks, dt, t_max=0.5):
+    """Contact travel along y from 0 to distance under force(y) (N) with
+    damping and friction; semi-implicit Euler. Returns, for each mark, the
+    time y passes it and the velocity there (inf / 0 where it never does)."""
+    shape = np.broadcast(*p).shape
+    y = np.zeros(shape)
+    v = np.zeros(shape)
+    times = [np.full(shape, np.inf) for _ in marks]
+    speeds = [np.zeros(shape) for _ in marks]
+    t = 0.0
+    active = np.ones(shape, bool)
+    while active.any() and t < t_max:
+        drive = force(y) - p.damping * v
+        # Coulomb friction opposes motion; at rest it holds unless the drive exceeds it
+        a = np.where(v > 0, drive - p.friction, np.maximum(drive - p.friction, 0.0)) / p.mass
+        v_next = v + a * dt
+        y_next = y + v_next * dt
+        for mark, when, speed in zip(marks, times, speeds):
+            crossed = active & (y < mark) & (y_next >= mark)
+            frac = np.divide(mark - y, y_next - y, out=np.zeros(shape), where=crossed)
+            when[crossed] = (t + dt * frac)[crossed]
+            speed[crossed] = (v + (v_next - v) * frac)[crossed]
+        active &= (y_next < distance) & (v_next > 0) # Stops at the end of travel, or stalls
+        y, v = np.where(active, y_next, y), np.where(active, v_next, v)
+        t += dt
+    return times, speeds
+
+
+# --- Batch Simulation ---
+MechanismResult = namedtuple('MechanismResult', (
+    'charge_time close_time close_travel_time close_speed open_time open_travel_time open_speed'))
+
+def simulate(params=DEFAULT_PARAMS, dc=1.0, dt=2e-5, charge_dt=1e-3):
+    """Close / open / charge timing of every breaker of a batch in one
+    vectorized pass. dc is the supply voltage per unit (float or array);
+    latch times scale with 1 / dc like a coil's pickup. Times in seconds:
+      charge_time        motor start to spring charged and latched
+      close_time         close command to contact touch (close_speed there, m/s)
+      close_travel_time  close command to the end of travel (closed latch)
+      open_time          trip command to contact separation (open_speed there)
+      open_travel_time   trip command to the end of opening travel
+    inf marks a breaker that never gets there (stalled motor or travel)."""
+    p = MechanismParams(*(np.asarray(value, float) for value in params))
+    dc = np.asarray(dc, float)
+    touch = p.stroke - p.wipe
+
+    def closing(s):
+        return (p.close_force - p.close_rate * s) - (p.trip_force + p.trip_rate * s) \
+               - p.wipe_rate * np.maximum(s - touch, 0.0)
+    (t_touch, t_closed), (v_touch, _) = _travel(closing, p, p.stroke, (touch, p.stroke), dt)
+
+    def opening(y): # y = stroke - s; the closing spring is latched and out of the chain
+        s = p.stroke - y
+        return p.trip_force + p.trip_rate * s + p.wipe_rate * np.maximum(s - touch, 0.0)
+    (t_part, t_open), (v_part, _) = _travel(opening, p, p.stroke, (p.wipe, p.stroke), dt)
+
+    close_latch, trip_latch = p.close_latch / dc, p.trip_latch / dc
+    return MechanismResult(
+        charge_time=_charge(p, dc, charge_dt),
+        close_time=close_latch + t_touch, close_travel_time=close_latch + t_closed, close_speed=v_touch,
+        open_time=trip_latch + t_part, open_travel_time=trip_latch + t_open, open_speed=v_part)
+
+def timings(result, index=0):
+    """OperationTimings for a SwitchgearPanel from breaker index of a
+    simulate() result: the panel's CLOSING / TRIPPING states last until the
+    contacts touch / part, and a protection trip adds the K86 operate time.
+    Raises ValueError for a breaker that never closes, opens or charges
+    (inf in the result): the panel cannot schedule such an operation."""
+    def pick(values):
+        return float(np.ravel(values)[index])
+    open_time = pick(result.open_time)
+    never = [name for name in ('close_time', 'open_time', 'charge_time') if not math.isfinite(pick(getattr(result, name)))]
+    if never:
+        raise ValueError(f"breaker {index} has no finite {', '.join(never)}")
+    return OperationTimings(close=pick(result.close_time), direct_trip=open_time,
+                            protection_trip=open_time + K86_OPERATE_TIME, spring_charge=pick(result.charge_time))
+
+def charge_time_exact(p, dc=1.0):
+    """Closed-form charge time of the quasi-static motor model (for checking _charge)."""
+    a = p.motor_speed * (dc - p.charge_friction / p.motor_stall)
+    b = p.motor_speed * p.charge_rate / p.motor_stall
+    return math.log(a / (a - b * p.charge_travel)) / b
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Vectorized breaker mechanism timing study.")
+    parser.add_argument('--breakers', type=int, default=10000)
+    parser.add_argument('--spread', type=float, default=0.05, help="relative sigma of every parameter")
+    parser.add_argument('--dc', type=float, nargs='+', default=[1.0, 0.85, 0.7], help="DC supply per unit")
+    args = parser.parse_args()
+
+    result = simulate()
+    print(f"nominal breaker: charge {result.charge_time:.3f} s (exact {charge_time_exact(DEFAULT_PARAMS):.3f} s), "
+          f"close {result.close_time * 1000:.1f} ms at {result.close_speed:.2f} m/s, "
+          f"open {result.open_time * 1000:.1f} ms at {result.open_speed:.2f} m/s")
+
+    params = sample_params(args.breakers, args.spread)
+    for dc in args.dc:
+        start = time.perf_counter()
+        result = simulate(params, dc)
+        elapsed = time.perf_counter() - start
+        print(f"{args.breakers:,} breakers at {dc:.2f} pu DC in {elapsed:.2f} s:")
+        for name in ('charge_time', 'close_time', 'open_time'):
+            values = getattr(result, name)
+            ok = np.isfinite(values)
+            p5, p50, p95 = np.percentile(values[ok], (5, 50, 95)) if ok.any() else (math.nan,) * 3
+            print(f"  {name:<11} p5 {p5 * 1000:8.1f} ms  p50 {p50 * 1000:8.1f} ms  p95 {p95 * 1000:8.1f} ms"
+                  f"  never: {np.count_nonzero(~ok)}")
+
+    # The panel's transitions follow the model: close, trip and recharge on the virtual clock
+    from panel_logic import SwitchgearPanel
+    scheduler = EventScheduler()
+    panel = SwitchgearPanel(scheduler, timings=timings(simulate(params), 0))
+    panel.toggle_k1()
+    scheduler.run_until(panel.timings.close)
+    print("panel timings from breaker 0: " + ', '.join(f"{k} {v * 1000:.1f} ms" for k, v in panel.timings._asdict().items())
+          + f"; breaker {panel.state['breaker_state']} at t = {scheduler.now * 1000:.1f} ms")
@@ -0,0 +1,192 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from panel_batch import PanelBatch
+from panel_state import BREAKER_CLOSING, BREAKER_CLOSED, BREAKER_TRIPPING
+
+# Workers only import panel_batch / panel_state (NumPy), never pygame.
+
+STEP_TIME = 1.0 # Simulated seconds per step: longer than any close/trip/recharge
+
+# Per-step probabilities for one panel
+FAULT_RATES = {
+    'dc_loss': 2e-4,
+    'tc_fail': 1e-4,
+    'pt_fail': 1e-4,
+    'spring_fail': 5e-5, # Charging motor fails, spring stays discharged after the next close
+    'protection_trip': 5e-4,
+}
+REPAIR_RATES = {
+    'dc_restore': 0.05,
+    'tc_repair': 0.01,
+    'pt_repair': 0.02,
+    'spring_repair': 0.005,
+    'k86_reset': 0.1, # Operator resets the lockout
+}
+EVENTS = tuple(FAULT_RATES) + tuple(REPAIR_RATES) + ('operator',)
+
+# Closing interlocks counted when a close attempt is blocked
+BLOCK_CAUSES = {
+    'dc': lambda b: ~b.dc_ok,
+    'trip_coil': lambda b: ~b.ktc_state,
+    'service_position': lambda b: ~b.breaker_in_service,
+    'bus_earthed': lambda b: ~b.bus_not_earthed,
+    'bus_voltage': lambda b: ~b.bus_voltage_healthy,
+    'buscoupler': lambda b: ~b.buscoupler_interlock_closed,
+    'k86': lambda b: b.k86_state,
+    'anti_pump': lambda b: b.k94_state,
+    'spring': lambda b: ~b.spring_charged,
+}
+COUNTERS = ('steps', 'close_attempts', 'closes', 'failed_closes', 'k86_lockouts',
+            'restores', 'restore_time_total') + tuple(f'{e}_injected' for e in FAULT_RATES)
+RESTORE_BINS = 24 # log2(seconds) buckets, the last one is open-ended
+
+
+# --- Shard Simulation ---
+def new_stats():
+    stats = {name: 0 for name in COUNTERS}
+    stats['restore_time_hist'] = np.zeros(RESTORE_BINS, dtype=np.int64)
+    stats['block_causes'] = np.zeros(len(BLOCK_CAUSES), dtype=np.int64)
+    return stats
+
+def merge_stats(total, stats):
+    """Adds stats into total. Integer sums, so the order shards finish in is irrelevant."""
+    for key, value in stats.items():
+        total[key] = total[key] + value
+    return total
+
+def run_shard(seed, panels, steps, fault_rates=FAULT_RATES, repair_rates=REPAIR_RATES):
+    """Simulates one shard of panels for steps steps and returns aggregated stats."""
+    rng = np.random.default_rng(seed)
+    batch = PanelBatch(panels)
+    rates = {**fault_rates, **repair_rates, 'operator': 1.0}
+    probabilities = np.array([rates[e] for e in EVENTS])[:, None]
+    event = {name: i for i, name in enumerate(EVENTS)}
+    motor_failed = np.zeros(panels, dtype=bool)
+    outage_start = np.full(panels, -1, dtype=np.int64)
+    was_closed = np.zeros(panels, dtype=bool)
+    stats = new_stats()
+
+    for t in range(steps):
+        fire = rng.random((len(EVENTS), panels)) < probabilities
+        def hit(name):
+            return fire[event[name]]
+
+        # Complete operations started on the previous step
+        closing = batch.breaker_state == BREAKER_CLOSING
+        if closing.any():
+            batch.finish_close(closing)
+            batch.spring_charged[closing & motor_failed] = False
+        tripping = (batch.breaker_state == BREAKER_TRIPPING) & batch.trip_signal_protection
+        if tripping.any():
+            batch.finish_protection_trip(tripping)
+
+        # Fault injection
+        stats['dc_loss_injected'] += int(batch.toggle_dc(hit('dc_loss') & batch.dc_ok).sum())
+        stats['tc_fail_injected'] += int(batch.toggle_tc_healthy(hit('tc_fail') & batch.tc_healthy).sum())
+        stats['pt_fail_injected'] += int(batch.toggle_bus_v_healthy(
+            hit('pt_fail') & batch.bus_voltage_healthy).sum())
+        new_motor_failures = hit('spring_fail') & ~motor_failed
+        motor_failed |= new_motor_failures
+        stats['spring_fail_injected'] += int(new_motor_failures.sum())
+        lockouts = batch.initiate_protection_trip(hit('protection_trip'))
+        stats['protection_trip_injected'] += int(lockouts.sum())
+        stats['k86_lockouts'] += int(lockouts.sum())
+
+        # Repairs
+        restored = batch.toggle_dc(hit('dc_restore') & ~batch.dc_ok)
+        batch.spring_charged[restored & motor_failed] = False
+        batch.toggle_tc_healthy(hit('tc_repair') & ~batch.tc_healthy)
+        batch.toggle_bus_v_healthy(hit('pt_repair') & ~batch.bus_voltage_healthy)
+        repaired = hit('spring_repair') & motor_failed
+        motor_failed &= ~repaired
+        batch._recharge_spring(repaired)
+        batch.reset_k86(hit('k86_reset'))
+
+        # Operator keeps every open breaker closed: drop K1, then pulse it again
+        idle = ((batch.breaker_state != BREAKER_CLOSED) & (batch.breaker_state != BREAKER_CLOSING)
+                & ~batch.operation_in_progress & hit('operator'))
+        batch.toggle_k1(idle & batch.k1_relay_energized)
+        attempted = idle & ~batch.k1_relay_energized & batch.dc_ok
+        closed = batch.toggle_k1(attempted)
+        batch.end_k1_pulse(attempted)
+        failed = attempted & ~closed
+        stats['close_attempts'] += int(attempted.sum())
+        stats['closes'] += int(closed.sum())
+        stats['failed_closes'] += int(failed.sum())
+        if failed.any():
+            for i, cause in enumerate(BLOCK_CAUSES.values()):
+                stats['block_causes'][i] += int((failed & cause(batch)).sum())
+
+        # Time-to-restore: from a CLOSED breaker opening until it is CLOSED again
+        is_closed = batch.breaker_state == BREAKER_CLOSED
+        outage_start[was_closed & ~is_closed] = t
+        back = is_closed & ~was_closed & (outage_start >= 0)
+        if back.any():
+            seconds = (t - outage_start[back]) * STEP_TIME
+            buckets = np.minimum(np.log2(np.maximum(seconds, 1)).astype(np.int64), RESTORE_BINS - 1)
+            stats['restore_time_hist'] += np.bincount(buckets, minlength=RESTORE_BINS)
+            stats['restores'] += int(back.sum())
+            stats['restore_time_total'] += int(seconds.sum())
+            outage_start[back] = -1
+        was_closed = is_closed
+
+    stats['steps'] = steps * panels
+    return stats
+
+def _run_shard_args(args):
+    return run_shard(*args)
+
+
+# --- Runner ---
+def shard_plan(master_seed, panels, shard_panels):
+    """(seed, panels) per shard. Depends only on the master seed and the shard
+    size, never on the worker count, so results are reproducible."""
+    sizes = [shard_panels] * (panels // shard_panels)
+    if panels % shard_panels:
+        sizes.append(panels % shard_panels)
+    seeds = np.random.SeedSequence(master_seed).spawn(len(sizes))
+    return list(zip(seeds, sizes))
+
+def run(master_seed=0, panels=10000, steps=3600, workers=None, shard_panels=1000):
+    """Runs all shards on a process pool and merges their stats."""
+    tasks = [(seed, size, steps) for seed, size in shard_plan(master_seed, panels, shard_panels)]
+    total = new_stats()
+    if workers == 1:
+        for task in tasks:
+            merge_stats(total, _run_shard_args(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for stats in pool.map(_run_shard_args, tasks):
+                merge_stats(total, stats)
+    return total
+
+def report(stats):
+    lines = [f"Panel-steps: {stats['steps']} ({STEP_TIME:g} s each)",
+             f"Close attempts: {stats['close_attempts']}, closed: {stats['closes']}, "
+             f"failed: {stats['failed_closes']}",
+             f"K86 lockouts: {stats['k86_lockouts']}"]
+    lines += [f"  {name}: {stats[f'{name}_injected']}" for name in FAULT_RATES]
+    lines.append("Failed closes by blocking interlock:")
+    lines += [f"  {name}: {count}" for name, count in zip(BLOCK_CAUSES, stats['block_causes']) if count]
+    if stats['restores']:
+        lines.append(f"Time to restore: {stats['restores']} outages, "
+                     f"mean {stats['restore_time_total'] / stats['restores']:.1f} s")
+        for i, count in enumerate(stats['restore_time_hist']):
+            if count:
+                upper = f"{2 ** (i + 1)} s" if i < RESTORE_BINS - 1 else "inf"
+                lines.append(f"  [{2 ** i} s, {upper}): {count}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Monte Carlo fault injection over many incomer panels.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--panels', type=int, default=10000)
+    parser.add_argument('--steps', type=int, default=3600)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shard-panels', type=int, default=1000)
+    args = parser.parse_args()
+    print(report(run(args.seed, args.panels, args.steps, args.workers, args.shard_panels)))
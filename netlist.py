@@ -0,0 +1,203 @@
+from collections import namedtuple
+
+from panel_state import FIELDS, LAYOUT, encode_value
+
+# --- Netlist Elements ---
+# A circuit is a series list of elements between DC+ and DC-. Element ids
+# are unique within their circuit; results are keyed 'circuit.id', and the
+# circuit id itself is its DC+ entry point.
+Contact = namedtuple('Contact', 'id field closed_on') # Closed while state[field] is (one of) closed_on
+Link = namedtuple('Link', 'id') # Always closed: MCBs, fixed selector positions
+Coil = namedtuple('Coil', 'id field picks_on', defaults=(None, None)) # Optional pickup condition
+Parallel = namedtuple('Parallel', 'id branches') # Each branch is an element or a series list
+
+def parallel(id, *branches):
+    return Parallel(id, tuple(branches))
+
+
+# --- Compiler ---
+class Netlist:
+    """ Control circuits declared as data and compiled into a flat program:
+    one instruction per element, in an order where every input is computed
+    before it is used, so a single pass yields the energization of every
+    branch.
+
+    An element is *live* when it is connected to an energized DC+ through
+    closed elements; a coil is live when energized (and, for coils with a
+    pickup condition, picked up), and elements after a coil carry its value.
+    The program is emitted as Python source and compiled twice: over a
+    packed PanelState integer and over PanelBatch columns (NumPy arrays),
+    with the same expressions.
+    """
+    def __init__(self, circuits, supply=('dc_ok', True)):
+        self.circuits = circuits
+        self.supply = supply
+        self.program = [] # (key, op, operands)
+        self.conditions = {} # contact / coil key -> (field, codes)
+        for name, elements in circuits.items():
+            self.program.append((name, 'supply', None))
+            self._series(name, name, elements)
+        self.keys = tuple(key for key, _, _ in self.program)
+        self._solve = self.compile()
+        self._solve_batch = self.compile(batch=True)
+
+    def _condition(self, key, field, values):
+        if not isinstance(values, tuple):
+            values = (values,)
+        self.conditions[key] = (field, tuple(encode_value(field, v) for v in values))
+
+    def _series(self, circuit, upstream, elements):
+        for element in elements:
+            upstream = self._element(circuit, upstream, element)
+        return upstream
+
+    def _element(self, circuit, upstream, element):
+        key = f'{circuit}.{element.id}'
+        if isinstance(element, Contact):
+            self._condition(key, element.field, element.closed_on)
+            self.program.append((key, 'and', upstream))
+        elif isinstance(element, Coil) and element.field is not None:
+            self._condition(key, element.field, element.picks_on)
+            self.program.append((key, 'and', upstream))
+        elif isinstance(element, (Link, Coil)):
+            self.program.append((key, 'copy', upstream))
+        elif isinstance(element, Parallel):
+            outputs = tuple(self._series(circuit, upstream, branch if isinstance(branch, list) else [branch])
+                            for branch in element.branches)
+            self.program.append((key, 'or', outputs))
+        else:
+            raise TypeError(f"unknown netlist element {element!r}")
+        return key
+
+    def fields(self, circuit=None):
+        """State fields read by one circuit (default: all of them)."""
+        fields = {self.supply[0]}
+        for key, (field, _) in self.conditions.items():
+            if circuit is None or key.split('.', 1)[0] == circuit:
+                fields.add(field)
+        return tuple(f for f in FIELDS if f in fields)
+
+    def _cone(self, targets):
+        """Keys of the instructions the targets depend on."""
+        needed = set(targets)
+        for key, op, operands in reversed(self.program):
+            if key in needed and op != 'supply':
+                needed.update(operands if op == 'or' else (operands,))
+        return needed
+
+    def source(self, targets=None, batch=False):
+        """Python source of the evaluation function for the targets (default: every key)."""
+        targets = tuple(targets) if targets is not None else self.keys
+        needed = self._cone(targets)
+        var = {key: f'v{i}' for i, key in enumerate(self.keys)}
+        fields = {}
+        body = []
+
+        def test(field, codes):
+            if batch: # Columns are loaded once, combined with & / |
+                if field not in fields:
+                    fields[field] = f'f{len(fields)}'
+                    body.insert(len(fields) - 1, f'    {fields[field]} = batch.{field}')
+                tests = [f'({fields[field]} == {code})' for code in codes]
+                return tests[0] if len(tests) == 1 else '(' + ' | '.join(tests) + ')'
+            # Scalar: extracted inline so and / or can short-circuit
+            shift, mask, _ = LAYOUT[field]
+            value = f'((bits >> {shift}) & {mask})'
+            return f'{value} == {codes[0]}' if len(codes) == 1 else f'{value} in {codes}'
+
+        conjunction, disjunction = (' & ', ' | ') if batch else (' and ', ' or ')
+        for key, op, operands in self.program:
+            if key not in needed:
+                continue
+            if op == 'supply':
+                expr = test(self.supply[0], (encode_value(*self.supply),))
+            elif op == 'or':
+                expr = disjunction.join(var[k] for k in operands)
+            elif op == 'copy':
+                var[key] = var[operands] # Same node, no instruction
+                continue
+            else:
+                expr = var[operands] + conjunction + test(*self.conditions[key])
+            body.append(f'    {var[key]} = {expr}')
+        body.append(f"    return {', '.join(var[k] for k in targets)}")
+        return f"def solve({'batch' if batch else 'bits'}):\n" + '\n'.join(body) + '\n'
+
+    def compile(self, targets=None, batch=False):
+        """Compiles the program for the targets into solve(bits) (or solve(batch)
+        for PanelBatch columns). One target returns a bool, several a tuple."""
+        namespace = {}
+        exec(compile(self.source(targets, batch), f'<netlist {targets or "all"}>', 'exec'), namespace)
+        return namespace['solve']
+
+    def solve(self, bits):
+        """Energization of every element for a packed state: key -> bool."""
+        return dict(zip(self.keys, self._solve(bits)))
+
+    def solve_batch(self, batch):
+        """Energization of every element over a PanelBatch: key -> bool array."""
+        return dict(zip(self.keys, self._solve_batch(batch)))
+
+    def contacts(self, bits):
+        """Position of every element: key -> closed (contacts and coil pickup
+        conditions per state; links and plain coils always closed)."""
+        return {key: self.closed(key, bits) for key, op, _ in self.program if op in ('and', 'copy')}
+
+    def closed(self, key, bits):
+        """Whether a contact (or coil pickup condition) is closed; links always are."""
+        if key not in self.conditions:
+            return True
+        field, codes = self.conditions[key]
+        shift, mask, _ = LAYOUT[field]
+        return (bits >> shift) & mask in codes
+
+
+# --- Incomer Panel ---
+INCOMER = Netlist({
+    'closing': [
+        Link('f4'),
+        Contact('ktc_no', 'ktc_state', 'ENERGIZED'),
+        Link('s6_remote'),
+        Contact('k1_no', 'k1_state', 'ENERGIZED'),
+        Contact('sr2_service', 'breaker_in_service', True),
+        Contact('bus_not_earthed', 'bus_not_earthed', True),
+        Contact('bus_v_ok', 'bus_voltage_healthy', True),
+        Contact('bc_nc', 'buscoupler_interlock_closed', True),
+        Contact('k86_nc', 'k86_state', 'RESET'),
+        Contact('k94_nc', 'k94_state', 'DE-ENERGIZED'), # Anti-pump
+        Contact('cb_52b', 'breaker_state', 'OPEN'),
+        Contact('spring', 'spring_charged', True),
+        Coil('cc_coil', 'breaker_state', 'CLOSING'),
+        Link('f5'),
+    ],
+    'tripping': [
+        Link('f6'),
+        parallel('trip_inputs',
+                 Contact('k2', 'trip_signal_k2', True),
+                 Contact('bc_kt', 'trip_signal_kt', True),
+                 Contact('bc_sync', 'trip_signal_sync', True),
+                 Contact('s2', 'trip_signal_s2', True),
+                 Contact('p127_uv', 'trip_signal_uv', True),
+                 Contact('bf', 'trip_signal_bf', True),
+                 Contact('k86_no', 'trip_signal_k86_no', True)),
+        Contact('cb_52a', 'breaker_state', 'CLOSED'),
+        Coil('tc1_coil'),
+        Link('f7'),
+    ],
+    'k86': [
+        Link('f8'),
+        parallel('k86_inputs',
+                 Contact('p127_rl1', 'trip_signal_protection', True),
+                 Contact('k64_ref', 'trip_signal_protection', True)),
+        Coil('k86_coil'),
+    ],
+    'aux': [
+        parallel('aux_relays',
+                 [Contact('remote_cmd', 'k1_relay_energized', True), Coil('k1_coil')],
+                 [Contact('p127_rl2', 'tc_healthy', True), Coil('ktc_coil')],
+                 [Contact('cb_52a', 'breaker_state', 'CLOSED'), Coil('k94_coil')]),
+    ],
+    'kdc': [
+        Coil('kdc_coil'),
+    ],
+})
+CLOSING_PERMISSIVE = 'closing.spring' # Everything in series ahead of the closing coil
@@ -0,0 +1,207 @@
+import numpy as np
+
+from panel_state import (
+    BREAKER_OPEN, BREAKER_CLOSING, BREAKER_CLOSED, BREAKER_TRIPPING,
+    FIELDS, INITIAL_STATE, TRIP_SIGNAL_FIELDS, DIRECT_TRIP_FLAGS, encode_value, decode_value,
+)
+from netlist import INCOMER, CLOSING_PERMISSIVE
+
+CLOSING_PERMISSIVE_BATCH = INCOMER.compile((CLOSING_PERMISSIVE,), batch=True)
+
+# --- Batch Panel Engine ---
+class PanelBatch:
+    """ Holds the state of N panels as NumPy columns and applies the
+    SwitchgearPanel logic as masked array operations over the whole batch.
+
+    Every action takes an optional boolean ``mask`` selecting the panels it is
+    applied to (default: all) and returns a boolean array of the panels where
+    the scalar method would have returned True / acted.
+    """
+    def __init__(self, n):
+        self.n = n
+        for field in FIELDS:
+            dtype = np.int8 if field == 'breaker_state' else np.bool_
+            setattr(self, field, np.zeros(n, dtype=dtype))
+        self._load_initial(np.ones(n, dtype=bool))
+        self._update_dependent_states()
+
+    def __len__(self):
+        return self.n
+
+    def _mask(self, mask):
+        if mask is None:
+            return np.ones(self.n, dtype=bool)
+        mask = np.asarray(mask)
+        if mask.dtype != np.bool_: # Index array
+            full = np.zeros(self.n, dtype=bool)
+            full[mask] = True
+            return full
+        return mask
+
+    def _load_initial(self, m):
+        for field in FIELDS:
+            getattr(self, field)[m] = encode_value(field, INITIAL_STATE[field])
+
+    def _update_dependent_states(self, mask=None):
+        m = self._mask(mask)
+        np.copyto(self.kdc_state, self.dc_ok, where=m)
+        np.copyto(self.dc_fail_alarm, ~self.dc_ok, where=m)
+        np.copyto(self.ktc_state, self.tc_healthy & self.dc_ok, where=m)
+        np.copyto(self.k94_state, (self.breaker_state == BREAKER_CLOSED) & self.dc_ok, where=m)
+        np.copyto(self.k1_state, self.k1_relay_energized & self.dc_ok, where=m)
+        np.copyto(self.trip_signal_k86_no, self.k86_state, where=m)
+
+    def reset_simulation(self, mask=None):
+        ok = self._mask(mask) & ~self.operation_in_progress
+        self._load_initial(ok)
+        self._update_dependent_states(ok)
+        return ok
+
+    def check_closing_interlocks(self, mask=None):
+        return self._mask(mask) & CLOSING_PERMISSIVE_BATCH(self)
+
+    def _recharge_spring(self, mask=None):
+        self.spring_charged[self._mask(mask) & self.dc_ok] = True
+
+    def attempt_close(self, mask=None):
+        ok = self.check_closing_interlocks(
+            self._mask(mask) & ~self.operation_in_progress & self.remote_close_command_active)
+        self.operation_in_progress[ok] = True
+        self.breaker_state[ok] = BREAKER_CLOSING
+        self.spring_charged[ok] = False
+        return ok
+
+    def finish_close(self, mask=None):
+        m = self._mask(mask)
+        self.breaker_state[m] = BREAKER_CLOSED
+        self._update_dependent_states(m)
+        self._recharge_spring(m)
+        self.operation_in_progress[m] = False
+
+    def _can_trip(self, mask):
+        return (self._mask(mask) & ~self.operation_in_progress &
+                (self.breaker_state == BREAKER_CLOSED) & self.dc_ok)
+
+    def initiate_direct_trip(self, source_flag_name, reason=None, mask=None):
+        if source_flag_name not in DIRECT_TRIP_FLAGS:
+            raise ValueError(f"unknown direct trip flag {source_flag_name!r}")
+        ok = self._can_trip(mask)
+        self.operation_in_progress[ok] = True
+        getattr(self, source_flag_name)[ok] = True
+        self.breaker_state[ok] = BREAKER_TRIPPING
+        return ok
+
+    def finish_direct_trip(self, source_flag_name, mask=None):
+        if source_flag_name not in DIRECT_TRIP_FLAGS:
+            raise ValueError(f"unknown direct trip flag {source_flag_name!r}")
+        m = self._mask(mask)
+        getattr(self, source_flag_name)[m] = False
+        self.breaker_state[m] = BREAKER_OPEN
+        self._update_dependent_states(m)
+        self.operation_in_progress[m] = False
+
+    def initiate_protection_trip(self, mask=None):
+        ok = self._can_trip(mask)
+        self.operation_in_progress[ok] = True
+        self.trip_signal_protection[ok] = True
+        self.k86_state[ok] = True
+        self.breaker_state[ok] = BREAKER_TRIPPING
+        self._update_dependent_states(ok)
+        return ok
+
+    def finish_protection_trip(self, mask=None):
+        m = self._mask(mask)
+        self.trip_signal_protection[m] = False
+        self.breaker_state[m] = BREAKER_OPEN
+        self._update_dependent_states(m)
+        self.operation_in_progress[m] = False
+
+    def reset_k86(self, mask=None):
+        ok = self._mask(mask) & ~self.operation_in_progress & self.k86_state & self.dc_ok
+        self.k86_state[ok] = False
+        self._update_dependent_states(ok)
+        return ok
+
+    # --- Toggle Methods ---
+    def toggle_dc(self, mask=None):
+        ok = self._mask(mask) & ~self.operation_in_progress
+        self.dc_ok[ok] = ~self.dc_ok[ok]
+        off = ok & ~self.dc_ok
+        self.k1_relay_energized[off] = False
+        self.remote_close_command_active[off] = False
+        for field in TRIP_SIGNAL_FIELDS:
+            getattr(self, field)[off] = False
+        self._update_dependent_states(ok)
+        self._recharge_spring(ok)
+        return ok
+
+    def toggle_tc_healthy(self, mask=None):
+        ok = self._mask(mask) & ~self.operation_in_progress & self.dc_ok
+        self.tc_healthy[ok] = ~self.tc_healthy[ok]
+        self._update_dependent_states(ok)
+        return ok
+
+    def toggle_k1(self, mask=None):
+        ok = self._mask(mask) & ~self.operation_in_progress & self.dc_ok
+        self.k1_relay_energized[ok] = ~self.k1_relay_energized[ok]
+        self._update_dependent_states(ok)
+        on = ok & self.k1_relay_energized
+        self.remote_close_command_active[on] = True
+        self.remote_close_command_active[ok & ~on] = False
+        return self.attempt_close(on)
+
+    def end_k1_pulse(self, mask=None):
+        self.remote_close_command_active[self._mask(mask)] = False
+
+    # --- Other Toggles (simplified: just flip state) ---
+    def _toggle_input(self, field, mask):
+        ok = self._mask(mask) & ~self.operation_in_progress
+        column = getattr(self, field)
+        column[ok] = ~column[ok]
+        self._update_dependent_states(ok)
+        return ok
+
+    def toggle_service_pos(self, mask=None):
+        return self._toggle_input('breaker_in_service', mask)
+
+    def toggle_bus_earth(self, mask=None):
+        return self._toggle_input('bus_not_earthed', mask)
+
+    def toggle_bus_v_healthy(self, mask=None):
+        return self._toggle_input('bus_voltage_healthy', mask)
+
+    def toggle_buscoupler_interlock(self, mask=None):
+        return self._toggle_input('buscoupler_interlock_closed', mask)
+
+    def toggle_pt_fail(self, phase, mask=None):
+        # SwitchgearPanel has no pt_ok_<phase> entries yet, so this only refreshes
+        ok = self._mask(mask) & ~self.operation_in_progress
+        self._update_dependent_states(ok)
+        return ok
+
+    # --- Conversion / Comparison with SwitchgearPanel ---
+    @classmethod
+    def from_panels(cls, panels):
+        """Builds a batch whose rows copy the state of the given panels."""
+        batch = cls(len(panels))
+        for i, panel in enumerate(panels):
+            batch.load_state(i, panel.state)
+        return batch
+
+    def load_state(self, i, state):
+        for field in FIELDS:
+            getattr(self, field)[i] = encode_value(field, state[field])
+
+    def state_dict(self, i):
+        """Returns row i in the SwitchgearPanel.state dict format."""
+        return {field: decode_value(field, getattr(self, field)[i]) for field in FIELDS}
+
+    def mismatches(self, panels):
+        """Lists (row, field, batch value, panel value) for every differing field."""
+        diffs = []
+        for i, panel in enumerate(panels):
+            row = self.state_dict(i)
+            for field in FIELDS:
+                if row[field] != panel.state[field]:
+                    diffs.append((i, field, row[field], panel.state[field]))
+        return diffs
@@ -0,0 +1,343 @@
+from collections import namedtuple
+
+from panel_state import PanelState, INITIAL_STATE, INITIAL_BITS, DIRECT_TRIP_FLAGS, fields_mask
+from netlist import INCOMER, CLOSING_PERMISSIVE
+from scheduler import DEFAULT_TIMINGS, K1_PULSE_TIME
+from journal import (
+    journal, RESET, SPRING_RECHARGING, SPRING_RECHARGED, CLOSING, CLOSE_BLOCKED, BREAKER_STATE,
+    DIRECT_TRIP, PROTECTION_TRIP, PROTECTION_TRIP_DONE, K86_RESET, DC_TOGGLED, TC_TOGGLED,
+    K1_TOGGLED, CLOSE_PULSE_START, CLOSE_PULSE_END, SERVICE_TOGGLED, BUS_EARTH_TOGGLED,
+    BUS_VOLTAGE_TOGGLED, BUSCOUPLER_TOGGLED, PT_TOGGLED,
+)
+
+# Panel logic only: no pygame, so workers, servers and tools import it
+# without SDL / font start-up. simulation.py renders it.
+
+# --- Derived State Graph ---
+# derived field -> (input fields, derivation). Listed in dependency order.
+def _energized(flag):
+    return 'ENERGIZED' if flag else 'DE-ENERGIZED'
+
+DERIVATIONS = {
+    'kdc_state': (('dc_ok',), lambda s: _energized(s['dc_ok'])),
+    'dc_fail_alarm': (('dc_ok',), lambda s: not s['dc_ok']),
+    'ktc_state': (('tc_healthy', 'dc_ok'), lambda s: _energized(s['tc_healthy'] and s['dc_ok'])),
+    'k94_state': (('breaker_state', 'dc_ok'), lambda s: _energized(s['breaker_state'] == 'CLOSED' and s['dc_ok'])),
+    'k1_state': (('k1_relay_energized', 'dc_ok'), lambda s: _energized(s['k1_relay_energized'] and s['dc_ok'])),
+    'trip_signal_k86_no': (('k86_state',), lambda s: s['k86_state'] == 'LATCHED'),
+}
+# (trigger mask, output mask, field, derivation). A derived field is also
+# recomputed when it was overwritten directly (e.g. toggle_dc clearing trip_signal_*).
+DERIVATION_GRAPH = [(fields_mask(inputs + (field,)), fields_mask((field,)), field, derive)
+                    for field, (inputs, derive) in DERIVATIONS.items()]
+
+# --- Panel Snapshot ---
+class PanelSnapshot(namedtuple('PanelSnapshot', 'bits version state live closed')):
+    """ Immutable per-tick view of a panel, computed by the logic layer and
+    the only thing the drawing functions read: decoded field values
+    (``state``), the energization of every netlist element (``live``) and
+    the position of every contact (``closed``), keyed 'circuit.id' as in
+    netlist.py. Plain data, so a renderer can run on another thread or
+    receive it pickled from another process. """
+    __slots__ = ()
+
+    @classmethod
+    def build(cls, bits, version, netlist):
+        return cls(bits, version, dict(PanelState(bits)), netlist.solve(bits), netlist.contacts(bits))
+
+# --- Switchgear Panel Logic Class ---
+class SwitchgearPanel:
+    """ Holds the state and logic, independent of Pygame.
+    With an EventScheduler, close/trip/recharge/K1-pulse completions are
+    scheduled on its virtual clock; without one the caller finishes them.
+    Messages go to the event journal (journal.py), tagged with panel_id.
+    The control circuits are the NETLIST (netlist.py); the closing permissive
+    and the PanelSnapshot handed to renderers are both solved from it.
+    ``timings`` (scheduler.OperationTimings) sets the close, trip and spring
+    charge durations, e.g. from mechanism.py's breaker model. """
+    NETLIST = INCOMER
+    _closing_permissive = staticmethod(INCOMER.compile((CLOSING_PERMISSIVE,)))
+
+    def __init__(self, scheduler=None, panel_id=0, timings=DEFAULT_TIMINGS):
+        self.initial_state = INITIAL_STATE # Shared, read-only
+        self.timings = timings
+        self.state = PanelState(INITIAL_BITS)
+        self.scheduler = scheduler
+        self.panel_id = panel_id
+        self._spring_charge_event = None
+        self._k1_pulse_event = None
+        self._operation_event = None # finish_close / finish_*_trip
+        self._subscribers = [] # (callback, field mask)
+        self._evaluated = None # Last PanelSnapshot, reused while the state is unchanged
+        self._settled_bits = ~self.state.bits # Everything counts as changed at first
+        self._update_dependent_states() # Initial update
+
+    def _update_dependent_states(self):
+        """Recomputes only the derived fields whose inputs changed since the
+        last call, then notifies subscribers of every changed field."""
+        changed = self.state.bits ^ self._settled_bits
+        if not changed:
+            return
+        for trigger_mask, output_mask, field, derive in DERIVATION_GRAPH:
+            if changed & trigger_mask:
+                before = self.state.bits
+                self.state[field] = derive(self.state)
+                if self.state.bits != before:
+                    changed |= output_mask # Lets later derivations depend on this one
+        self._notify_changes()
+
+    def _notify_changes(self):
+        changed = self.state.bits ^ self._settled_bits
+        self._settled_bits = self.state.bits
+        for callback, mask in self._subscribers:
+            if changed & mask:
+                callback(self, changed & mask)
+
+    def subscribe(self, callback, fields=None):
+        """Calls callback(panel, changed_mask) after state updates that touch
+        the given fields (default: all). See panel_state.changed_fields()."""
+        mask = fields_mask(fields) if fields is not None else -1
+        self._subscribers.append((callback, mask))
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(cb, mask) for cb, mask in self._subscribers if cb is not callback]
+
+    def reset_simulation(self):
+        if self.state['operation_in_progress']: return False
+        if journal.active: journal.record(RESET, self)
+        self.state.restore(INITIAL_BITS)
+        self._update_dependent_states()
+        return True
+
+    @property
+    def state_version(self):
+        """Increments on every state change; renderers compare it to skip frames."""
+        return self.state.version
+
+    def snapshot(self):
+        """Returns the whole panel state as one packed integer."""
+        return self.state.snapshot()
+
+    def restore(self, snapshot):
+        """Restores a state previously returned by snapshot()."""
+        self.state.restore(snapshot)
+
+    def cancel_pending(self):
+        """Cancels this panel's scheduled completions; other events on a shared
+        scheduler stay queued."""
+        for event in (self._operation_event, self._spring_charge_event, self._k1_pulse_event):
+            if event is not None:
+                self.scheduler.cancel(event)
+        self._operation_event = self._spring_charge_event = self._k1_pulse_event = None
+
+    def resume(self, elapsed):
+        """Schedules the completions of whatever is in progress in the current
+        state, e.g. after restoring a recorded one. elapsed(field) gives the
+        seconds since field last changed, which dates the start of each operation."""
+        if self.scheduler is None:
+            return
+        state, timings, schedule = self.state, self.timings, self.scheduler.schedule
+        breaker = state['breaker_state']
+        if breaker == 'CLOSING':
+            self._operation_event = schedule(max(timings.close - elapsed('breaker_state'), 0.0), self.finish_close)
+        elif breaker == 'TRIPPING':
+            if state['trip_signal_protection']:
+                self._operation_event = schedule(max(timings.protection_trip - elapsed('breaker_state'), 0.0),
+                                                 self.finish_protection_trip)
+            else:
+                for flag in DIRECT_TRIP_FLAGS:
+                    if state[flag]:
+                        self._operation_event = schedule(max(timings.direct_trip - elapsed('breaker_state'), 0.0),
+                                                         self.finish_direct_trip, flag)
+                        break
+        if not state['spring_charged'] and state['dc_ok'] and breaker != 'CLOSING':
+            # The motor started when the close finished, or when DC came back
+            charging = min(elapsed('spring_charged') - timings.close, elapsed('dc_ok'))
+            self._spring_charge_event = schedule(max(timings.spring_charge - max(charging, 0.0), 0.0),
+                                                 self._finish_spring_charge)
+        if state['remote_close_command_active']:
+            self._k1_pulse_event = schedule(max(K1_PULSE_TIME - elapsed('remote_close_command_active'), 0.0),
+                                            self.end_k1_pulse)
+
+    def check_closing_interlocks(self):
+        # Series path DC+ -> KTC NO -> K1 NO -> ... -> 52b NC -> spring, ahead of the CC coil
+        return self._closing_permissive(self.state.bits)
+
+    def evaluate(self):
+        """Returns the PanelSnapshot of the current state. Call once per tick,
+        after _update_dependent_states(); it is only rebuilt when the state changed."""
+        bits = self.state.bits
+        if self._evaluated is None or self._evaluated.bits != bits:
+            self._evaluated = PanelSnapshot.build(bits, self.state.version, self.NETLIST)
+        return self._evaluated
+
+    def _recharge_spring(self):
+        if not self.state['spring_charged'] and self.state['dc_ok']:
+            if self.scheduler is None:
+                if journal.active: journal.record(SPRING_RECHARGING, self)
+                self._finish_spring_charge()
+            elif self._spring_charge_event is None:
+                if journal.active: journal.record(SPRING_RECHARGING, self)
+                self._spring_charge_event = self.scheduler.schedule(self.timings.spring_charge, self._finish_spring_charge)
+
+    def _finish_spring_charge(self):
+        self._spring_charge_event = None
+        if self.state['dc_ok']: # Motor stops if DC is lost mid-charge
+            self.state['spring_charged'] = True
+            if journal.active: journal.record(SPRING_RECHARGED, self)
+
+    def attempt_close(self):
+        """Called when K1 pulse is active, attempts the close action."""
+        if self.state['operation_in_progress'] or not self.state['remote_close_command_active']:
+             return False # Don't close if busy or no active command
+
+        if self.check_closing_interlocks():
+            self.state['operation_in_progress'] = True
+            if journal.active: journal.record(CLOSING, self)
+            self.state['breaker_state'] = 'CLOSING'
+            self.state['spring_charged'] = False
+            if self.scheduler is not None:
+                self._operation_event = self.scheduler.schedule(self.timings.close, self.finish_close)
+            return True # Signal success
+        else:
+            if journal.active: journal.record(CLOSE_BLOCKED, self)
+            return False
+
+    def finish_close(self):
+        """Completes the closing sequence."""
+        self._operation_event = None
+        self.state['breaker_state'] = 'CLOSED'
+        self.state['operation_in_progress'] = False # Before notifying: subscribers see the settled state
+        self._update_dependent_states()
+        if journal.active: journal.record(BREAKER_STATE, self, self.state['breaker_state'])
+        self._recharge_spring()
+
+    def initiate_direct_trip(self, source_flag_name, reason):
+        if source_flag_name not in DIRECT_TRIP_FLAGS: # Checked before any state changes
+            raise ValueError(f"unknown direct trip flag {source_flag_name!r}")
+        if self.state['operation_in_progress'] or self.state['breaker_state'] != 'CLOSED' or not self.state['dc_ok']:
+            return False
+        self.state['operation_in_progress'] = True
+        if journal.active: journal.record(DIRECT_TRIP, self, source_flag_name, reason)
+        self.state[source_flag_name] = True # Activate the source flag
+        self.state['breaker_state'] = 'TRIPPING'
+        if self.scheduler is not None:
+            self._operation_event = self.scheduler.schedule(self.timings.direct_trip, self.finish_direct_trip,
+                                                            source_flag_name)
+        return True
+
+    def finish_direct_trip(self, source_flag_name):
+         self._operation_event = None
+         self.state[source_flag_name] = False # Deactivate flag
+         self.state['breaker_state'] = 'OPEN'
+         self.state['operation_in_progress'] = False
+         self._update_dependent_states()
+         if journal.active: journal.record(BREAKER_STATE, self, self.state['breaker_state'])
+
+    def initiate_protection_trip(self):
+        if self.state['operation_in_progress'] or self.state['breaker_state'] != 'CLOSED' or not self.state['dc_ok']:
+            return False
+        self.state['operation_in_progress'] = True
+        if journal.active: journal.record(PROTECTION_TRIP, self)
+        self.state['trip_signal_protection'] = True # K86 Coil path active
+        self.state['k86_state'] = 'LATCHED'
+        self.state['breaker_state'] = 'TRIPPING'
+        self._update_dependent_states() # Update K86_NO flag
+        if self.scheduler is not None:
+            self._operation_event = self.scheduler.schedule(self.timings.protection_trip, self.finish_protection_trip)
+        return True
+
+    def finish_protection_trip(self):
+        self._operation_event = None
+        self.state['trip_signal_protection'] = False
+        self.state['breaker_state'] = 'OPEN'
+        self.state['operation_in_progress'] = False
+        self._update_dependent_states()
+        if journal.active: journal.record(PROTECTION_TRIP_DONE, self, self.state['breaker_state'])
+
+    def reset_k86(self):
+        if self.state['operation_in_progress'] or self.state['k86_state'] == 'RESET' or not self.state['dc_ok']:
+            return False
+        self.state['k86_state'] = 'RESET'
+        self._update_dependent_states() # Update K86_NO flag
+        if journal.active: journal.record(K86_RESET, self)
+        return True
+
+    # --- Toggle Methods ---
+    def toggle_dc(self):
+        if self.state['operation_in_progress']: return
+        self.state['dc_ok'] = not self.state['dc_ok']
+        if journal.active: journal.record(DC_TOGGLED, self, self.state['dc_ok'])
+        if not self.state['dc_ok']:
+            self.state['k1_relay_energized'] = False
+            self.state['remote_close_command_active'] = False
+            for key in self.state:
+                if key.startswith('trip_signal_'): self.state[key] = False
+        self._update_dependent_states()
+        if self.state['dc_ok']: self._recharge_spring()
+
+    def toggle_tc_healthy(self):
+        if self.state['operation_in_progress'] or not self.state['dc_ok']: return
+        self.state['tc_healthy'] = not self.state['tc_healthy']
+        if journal.active: journal.record(TC_TOGGLED, self, self.state['tc_healthy'])
+        self._update_dependent_states() # Updates KTC
+
+    def toggle_k1(self):
+        """Toggles the K1 relay ON/OFF state"""
+        if self.state['operation_in_progress'] or not self.state['dc_ok']: return False
+        self.state['k1_relay_energized'] = not self.state['k1_relay_energized']
+        self._update_dependent_states() # Update k1_state
+        if journal.active: journal.record(K1_TOGGLED, self, self.state['k1_relay_energized'])
+        if self.state['k1_relay_energized']:
+             # If toggled ON, set the pulse flag and immediately check/attempt close
+             self.state['remote_close_command_active'] = True
+             if journal.active: journal.record(CLOSE_PULSE_START, self)
+             if self.scheduler is not None:
+                 if self._k1_pulse_event is not None: self.scheduler.cancel(self._k1_pulse_event)
+                 self._k1_pulse_event = self.scheduler.schedule(K1_PULSE_TIME, self.end_k1_pulse)
+             return self.attempt_close() # Return true if close starts
+        else:
+            # If toggled OFF, ensure pulse flag is also off
+            self.state['remote_close_command_active'] = False
+            return False # No close action on toggle off
+
+    def end_k1_pulse(self):
+         """Called after a delay when K1 is toggled ON"""
+         self._k1_pulse_event = None
+         self.state['remote_close_command_active'] = False
+         if journal.active: journal.record(CLOSE_PULSE_END, self)
+
+
+    # --- Other Toggles (simplified: just flip state) ---
+    def toggle_service_pos(self):
+        if self.state['operation_in_progress']: return
+        self.state['breaker_in_service'] = not self.state['breaker_in_service']
+        if journal.active: journal.record(SERVICE_TOGGLED, self, self.state['breaker_in_service'])
+        self._update_dependent_states()
+
+    def toggle_bus_earth(self):
+        if self.state['operation_in_progress']: return
+        self.state['bus_not_earthed'] = not self.state['bus_not_earthed']
+        if journal.active: journal.record(BUS_EARTH_TOGGLED, self, self.state['bus_not_earthed'])
+        self._update_dependent_states()
+
+    def toggle_bus_v_healthy(self):
+        if self.state['operation_in_progress']: return
+        self.state['bus_voltage_healthy'] = not self.state['bus_voltage_healthy']
+        if journal.active: journal.record(BUS_VOLTAGE_TOGGLED, self, self.state['bus_voltage_healthy'])
+        self._update_dependent_states()
+
+    def toggle_buscoupler_interlock(self):
+        if self.state['operation_in_progress']: return
+        self.state['buscoupler_interlock_closed'] = not self.state['buscoupler_interlock_closed']
+        if journal.active: journal.record(BUSCOUPLER_TOGGLED, self, self.state['buscoupler_interlock_closed'])
+        self._update_dependent_states()
+
+    def toggle_pt_fail(self, phase):
+         if self.state['operation_in_progress']: return
+         pt_key = f'pt_ok_{phase}'
+         if pt_key in self.state:
+              self.state[pt_key] = not self.state[pt_key]
+              if journal.active: journal.record(PT_TOGGLED, self, phase, self.state[pt_key])
+         self._update_dependent_states()
@@ -0,0 +1,132 @@
+from collections.abc import MutableMapping
+
+# --- State Encoding ---
+# String states of SwitchgearPanel are stored as small integer / bool codes.
+BREAKER_STATES = ('OPEN', 'CLOSING', 'CLOSED', 'TRIPPING')
+BREAKER_OPEN, BREAKER_CLOSING, BREAKER_CLOSED, BREAKER_TRIPPING = range(4)
+K86_STATES = ('RESET', 'LATCHED') # Code 1 when LATCHED
+RELAY_STATES = ('DE-ENERGIZED', 'ENERGIZED') # Code 1 when ENERGIZED
+
+ENUM_FIELDS = {
+    'breaker_state': BREAKER_STATES, 'k86_state': K86_STATES,
+    'kdc_state': RELAY_STATES, 'ktc_state': RELAY_STATES,
+    'k1_state': RELAY_STATES, 'k94_state': RELAY_STATES,
+}
+
+INITIAL_STATE = {
+    'breaker_state': 'OPEN', 'k86_state': 'RESET', 'kdc_state': 'ENERGIZED',
+    'spring_charged': True, 'dc_ok': True, 'dc_fail_alarm': False,
+    'tc_healthy': True, 'breaker_in_service': True, 'bus_not_earthed': True,
+    'bus_voltage_healthy': True, 'buscoupler_interlock_closed': True,
+    'ktc_state': 'ENERGIZED', 'k1_relay_energized': False, 'k1_state': 'DE-ENERGIZED',
+    'k94_state': 'DE-ENERGIZED',
+    'remote_close_command_active': False, 'trip_signal_s2': False, 'trip_signal_k2': False,
+    'trip_signal_kt': False, 'trip_signal_sync': False, 'trip_signal_uv': False,
+    'trip_signal_bf': False, 'trip_signal_protection': False, # K86 Coil path
+    'trip_signal_k86_no': False, # K86 NO contact state for trip path
+    'operation_in_progress': False
+}
+FIELDS = tuple(INITIAL_STATE)
+TRIP_SIGNAL_FIELDS = tuple(f for f in FIELDS if f.startswith('trip_signal_'))
+# Source flags initiate_direct_trip() accepts; the other two are driven by K86
+DIRECT_TRIP_FLAGS = tuple(f for f in TRIP_SIGNAL_FIELDS
+                          if f not in ('trip_signal_protection', 'trip_signal_k86_no'))
+
+
+def encode_value(field, value):
+    """Converts a SwitchgearPanel state value to its integer code."""
+    if field in ENUM_FIELDS:
+        return ENUM_FIELDS[field].index(value)
+    return 1 if value else 0
+
+def decode_value(field, code):
+    """Converts an integer code back to the SwitchgearPanel state value."""
+    if field in ENUM_FIELDS:
+        return ENUM_FIELDS[field][int(code)]
+    return bool(code)
+
+
+# --- Bit Layout ---
+# field -> (shift, mask, decoded values or None for plain bools)
+LAYOUT = {}
+STATE_BITS = 0
+for _field in FIELDS:
+    _width = (len(ENUM_FIELDS[_field]) - 1).bit_length() if _field in ENUM_FIELDS else 1
+    LAYOUT[_field] = (STATE_BITS, (1 << _width) - 1, ENUM_FIELDS.get(_field))
+    STATE_BITS += _width
+_ENCODE = {field: {value: code for code, value in enumerate(values)}
+           for field, values in ENUM_FIELDS.items()}
+
+def pack_state(state):
+    """Packs a state mapping into a single integer."""
+    bits = 0
+    for field in FIELDS:
+        bits |= encode_value(field, state[field]) << LAYOUT[field][0]
+    return bits
+
+INITIAL_BITS = pack_state(INITIAL_STATE)
+
+def fields_mask(fields):
+    """Bit mask covering the given fields."""
+    mask = 0
+    for field in fields:
+        shift, width_mask, _ = LAYOUT[field]
+        mask |= width_mask << shift
+    return mask
+
+def changed_fields(mask):
+    """Names of the fields touched by a bit mask (e.g. old_bits ^ new_bits)."""
+    return [field for field in FIELDS if mask & (LAYOUT[field][1] << LAYOUT[field][0])]
+
+
+# --- Compact Panel State ---
+class PanelState(MutableMapping):
+    """ Panel state packed into one integer, with a dict-like view so
+    existing ``panel.state['...']`` reads and writes keep working.
+    ``snapshot()`` / ``restore()`` are O(1) since the whole state is one int.
+    ``version`` increments whenever a write actually changes the bits.
+    """
+    __slots__ = ('bits', 'version')
+
+    def __init__(self, bits=INITIAL_BITS):
+        self.bits = bits
+        self.version = 0
+
+    def __getitem__(self, key):
+        shift, mask, values = LAYOUT[key]
+        code = (self.bits >> shift) & mask
+        return values[code] if values else bool(code)
+
+    def __setitem__(self, key, value):
+        shift, mask, values = LAYOUT[key]
+        code = _ENCODE[key][value] if values else (1 if value else 0)
+        bits = (self.bits & ~(mask << shift)) | (code << shift)
+        if bits != self.bits:
+            self.bits = bits
+            self.version += 1
+
+    def __delitem__(self, key):
+        raise TypeError("PanelState fields cannot be deleted")
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __contains__(self, key):
+        return key in LAYOUT
+
+    def __repr__(self):
+        return f"PanelState({dict(self)!r})"
+
+    def snapshot(self):
+        return self.bits
+
+    def restore(self, bits):
+        if bits != self.bits:
+            self.bits = bits
+            self.version += 1
+
+    def copy(self):
+        return PanelState(self.bits)
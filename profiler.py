@@ -0,0 +1,100 @@
+import json
+import time
+from collections import deque
+
+LOG2_BUCKETS = 32 # Cumulative histogram buckets: [2^i, 2^(i+1)) microseconds
+
+
+# --- Frame Profiler ---
+class SpanStats:
+    __slots__ = ('window', 'count', 'total_ns', 'max_ns', 'buckets')
+
+    def __init__(self, window):
+        self.window = deque(maxlen=window) # Recent durations (ns) for p50/p99
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * LOG2_BUCKETS
+
+    def add(self, ns):
+        self.window.append(ns)
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.buckets[min((ns // 1000).bit_length(), LOG2_BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        """q-th percentile (ms) of the rolling window."""
+        if not self.window:
+            return 0.0
+        ordered = sorted(self.window)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))] / 1e6
+
+class FrameProfiler:
+    """ Named timing spans (draw sections, event handling, state update,
+    display update) with a rolling window for p50/p99 and a cumulative log2
+    histogram for offline analysis. Disabled by default: start() / stop()
+    return immediately until ``enabled`` is set.
+    """
+    def __init__(self, window=300, frame_budget=1 / 30):
+        self.enabled = False
+        self.window = window
+        self.frame_budget = frame_budget
+        self.reset()
+
+    def reset(self):
+        self.spans = {} # name -> SpanStats, in first-seen order
+        self.frame_times = deque(maxlen=self.window) # perf_counter() at each frame end
+        self.frames = 0
+        self.dropped = 0
+        self._frame_start = None
+
+    def start(self):
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def stop(self, name, start):
+        if self.enabled and start: # start is 0 if profiling was off when the span began
+            self.add(name, time.perf_counter_ns() - start)
+
+    def add(self, name, ns):
+        stats = self.spans.get(name)
+        if stats is None:
+            stats = self.spans[name] = SpanStats(self.window)
+        stats.add(ns)
+
+    def begin_frame(self):
+        self._frame_start = self.start()
+
+    def end_frame(self):
+        """Closes the 'frame' span; frames whose work exceeded the budget count as dropped."""
+        if not self.enabled or not self._frame_start:
+            return
+        ns = time.perf_counter_ns() - self._frame_start
+        self.add('frame', ns)
+        self.frames += 1
+        if ns > self.frame_budget * 1e9:
+            self.dropped += 1
+        self.frame_times.append(time.perf_counter())
+
+    @property
+    def fps(self):
+        if len(self.frame_times) < 2:
+            return 0.0
+        return (len(self.frame_times) - 1) / (self.frame_times[-1] - self.frame_times[0])
+
+    def summary(self):
+        """Per-span statistics (times in ms) plus frame counters."""
+        spans = {}
+        for name, stats in self.spans.items():
+            spans[name] = {'count': stats.count, 'mean_ms': stats.total_ns / stats.count / 1e6,
+                           'p50_ms': stats.percentile(50), 'p99_ms': stats.percentile(99),
+                           'max_ms': stats.max_ns / 1e6, 'log2_us_buckets': stats.buckets}
+        return {'frames': self.frames, 'dropped': self.dropped, 'fps': self.fps,
+                'frame_budget_ms': self.frame_budget * 1000, 'spans': spans}
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+profiler = FrameProfiler()
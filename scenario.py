@@ -0,0 +1,196 @@
+import bisect
+import argparse
+
+from journal import journal
+from panel_state import DIRECT_TRIP_FLAGS
+from scheduler import EventScheduler
+from panel_logic import SwitchgearPanel
+
+# --- Scenario Format ---
+# One event per line: "<seconds> <action> [args...]", '#' starts a comment.
+#   0.5 toggle_k1
+#   3.0 initiate_direct_trip trip_signal_k2 K2
+#   8.0 reset_k86
+# Times are non-decreasing. Arguments are whitespace separated.
+# Completion steps (finish_*, spring recharge, K1 pulse end) are not scripted,
+# the panel schedules them itself.
+
+# action -> number of arguments
+SCENARIO_ACTIONS = {
+    'reset_simulation': 0, 'attempt_close': 0, 'toggle_k1': 0, 'end_k1_pulse': 0,
+    'initiate_direct_trip': 2, 'initiate_protection_trip': 0, 'reset_k86': 0,
+    'toggle_dc': 0, 'toggle_tc_healthy': 0, 'toggle_service_pos': 0, 'toggle_bus_earth': 0,
+    'toggle_bus_v_healthy': 0, 'toggle_buscoupler_interlock': 0, 'toggle_pt_fail': 1,
+}
+
+
+def parse_line(line, lineno=0):
+    """Returns (time, action, args), or None for blank and comment lines."""
+    if isinstance(line, bytes):
+        line = line.decode()
+    fields = line.split('#', 1)[0].split()
+    if not fields:
+        return None
+    if len(fields) < 2:
+        raise ValueError(f"line {lineno}: expected '<time> <action> [args...]'")
+    try:
+        when = float(fields[0])
+    except ValueError:
+        raise ValueError(f"line {lineno}: bad time {fields[0]!r}") from None
+    action, args = fields[1], tuple(fields[2:])
+    if action not in SCENARIO_ACTIONS:
+        raise ValueError(f"line {lineno}: unknown action {action!r}")
+    if len(args) != SCENARIO_ACTIONS[action]:
+        raise ValueError(f"line {lineno}: {action} takes {SCENARIO_ACTIONS[action]} argument(s)")
+    if action == 'initiate_direct_trip' and args[0] not in DIRECT_TRIP_FLAGS:
+        raise ValueError(f"line {lineno}: unknown direct trip flag {args[0]!r}")
+    return when, action, args
+
+def format_event(when, action, *args):
+    return ' '.join((f"{when:.6g}", action) + tuple(str(a) for a in args))
+
+def read_scenario(stream):
+    """Lazily yields (time, action, args) from a text or binary stream."""
+    for lineno, line in enumerate(stream, 1):
+        event = parse_line(line, lineno)
+        if event is not None:
+            yield event
+
+def write_scenario(stream, events):
+    """Writes (time, action, *args) tuples, e.g. frame_export.DEMO_SCENARIO."""
+    for when, action, *args in events:
+        stream.write(format_event(when, action, *args) + '\n')
+
+
+# --- Live Playback ---
+def feed(scheduler, panel, events):
+    """Schedules a scenario stream one event at a time, so only the next event
+    is held in memory. Used by the GUI, which advances the clock in real time."""
+    events = iter(events)
+    def fire(action, args):
+        getattr(panel, action)(*args)
+        schedule_next()
+    def schedule_next():
+        for when, action, args in events:
+            scheduler.schedule(max(0.0, when - scheduler.now), fire, action, args)
+            return
+    schedule_next()
+
+
+# --- Streaming Replay ---
+class ScenarioReplay:
+    """ Replays a scenario file against a SwitchgearPanel in constant memory.
+
+    ``speed`` is None for max speed, 1.0 for real time, or any other scale.
+    Every ``checkpoint_interval`` seconds of scenario time, once no completion
+    is pending, the packed panel state and the file offset are recorded so
+    ``seek()`` can jump back without replaying from the start.
+    """
+    def __init__(self, path, panel=None, checkpoint_interval=10.0):
+        self.path = path
+        self.panel = panel or SwitchgearPanel(EventScheduler())
+        self.scheduler = self.panel.scheduler
+        if self.scheduler is None:
+            raise ValueError("ScenarioReplay needs a panel with an EventScheduler")
+        self.checkpoint_interval = checkpoint_interval
+        # (time, offset, lineno, panel snapshot), ascending; starts at the panel's state
+        self.checkpoints = [(0.0, 0, 0, self.panel.snapshot())]
+        self._file = open(path, 'rb')
+        self._restore(self.checkpoints[0])
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def now(self):
+        return self.scheduler.now
+
+    def _peek(self):
+        while self._pending is None:
+            line = self._file.readline()
+            if not line:
+                return None
+            self._lineno += 1
+            event = parse_line(line, self._lineno)
+            if event is not None:
+                if event[0] < self._last_time:
+                    raise ValueError(f"line {self._lineno}: time goes backwards")
+                self._pending = event
+        return self._pending
+
+    def _apply(self, event):
+        when, action, args = event
+        self.scheduler.run_until(when)
+        result = getattr(self.panel, action)(*args)
+        self._pending = None
+        self._offset = self._file.tell()
+        self._last_time = when
+        if when >= self.checkpoints[-1][0] + self.checkpoint_interval and not len(self.scheduler):
+            self.checkpoints.append((when, self._offset, self._lineno, self.panel.snapshot()))
+        return result
+
+    def _restore(self, checkpoint):
+        when, offset, lineno, bits = checkpoint
+        self.panel.cancel_pending()
+        self.scheduler.reset(when)
+        self.panel.restore(bits)
+        self.panel._update_dependent_states()
+        self._file.seek(offset)
+        self._offset, self._lineno, self._last_time = offset, lineno, when
+        self._pending = None
+
+    def events(self, speed=None, until=None):
+        """Generator applying each event (up to time until) as it is consumed.
+        Yields (time, action, args, result)."""
+        while True:
+            event = self._peek()
+            if event is None or (until is not None and event[0] > until):
+                break
+            if speed is not None:
+                self.scheduler.run(until=event[0], realtime=True, speed=speed)
+            yield event + (self._apply(event),)
+        if until is not None:
+            self.scheduler.run(until=until, realtime=speed is not None, speed=speed or 1.0)
+
+    def play(self, speed=None, until=None):
+        """Replays to the end (or until); returns the number of events applied."""
+        return sum(1 for _ in self.events(speed, until))
+
+    def seek(self, when):
+        """Moves the replay to scenario time when, restoring the nearest earlier
+        checkpoint if when lies behind the current position."""
+        if when < self.now:
+            i = bisect.bisect_right(self.checkpoints, when, key=lambda c: c[0])
+            self._restore(self.checkpoints[max(i - 1, 0)])
+        self.play(until=when)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a scenario file against the incomer panel.")
+    parser.add_argument('path')
+    parser.add_argument('--speed', type=float, default=None, help="1 = real time (default: max speed)")
+    parser.add_argument('--seek', type=float, default=None, help="start at this scenario time")
+    parser.add_argument('--verbose', action='store_true', help="print panel messages")
+    parser.add_argument('--journal', metavar='FILE', help="write the panel event journal to FILE as JSONL")
+    args = parser.parse_args()
+
+    journal.configure(enabled=args.journal is not None, console=args.verbose)
+    out = open(args.journal, 'w') if args.journal else None
+    count = 0
+    with ScenarioReplay(args.path) as replay:
+        if args.seek is not None:
+            replay.seek(args.seek)
+        for _ in replay.events(args.speed):
+            count += 1
+            if out and len(journal) >= journal.size // 2:
+                journal.drain_jsonl(out)
+    if out:
+        journal.drain_jsonl(out)
+        out.close()
+    print(f"{count} events replayed, t = {replay.now:.3f} s, breaker {replay.panel.state['breaker_state']}")
@@ -0,0 +1,85 @@
+import heapq
+import itertools
+import time
+from collections import namedtuple
+
+# --- Operation Timings (seconds, matching incomer.html setTimeout delays) ---
+CLOSE_TIME = 0.6
+DIRECT_TRIP_TIME = 0.6
+PROTECTION_TRIP_TIME = 0.8
+SPRING_CHARGE_TIME = 1.5
+K1_PULSE_TIME = 0.25
+
+# Per-panel mechanism timings; mechanism.py computes them from a breaker model
+OperationTimings = namedtuple('OperationTimings', 'close direct_trip protection_trip spring_charge')
+DEFAULT_TIMINGS = OperationTimings(CLOSE_TIME, DIRECT_TRIP_TIME, PROTECTION_TRIP_TIME, SPRING_CHARGE_TIME)
+
+
+# --- Discrete-Event Scheduler ---
+class EventScheduler:
+    """ Priority queue of timed callbacks driven by a virtual clock (seconds).
+
+    The clock only moves when the scheduler is advanced, so the same panel logic
+    runs in real time under the GUI and as fast as possible in batch runs.
+    """
+    def __init__(self, start=0.0):
+        self.now = start
+        self._queue = [] # [time, seq, callback, args]; callback None when cancelled
+        self._seq = itertools.count()
+
+    def schedule(self, delay, callback, *args):
+        """Runs callback(*args) delay seconds after the current virtual time."""
+        event = [self.now + delay, next(self._seq), callback, args]
+        heapq.heappush(self._queue, event)
+        return event
+
+    def cancel(self, event):
+        event[2] = None
+
+    def reset(self, now=0.0):
+        """Drops every pending event and moves the clock to now."""
+        self._queue.clear()
+        self.now = now
+
+    def next_deadline(self):
+        queue = self._queue
+        while queue and queue[0][2] is None:
+            heapq.heappop(queue)
+        return queue[0][0] if queue else None
+
+    def __len__(self):
+        return sum(1 for event in self._queue if event[2] is not None)
+
+    def run_until(self, until):
+        """Fires every event due at or before until, in time order."""
+        queue = self._queue
+        while queue and queue[0][0] <= until:
+            when, _, callback, args = heapq.heappop(queue)
+            if callback is None:
+                continue
+            self.now = when
+            callback(*args)
+        self.now = max(self.now, until)
+
+    def advance(self, dt):
+        self.run_until(self.now + dt)
+
+    def run(self, until=None, realtime=False, speed=1.0):
+        """Drains the queue (up to until). In realtime mode the virtual clock is
+        paced against the wall clock, scaled by speed."""
+        wall_start, virtual_start = time.monotonic(), self.now
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or (until is not None and deadline > until):
+                break
+            if realtime:
+                delay = (deadline - virtual_start) / speed - (time.monotonic() - wall_start)
+                if delay > 0:
+                    time.sleep(delay)
+            self.run_until(deadline)
+        if until is not None:
+            if realtime:
+                delay = (until - virtual_start) / speed - (time.monotonic() - wall_start)
+                if delay > 0:
+                    time.sleep(delay)
+            self.run_until(until)
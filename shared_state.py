@@ -0,0 +1,225 @@
+import time
+import zlib
+import random
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from panel_state import LAYOUT, STATE_BITS
+from netlist import INCOMER
+from panel_logic import PanelSnapshot, SwitchgearPanel
+from scheduler import EventScheduler
+
+# Imports no pygame: the simulation process never loads SDL. Viewers import
+# simulation (the renderer) themselves.
+
+# --- Block Layout ---
+# Header of HEADER_SLOTS uint64 words, then one uint64 of packed PanelState
+# bits per panel. SEQ is the seqlock: odd while the writer is inside a publish.
+MAGIC = 0x5357474C41594F55
+LAYOUT_ID = zlib.crc32(repr(sorted(LAYOUT.items())).encode()) # Viewers refuse a different bit layout
+HEADER_SLOTS = 8
+MAGIC_SLOT, LAYOUT_SLOT, PANELS_SLOT, SEQ_SLOT, TIME_SLOT, STOP_SLOT = range(6)
+assert STATE_BITS <= 64
+
+
+# --- Shared Panel State ---
+class SharedPanelState:
+    """ Packed state of many panels in one multiprocessing.shared_memory
+    block, written by one simulation process and read zero-copy by any
+    number of viewer processes.
+
+    publish() is a seqlock write: SEQ is made odd, the changed panels and
+    the virtual time are stored, then SEQ is made even again. Readers copy
+    what they need and retry if SEQ was odd or changed meanwhile, so they
+    never see half a publish and never block the writer. Element stores are
+    aligned 64-bit writes; like any Python seqlock this relies on the
+    platform's store ordering (x86-64 / TSO).
+    """
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        header = np.ndarray((HEADER_SLOTS,), np.uint64, shm.buf)
+        if header[MAGIC_SLOT] != MAGIC or header[LAYOUT_SLOT] != LAYOUT_ID:
+            raise ValueError(f"{shm.name} is not a panel state block of this layout")
+        self.panels = int(header[PANELS_SLOT])
+        self._header = header
+        self._time = np.ndarray((1,), np.float64, shm.buf, TIME_SLOT * 8)
+        self._bits = np.ndarray((self.panels,), np.uint64, shm.buf, HEADER_SLOTS * 8)
+        self._dirty = {} # panel index -> panel, for publish()
+
+    @classmethod
+    def create(cls, panels, name=None):
+        shm = shared_memory.SharedMemory(name, create=True, size=(HEADER_SLOTS + panels) * 8)
+        header = np.ndarray((HEADER_SLOTS,), np.uint64, shm.buf)
+        header[:] = 0
+        header[MAGIC_SLOT], header[LAYOUT_SLOT], header[PANELS_SLOT] = MAGIC, LAYOUT_ID, panels
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, untrack=True):
+        """Attaches to an existing block. Only the creator unlinks it, so the
+        block is removed from this process's resource tracker; pass
+        untrack=False in processes spawned by the creator, which share its tracker."""
+        shm = shared_memory.SharedMemory(name)
+        if untrack:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self._header = self._time = self._bits = None # Release the buffer exports first
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # --- Writer ---
+    def track(self, panels, first=0):
+        """Publishes panels[k] as index first + k; only changed panels are rewritten."""
+        for index, panel in enumerate(panels, first):
+            def changed(panel, mask, index=index):
+                self._dirty[index] = panel
+            panel.subscribe(changed)
+            self._dirty[index] = panel
+
+    def publish(self, now):
+        header, bits = self._header, self._bits
+        header[SEQ_SLOT] += 1
+        for index, panel in self._dirty.items():
+            bits[index] = panel.state.bits
+        self._time[0] = now
+        header[SEQ_SLOT] += 1
+        self._dirty.clear()
+
+    @property
+    def stop_requested(self):
+        return bool(self._header[STOP_SLOT])
+
+    def request_stop(self):
+        self._header[STOP_SLOT] = 1
+
+    # --- Readers ---
+    def _consistent(self, read):
+        header = self._header
+        while True:
+            seq = int(header[SEQ_SLOT])
+            if not seq & 1:
+                value = read()
+                if int(header[SEQ_SLOT]) == seq:
+                    return seq, value
+
+    def read(self):
+        """Returns (seq, virtual time, copy of every panel's bits)."""
+        seq, (now, bits) = self._consistent(lambda: (float(self._time[0]), self._bits.copy()))
+        return seq, now, bits
+
+    def read_panel(self, index):
+        """Returns (seq, virtual time, bits) for one panel."""
+        seq, (now, bits) = self._consistent(lambda: (float(self._time[0]), int(self._bits[index])))
+        return seq, now, bits
+
+    def snapshot(self, index, netlist=INCOMER):
+        """PanelSnapshot of one panel for a renderer; version is the block's seq."""
+        seq, _, bits = self.read_panel(index)
+        return PanelSnapshot.build(bits, seq, netlist)
+
+
+# --- Simulation Process ---
+SIM_ACTIONS = ('toggle_k1', 'toggle_k1', 'initiate_protection_trip', 'reset_k86', 'toggle_bus_v_healthy')
+
+def simulate(name, step=0.01, actions_per_step=10, seed=0, untrack=True):
+    """Steps every panel of the block as fast as possible: random operator
+    actions, then the virtual clock advances by step and changes are published.
+    Runs until a viewer calls request_stop()."""
+    shared = SharedPanelState.attach(name, untrack)
+    scheduler = EventScheduler()
+    panels = [SwitchgearPanel(scheduler, i) for i in range(shared.panels)]
+    shared.track(panels)
+    rng = random.Random(seed)
+    try:
+        while not shared.stop_requested:
+            for _ in range(actions_per_step):
+                getattr(rng.choice(panels), rng.choice(SIM_ACTIONS))()
+            scheduler.advance(step)
+            for panel in panels:
+                panel._update_dependent_states()
+            shared.publish(scheduler.now)
+    finally:
+        shared.close()
+
+
+# --- Viewer ---
+def view(name, index=0, seconds=None, fps=30, untrack=True):
+    """Renders one panel of the block at fps; returns frame statistics."""
+    import pygame
+    from simulation import SCREEN_WIDTH, SCREEN_HEIGHT, SchematicRenderer, init_pygame
+    init_pygame()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption(f"11kV Incomer Simulation - shared panel {index}")
+    shared = SharedPanelState.attach(name, untrack)
+    renderer = SchematicRenderer(screen)
+    clock = pygame.time.Clock()
+    frames = late = 0
+    start = time.perf_counter()
+    _, sim_start, _ = shared.read_panel(index)
+    try:
+        while seconds is None or time.perf_counter() - start < seconds:
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                break
+            frame_start = time.perf_counter()
+            dirty = renderer.render(shared.snapshot(index))
+            if dirty:
+                pygame.display.update(dirty)
+            frames += 1
+            late += time.perf_counter() - frame_start > 1 / fps
+            clock.tick(fps)
+        _, sim_end, _ = shared.read_panel(index)
+    finally:
+        shared.close()
+    elapsed = time.perf_counter() - start
+    return {'frames': frames, 'fps': frames / elapsed, 'late_frames': late,
+            'simulated_seconds': sim_end - sim_start, 'realtime_factor': (sim_end - sim_start) / elapsed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Shared-memory panel state: simulation and viewer processes.")
+    sub = parser.add_subparsers(dest='mode', required=True)
+    run = sub.add_parser('simulate', help="create the block and simulate into it until interrupted")
+    run.add_argument('--name', default='incomer_panels')
+    run.add_argument('--panels', type=int, default=1000)
+    watch = sub.add_parser('view', help="render one panel of a running simulation")
+    watch.add_argument('--name', default='incomer_panels')
+    watch.add_argument('--panel', type=int, default=0)
+    demo = sub.add_parser('demo', help="simulation process + viewer in this process, with statistics")
+    demo.add_argument('--panels', type=int, default=1000)
+    demo.add_argument('--panel', type=int, default=0)
+    demo.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.mode == 'view':
+        print(view(args.name, args.panel))
+    else:
+        shared = SharedPanelState.create(args.panels, getattr(args, 'name', None))
+        try:
+            if args.mode == 'simulate':
+                print(f"simulating {args.panels} panels into shared memory {shared.name!r}", flush=True)
+                try:
+                    simulate(shared.name, untrack=False) # The creating process keeps its tracker registration
+                except KeyboardInterrupt:
+                    pass
+            else:
+                process = multiprocessing.get_context('spawn').Process(target=simulate, args=(shared.name,),
+                                                                 kwargs={'untrack': False})
+                process.start()
+                try:
+                    print(view(shared.name, args.panel, args.seconds, untrack=False))
+                finally:
+                    shared.request_stop()
+                    process.join()
+        finally:
+            shared.close()
@@ -1,16 +1,28 @@
 import pygame
 import sys
-import copy
 import time
+import math
+from collections import OrderedDict
 
-# --- Pygame Initialization ---
-pygame.init()
+from panel_state import fields_mask
+from netlist import INCOMER
+from scheduler import EventScheduler
+from history import PanelHistory
+from profiler import profiler
+from journal import journal, BUTTON_CLICKED, DRAW_ERROR
+from panel_logic import DERIVATIONS, PanelSnapshot, SwitchgearPanel # Re-exported for existing callers
 
 # --- Constants ---
 # Screen
 SCREEN_WIDTH = 1300 # Increased width for more columns
 SCREEN_HEIGHT = 850
 FPS = 30
+IDLE_MAIN_LOOP = True # Block on input / next scheduled transition instead of polling at FPS
+PROFILE_OVERLAY_KEY = pygame.K_F3 # Toggles timing spans + on-screen overlay
+PROFILE_DUMP_KEY = pygame.K_F4 # Writes PROFILE_DUMP_PATH
+PROFILE_DUMP_PATH = 'profile.json'
+HISTORY_BACK_KEY = pygame.K_LEFT # Steps the panel back one recorded transition (history.py)
+HISTORY_FORWARD_KEY = pygame.K_RIGHT # ... and forward again
 # Colors (RGB)
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -44,217 +56,77 @@ CCOL4_X = CONTROL_CIRCUIT_X_START + CCOL_WIDTH * 3.5 # K1 / Aux Relays
 CCOL5_X = CONTROL_CIRCUIT_X_START + CCOL_WIDTH * 4.5 # KDC
 COMP_HEIGHT = 16
 V_SPACE = 35
+PC_BUS_Y_TOP = BUS_Y_TOP + 60
+PC_BUS_Y_BOTTOM = BUS_Y_BOTTOM - 60
+PC_CB_Y = (PC_BUS_Y_TOP + PC_BUS_Y_BOTTOM) / 2 - 42
+PT_W, PT_H = 50, 35
+PT_Y = PC_BUS_Y_TOP + 30
+KDC_Y = BUS_Y_TOP + V_SPACE * 2
+KDC_W = 45
+KDC_H = 35
+
+# Font (loaded by init_pygame())
+DEFAULT_FONT = LABEL_FONT = SMALL_FONT = TITLE_FONT = None
 
-# Font
-try:
-    DEFAULT_FONT = pygame.font.SysFont('Segoe UI', 16)
-    LABEL_FONT = pygame.font.SysFont('Segoe UI', 12)
-    SMALL_FONT = pygame.font.SysFont('Segoe UI', 10)
-    TITLE_FONT = pygame.font.SysFont('Segoe UI', 18, bold=True)
-except: # Fallback if Segoe UI not found
-    DEFAULT_FONT = pygame.font.Font(None, 20)
-    LABEL_FONT = pygame.font.Font(None, 16)
-    SMALL_FONT = pygame.font.Font(None, 14)
-    TITLE_FONT = pygame.font.Font(None, 24)
-
-# --- Switchgear Panel Logic Class ---
-class SwitchgearPanel:
-    """ Holds the state and logic, independent of Pygame. """
-    def __init__(self):
-        self.initial_state = {
-            'breaker_state': 'OPEN', 'k86_state': 'RESET', 'kdc_state': 'ENERGIZED',
-            'spring_charged': True, 'dc_ok': True, 'dc_fail_alarm': False,
-            'tc_healthy': True, 'breaker_in_service': True, 'bus_not_earthed': True,
-            'bus_voltage_healthy': True, 'buscoupler_interlock_closed': True,
-            'ktc_state': 'ENERGIZED', 'k1_relay_energized': False, 'k1_state': 'DE-ENERGIZED',
-            'k94_state': 'DE-ENERGIZED',
-            'remote_close_command_active': False, 'trip_signal_s2': False, 'trip_signal_k2': False,
-            'trip_signal_kt': False, 'trip_signal_sync': False, 'trip_signal_uv': False,
-            'trip_signal_bf': False, 'trip_signal_protection': False, # K86 Coil path
-            'trip_signal_k86_no': False, # K86 NO contact state for trip path
-            'operation_in_progress': False
-        }
-        self.state = copy.deepcopy(self.initial_state)
-        self._update_dependent_states() # Initial update
-
-    def _update_dependent_states(self):
-        self.state['kdc_state'] = 'ENERGIZED' if self.state['dc_ok'] else 'DE-ENERGIZED'
-        self.state['dc_fail_alarm'] = not self.state['dc_ok']
-        self.state['ktc_state'] = 'ENERGIZED' if self.state['tc_healthy'] and self.state['dc_ok'] else 'DE-ENERGIZED'
-        self.state['k94_state'] = 'ENERGIZED' if self.state['breaker_state'] == 'CLOSED' and self.state['dc_ok'] else 'DE-ENERGIZED'
-        self.state['k1_state'] = 'ENERGIZED' if self.state['k1_relay_energized'] and self.state['dc_ok'] else 'DE-ENERGIZED'
-        self.state['trip_signal_k86_no'] = (self.state['k86_state'] == 'LATCHED')
-
-    def reset_simulation(self):
-        if self.state['operation_in_progress']: return False
-        print("--- Resetting Simulation ---")
-        self.state = copy.deepcopy(self.initial_state)
-        self._update_dependent_states()
-        return True
-
-    def check_closing_interlocks(self):
-        # KTC NO contact: requires KTC ENERGIZED (TC Healthy)
-        return (self.state['dc_ok'] and
-                self.state['ktc_state'] == 'ENERGIZED' and
-                self.state['k1_state'] == 'ENERGIZED' and # K1 must be ON (toggle state)
-                self.state['breaker_in_service'] and
-                self.state['bus_not_earthed'] and
-                self.state['bus_voltage_healthy'] and
-                self.state['buscoupler_interlock_closed'] and
-                self.state['k86_state'] == 'RESET' and
-                self.state['k94_state'] == 'DE-ENERGIZED' and # Check anti-pump
-                self.state['breaker_state'] == 'OPEN' and # Check 52b
-                self.state['spring_charged'])
-
-    def _recharge_spring(self):
-        if not self.state['spring_charged'] and self.state['dc_ok']:
-            print("  Spring Recharging...")
-            self.state['spring_charged'] = True
-            print("  Spring Recharged.")
-
-    def attempt_close(self):
-        """Called when K1 pulse is active, attempts the close action."""
-        if self.state['operation_in_progress'] or not self.state['remote_close_command_active']:
-             return False # Don't close if busy or no active command
-
-        if self.check_closing_interlocks():
-            self.state['operation_in_progress'] = True
-            print("  Closing Breaker...")
-            self.state['breaker_state'] = 'CLOSING'
-            self.state['spring_charged'] = False
-            # Simulate closing time visually (handled by main loop delay)
-            return True # Signal success
-        else:
-            print("  Close Blocked! Interlocks not met.")
-            return False
-
-    def finish_close(self):
-        """Completes the closing sequence."""
-        self.state['breaker_state'] = 'CLOSED'
-        self._update_dependent_states()
-        print(f"  Breaker state changed to: {self.state['breaker_state']}")
-        self._recharge_spring()
-        self.state['operation_in_progress'] = False
-
-    def initiate_direct_trip(self, source_flag_name, reason):
-        if self.state['operation_in_progress'] or self.state['breaker_state'] != 'CLOSED' or not self.state['dc_ok']:
-            return False
-        self.state['operation_in_progress'] = True
-        print(f"\n--- Trip Command Received ({reason}) ---")
-        self.state[source_flag_name] = True # Activate the source flag
-        self.state['breaker_state'] = 'TRIPPING'
-        # Simulate trip time visually
-        return True
-
-    def finish_direct_trip(self, source_flag_name):
-         self.state[source_flag_name] = False # Deactivate flag
-         self.state['breaker_state'] = 'OPEN'
-         self._update_dependent_states()
-         print(f"  Breaker state changed to: {self.state['breaker_state']}")
-         self.state['operation_in_progress'] = False
-
-    def initiate_protection_trip(self):
-        if self.state['operation_in_progress'] or self.state['breaker_state'] != 'CLOSED' or not self.state['dc_ok']:
-            return False
-        self.state['operation_in_progress'] = True
-        print("\n--- Protection Trip Command Received (-> K86) ---")
-        self.state['trip_signal_protection'] = True # K86 Coil path active
-        self.state['k86_state'] = 'LATCHED'
-        self.state['breaker_state'] = 'TRIPPING'
-        self._update_dependent_states() # Update K86_NO flag
-        # Simulate trip time visually
-        return True
-
-    def finish_protection_trip(self):
-        self.state['trip_signal_protection'] = False
-        self.state['breaker_state'] = 'OPEN'
-        self._update_dependent_states()
-        print(f"  Breaker state changed to: {self.state['breaker_state']} - K86 LATCHED")
-        self.state['operation_in_progress'] = False
-
-    def reset_k86(self):
-        if self.state['operation_in_progress'] or self.state['k86_state'] == 'RESET' or not self.state['dc_ok']:
-            return False
-        print("\n--- Resetting K86 ---")
-        self.state['k86_state'] = 'RESET'
-        self._update_dependent_states() # Update K86_NO flag
-        print("  K86 Relay Reset.")
-        return True
-
-    # --- Toggle Methods ---
-    def toggle_dc(self):
-        if self.state['operation_in_progress']: return
-        self.state['dc_ok'] = not self.state['dc_ok']
-        print(f"\n--- DC Power Toggled {'ON' if self.state['dc_ok'] else 'OFF'} ---")
-        if not self.state['dc_ok']:
-            self.state['k1_relay_energized'] = False
-            self.state['remote_close_command_active'] = False
-            for key in self.state:
-                if key.startswith('trip_signal_'): self.state[key] = False
-        self._update_dependent_states()
-        if self.state['dc_ok']: self._recharge_spring()
-
-    def toggle_tc_healthy(self):
-        if self.state['operation_in_progress'] or not self.state['dc_ok']: return
-        self.state['tc_healthy'] = not self.state['tc_healthy']
-        print(f"\n--- Trip Coil Supervision Toggled: {'OK' if self.state['tc_healthy'] else 'FAIL'} ---")
-        self._update_dependent_states() # Updates KTC
-
-    def toggle_k1(self):
-        """Toggles the K1 relay ON/OFF state"""
-        if self.state['operation_in_progress'] or not self.state['dc_ok']: return False
-        self.state['k1_relay_energized'] = not self.state['k1_relay_energized']
-        self._update_dependent_states() # Update k1_state
-        print(f"\n--- K1 Relay Toggled {'ON' if self.state['k1_relay_energized'] else 'OFF'} ---")
-        if self.state['k1_relay_energized']:
-             # If toggled ON, set the pulse flag and immediately check/attempt close
-             self.state['remote_close_command_active'] = True
-             print("  (Close command pulse initiated)")
-             return self.attempt_close() # Return true if close starts
-        else:
-            # If toggled OFF, ensure pulse flag is also off
-            self.state['remote_close_command_active'] = False
-            return False # No close action on toggle off
-
-    def end_k1_pulse(self):
-         """Called after a delay when K1 is toggled ON"""
-         self.state['remote_close_command_active'] = False
-         print("  (Close command pulse ended)")
-
-
-    # --- Other Toggles (simplified: just flip state) ---
-    def toggle_service_pos(self):
-        if self.state['operation_in_progress']: return
-        self.state['breaker_in_service'] = not self.state['breaker_in_service']
-        print(f"\n--- Service Position Toggled: {'SERVICE' if self.state['breaker_in_service'] else 'TEST/DRAWN'} ---")
-        self._update_dependent_states()
-
-    def toggle_bus_earth(self):
-        if self.state['operation_in_progress']: return
-        self.state['bus_not_earthed'] = not self.state['bus_not_earthed']
-        print(f"\n--- Bus Earth Status Toggled: {'Not Earthed (OK)' if self.state['bus_not_earthed'] else 'EARTHED (Block)'} ---")
-        self._update_dependent_states()
-
-    def toggle_bus_v_healthy(self):
-        if self.state['operation_in_progress']: return
-        self.state['bus_voltage_healthy'] = not self.state['bus_voltage_healthy']
-        print(f"\n--- Bus Voltage Toggled: {'Healthy (OK)' if self.state['bus_voltage_healthy'] else 'Low (Block)'} ---")
-        self._update_dependent_states()
-
-    def toggle_buscoupler_interlock(self):
-        if self.state['operation_in_progress']: return
-        self.state['buscoupler_interlock_closed'] = not self.state['buscoupler_interlock_closed']
-        print(f"\n--- Bus Coupler Interlock (NC) Toggled: {'CLOSED (OK)' if self.state['buscoupler_interlock_closed'] else 'OPEN (Block)'} ---")
-        self._update_dependent_states()
-
-    def toggle_pt_fail(self, phase):
-         if self.state['operation_in_progress']: return
-         pt_key = f'pt_ok_{phase}'
-         if pt_key in self.state:
-              self.state[pt_key] = not self.state[pt_key]
-              print(f"\n--- PT {phase} Phase Toggled: {'OK' if self.state[pt_key] else 'FAIL'} ---")
-         self._update_dependent_states()
-
+# --- Pygame Initialization ---
+def init_pygame():
+    """Initializes pygame and loads the fonts, once. Called when a renderer
+    is created, so importing this module does no SDL or font-scan work."""
+    global DEFAULT_FONT, LABEL_FONT, SMALL_FONT, TITLE_FONT
+    if TITLE_FONT is not None:
+        return
+    pygame.init()
+    try:
+        DEFAULT_FONT = pygame.font.SysFont('Segoe UI', 16)
+        LABEL_FONT = pygame.font.SysFont('Segoe UI', 12)
+        SMALL_FONT = pygame.font.SysFont('Segoe UI', 10)
+        TITLE_FONT = pygame.font.SysFont('Segoe UI', 18, bold=True)
+    except: # Fallback if Segoe UI not found
+        DEFAULT_FONT = pygame.font.Font(None, 20)
+        LABEL_FONT = pygame.font.Font(None, 16)
+        SMALL_FONT = pygame.font.Font(None, 14)
+        TITLE_FONT = pygame.font.Font(None, 24)
+
+# --- Text Surface Cache ---
+class TextCache:
+    """ Bounded LRU cache of rendered text surfaces keyed on (font, text, color).
+    Shared by all drawing helpers so static labels are rasterized once. """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        if not self.enabled:
+            return font.render(text, True, color)
+        key = (font, text, color)
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = self._surfaces[key] = font.render(text, True, color)
+        if len(self._surfaces) > self.maxsize:
+            self._surfaces.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self._surfaces.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._surfaces),
+                'hit_rate': self.hits / total if total else 0.0}
+
+text_cache = TextCache()
+
+def render_text(font, text, color):
+    """Antialiased font.render() through the shared text cache."""
+    return text_cache.render(font, text, color)
 
 # --- Pygame Drawing Functions ---
 def drawLine(screen, x1, y1, x2, y2, energized, color=GRAY_LIGHT, width=1.5):
@@ -262,188 +134,272 @@ def drawLine(screen, x1, y1, x2, y2, energized, color=GRAY_LIGHT, width=1.5):
     line_width = width + 1 if energized else width
     pygame.draw.line(screen, line_color, (x1, y1), (x2, y2), int(line_width))
 
-# --- Main Drawing Function ---
-def draw_schematic(screen, panel):
-    """Draws the entire schematic based on the panel state."""
+# --- Static Layer (drawn once, independent of panel state) ---
+def draw_static_layer(screen):
+    """Draws the background: buses, titles, PT and the power circuit labels."""
     screen.fill(WHITE) # Clear screen
-
-    try:
-        # --- Debug Rectangle ---
-        pygame.draw.rect(screen, GREEN, (5, 5, 10, 10))
-
-        # --- Power Circuit ---
-        pc_x_center = POWER_CIRCUIT_WIDTH / 2
-        pc_bus_y_top = BUS_Y_TOP + 60
-        pc_bus_y_bottom = BUS_Y_BOTTOM - 60
-        pc_cb_y = (pc_bus_y_top + pc_bus_y_bottom) / 2 - 42
-        title_surf = TITLE_FONT.render("Power Circuit", True, GRAY_DARK)
-        screen.blit(title_surf, (pc_x_center - title_surf.get_width() // 2, BUS_Y_TOP))
-        # Buses
-        pygame.draw.rect(screen, RED, (pc_x_center - 45, pc_bus_y_top - 4, 90, 8))
-        pygame.draw.rect(screen, RED, (pc_x_center - 45, pc_bus_y_bottom - 4, 90, 8))
-        # PT
-        pt_w, pt_h = 50, 35
-        pt_y = pc_bus_y_top + 30
-        pt_rect = pygame.Rect(pc_x_center - pt_w / 2, pt_y, pt_w, pt_h)
-        pygame.draw.rect(screen, GRAY_LIGHT, pt_rect)
-        pygame.draw.rect(screen, GRAY_DARK, pt_rect, 1)
-        pt_text = SMALL_FONT.render("Line PT", True, BLACK)
-        screen.blit(pt_text, (pt_rect.centerx - pt_text.get_width() // 2, pt_rect.centery - pt_text.get_height() // 2))
-        pygame.draw.line(screen, RED, (pc_x_center, pc_bus_y_top), (pc_x_center, pt_y), 4)
-        # Breaker Symbol
-        draw_breaker_symbol_pygame(screen, pc_x_center, pc_cb_y, panel.state, True)
-        # Connections
-        line_color = RED if panel.state['breaker_state'] == 'CLOSED' else GRAY_DARK
-        pygame.draw.line(screen, line_color, (pc_x_center, pt_y + pt_h + 10), (pc_x_center, pc_cb_y), 4)
-        pygame.draw.line(screen, line_color, (pc_x_center, pc_cb_y + 85), (pc_x_center, pc_bus_y_bottom), 4)
-
-
-        # --- Control Circuit Area ---
-        draw_bus_pygame(screen, BUS_Y_TOP, "DC +", COLOR_DC_POS, CONTROL_BUS_X_START, BUS_X_END_CTRL)
-        draw_bus_pygame(screen, BUS_Y_BOTTOM, "DC -", COLOR_DC_NEG, CONTROL_BUS_X_START, BUS_X_END_CTRL)
-
-        currentY, y, pathEnergized = 0,0,False # Reset for control
-
-        # --- Closing Circuit (Col 1) ---
-        draw_title(screen, "Closing Circuit", CCOL1_X, BUS_Y_TOP - 25)
-        pathEnergized = panel.state['dc_ok']
-        y = BUS_Y_TOP + V_SPACE
-        draw_mcb_pygame(screen, CCOL1_X, y, "F4", panel.state['dc_ok'], pathEnergized)
-        draw_line_pygame(screen, CCOL1_X, BUS_Y_TOP, CCOL1_X, y, pathEnergized, COLOR_DC_POS)
-        currentY = y + 28
-        # KTC NO Contact
+    # --- Power Circuit ---
+    pc_x_center = POWER_CIRCUIT_WIDTH / 2
+    title_surf = render_text(TITLE_FONT, "Power Circuit", GRAY_DARK)
+    screen.blit(title_surf, (pc_x_center - title_surf.get_width() // 2, BUS_Y_TOP))
+    # Buses
+    pygame.draw.rect(screen, RED, (pc_x_center - 45, PC_BUS_Y_TOP - 4, 90, 8))
+    pygame.draw.rect(screen, RED, (pc_x_center - 45, PC_BUS_Y_BOTTOM - 4, 90, 8))
+    # PT
+    pt_rect = pygame.Rect(pc_x_center - PT_W / 2, PT_Y, PT_W, PT_H)
+    pygame.draw.rect(screen, GRAY_LIGHT, pt_rect)
+    pygame.draw.rect(screen, GRAY_DARK, pt_rect, 1)
+    pt_text = render_text(SMALL_FONT, "Line PT", BLACK)
+    screen.blit(pt_text, (pt_rect.centerx - pt_text.get_width() // 2, pt_rect.centery - pt_text.get_height() // 2))
+    pygame.draw.line(screen, RED, (pc_x_center, PC_BUS_Y_TOP), (pc_x_center, PT_Y), 4)
+    # --- Control Circuit Area ---
+    draw_bus_pygame(screen, BUS_Y_TOP, "DC +", COLOR_DC_POS, CONTROL_BUS_X_START, BUS_X_END_CTRL)
+    draw_bus_pygame(screen, BUS_Y_BOTTOM, "DC -", COLOR_DC_NEG, CONTROL_BUS_X_START, BUS_X_END_CTRL)
+    draw_title(screen, "Closing Circuit", CCOL1_X, BUS_Y_TOP - 25)
+    draw_title(screen, "Tripping Circuit", CCOL2_X, BUS_Y_TOP - 25)
+    draw_title(screen, "K86 Circuit", CCOL3_X, BUS_Y_TOP - 25)
+    draw_title(screen, "K1 / Aux Relays", CCOL4_X, BUS_Y_TOP - 25)
+    draw_title(screen, "DC Supervision", CCOL5_X, BUS_Y_TOP - 25)
+
+# --- Dynamic Sections (read only the PanelSnapshot) ---
+def draw_power_circuit(screen, snapshot):
+    pc_x_center = POWER_CIRCUIT_WIDTH / 2
+    # Breaker Symbol
+    draw_breaker_symbol_pygame(screen, pc_x_center, PC_CB_Y, snapshot.state, True)
+    # Connections
+    line_color = RED if snapshot.state['breaker_state'] == 'CLOSED' else GRAY_DARK
+    pygame.draw.line(screen, line_color, (pc_x_center, PT_Y + PT_H + 10), (pc_x_center, PC_CB_Y), 4)
+    pygame.draw.line(screen, line_color, (pc_x_center, PC_CB_Y + 85), (pc_x_center, PC_BUS_Y_BOTTOM), 4)
+
+# Closing circuit rows below F4: (netlist id, label, drawn as NO contact)
+CLOSING_CONTACTS = (
+    ('ktc_no', "KTC NO(TC OK)", True), ('s6_remote', "S6 Remote", False), ('k1_no', "K1 NO", True),
+    ('sr2_service', "SR2 Svc", True), ('bus_not_earthed', "Bus !Earth", True), ('bus_v_ok', "Bus V OK", True),
+    ('bc_nc', "B/C NC", False), ('k86_nc', "K86 NC", False), ('k94_nc', "K94 NC", False), ('cb_52b', "52b NC", False),
+)
+# Tripping circuit parallel inputs: (netlist id, label)
+TRIP_CONTACTS = (
+    ('k2', "K2 Rmt"), ('bc_kt', "B/C KT"), ('bc_sync', "B/C Sync"), ('s2', "S2 Trip"),
+    ('p127_uv', "P127 UV"), ('bf', "50BF"), ('k86_no', "K86 NO"),
+)
+# Aux relay branches: (contact id, contact label, coil id, coil label, coil y)
+K1_COIL_Y = BUS_Y_TOP + V_SPACE * 2
+KTC_COIL_Y = K1_COIL_Y + COMP_HEIGHT / 2 + V_SPACE
+K94_COIL_Y = KTC_COIL_Y + V_SPACE * 2
+AUX_BRANCHES = (
+    ('remote_cmd', "Remote Cmd", 'k1_coil', "K1 Coil", K1_COIL_Y),
+    ('p127_rl2', "P127 RL2", 'ktc_coil', "KTC Coil", KTC_COIL_Y),
+    ('cb_52a', "52a NO", 'k94_coil', "K94 Coil", K94_COIL_Y),
+)
+
+def draw_closing_circuit(screen, snapshot):
+    live = snapshot.live
+    closed = snapshot.closed
+    y = BUS_Y_TOP + V_SPACE
+    draw_mcb_pygame(screen, CCOL1_X, y, "F4", snapshot.state['dc_ok'], live['closing.f4'])
+    draw_line_pygame(screen, CCOL1_X, BUS_Y_TOP, CCOL1_X, y, live['closing'], COLOR_DC_POS)
+    currentY = y + 28
+    upstream = 'closing.f4'
+    for element, label, normally_open in CLOSING_CONTACTS:
+        key = 'closing.' + element
         y = currentY + V_SPACE
-        ktc_no_open = (panel.state['ktc_state'] != 'ENERGIZED')
-        pathEnergized = pathEnergized and not ktc_no_open # Path continues if KTC NO is closed (KTC Energized)
-        draw_contact_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "KTC NO(TC OK)", ktc_no_open, True, pathEnergized)
-        draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, panel.state['dc_ok'])
+        draw_contact_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, label, not closed[key], normally_open, live[key])
+        draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, live[upstream])
         currentY = y + COMP_HEIGHT / 2
-        # ... Rest of the closing circuit drawing ...
-        y = currentY + V_SPACE; draw_contact_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "S6 Remote", False, False, pathEnergized); draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, pathEnergized); currentY = y + COMP_HEIGHT / 2;
-        y = currentY + V_SPACE; k1_no_open = (panel.state['k1_state'] != 'ENERGIZED'); pathEnergized = pathEnergized and not k1_no_open; draw_contact_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "K1 NO", k1_no_open, True, pathEnergized); draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, pathEnergized or panel.state['k1_state'] == 'ENERGIZED'); currentY = y + COMP_HEIGHT / 2;
-        y = currentY + V_SPACE; pathEnergized = pathEnergized and panel.state['breaker_in_service']; draw_contact_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "SR2 Svc", not panel.state['breaker_in_service'], True, pathEnergized); draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, pathEnergized or panel.state['breaker_in_service']); currentY = y + COMP_HEIGHT / 2;
-        y = currentY + V_SPACE; pathEnergized = pathEnergized and panel.state['bus_not_earthed']; draw_contact_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "Bus !Earth", not panel.state['bus_not_earthed'], True, pathEnergized); draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, pathEnergized or panel.state['bus_not_earthed']); currentY = y + COMP_HEIGHT / 2;
-        y = currentY + V_SPACE; pathEnergized = pathEnergized and panel.state['bus_voltage_healthy']; draw_contact_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "Bus V OK", not panel.state['bus_voltage_healthy'], True, pathEnergized); draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, pathEnergized or panel.state['bus_voltage_healthy']); currentY = y + COMP_HEIGHT / 2;
-        y = currentY + V_SPACE; pathEnergized = pathEnergized and panel.state['buscoupler_interlock_closed']; draw_contact_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "B/C NC", not panel.state['buscoupler_interlock_closed'], False, pathEnergized); draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, pathEnergized or panel.state['buscoupler_interlock_closed']); currentY = y + COMP_HEIGHT / 2;
-        y = currentY + V_SPACE; k86_nc_open = (panel.state['k86_state'] == 'LATCHED'); pathEnergized = pathEnergized and not k86_nc_open; draw_contact_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "K86 NC", k86_nc_open, False, pathEnergized); draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, pathEnergized or not k86_nc_open); currentY = y + COMP_HEIGHT / 2;
-        y = currentY + V_SPACE; k94_nc_open = (panel.state['k94_state'] == 'ENERGIZED'); pathEnergized = pathEnergized and not k94_nc_open; draw_contact_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "K94 NC", k94_nc_open, False, pathEnergized); draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, pathEnergized or not k94_nc_open); currentY = y + COMP_HEIGHT / 2;
-        y = currentY + V_SPACE; cb_nc_open = (panel.state['breaker_state'] == 'CLOSED'); pathEnergized = pathEnergized and not cb_nc_open; draw_contact_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "52b NC", cb_nc_open, False, pathEnergized); draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, pathEnergized or not cb_nc_open); currentY = y + COMP_HEIGHT / 2;
-        y = currentY + V_SPACE; pathEnergized = pathEnergized and panel.state['spring_charged']; draw_text_label_pygame(screen, CCOL1_X, y + 4, f"Spring { 'Ch.' if panel.state['spring_charged'] else 'Not Ch.'}", color=GREEN if panel.state['spring_charged'] else RED, energized=pathEnergized); draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, pathEnergized or panel.state['spring_charged']); currentY = y + COMP_HEIGHT / 2;
-        y = currentY + V_SPACE; ccEnergized = pathEnergized and panel.state['breaker_state'] == 'CLOSING'; draw_coil_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "CC", ccEnergized); draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, pathEnergized);
-        f5_cc_y = y + V_SPACE; draw_mcb_pygame(screen, CCOL1_X, f5_cc_y, "F5(CC)", panel.state['dc_ok'], ccEnergized); draw_line_pygame(screen, CCOL1_X, y + COMP_HEIGHT / 2, CCOL1_X, f5_cc_y, ccEnergized); draw_line_pygame(screen, CCOL1_X, f5_cc_y + 28, CCOL1_X, BUS_Y_BOTTOM, ccEnergized, COLOR_DC_NEG);
-
-        # --- Tripping Circuit (Col 2) ---
-        # ... (Draw F6, Parallel Contacts, 52a, TC1, F7 as per previous logic, using _pygame functions) ...
-        draw_title(screen, "Tripping Circuit", CCOL2_X, BUS_Y_TOP - 25);
-        y = BUS_Y_TOP + V_SPACE; anyDirectTripInputActive = (panel.state['trip_signal_manual_s2'] or panel.state['trip_signal_k2'] or panel.state['trip_signal_kt'] or panel.state['trip_signal_sync'] or panel.state['trip_signal_uv'] or panel.state['trip_signal_bf'] or panel.state['trip_signal_k86_no']); tripInitialPath = panel.state['dc_ok'] and anyDirectTripInputActive;
-        draw_mcb_pygame(screen, CCOL2_X, y, "F6", panel.state['dc_ok'], tripInitialPath); draw_line_pygame(screen, CCOL2_X, BUS_Y_TOP, CCOL2_X, y, tripInitialPath, COLOR_DC_POS); currentY = y + 28;
-        contactY = currentY + V_SPACE * 0.4; contactX = CCOL2_X; contactSpacing = V_SPACE * 0.9; anyTripInputActive = False;
-        draw_line_pygame(screen, contactX, currentY, contactX, contactY + contactSpacing * 6.5, tripInitialPath); # Common bus
-
-        draw_contact_pygame(screen, contactX, contactY, "K2 Rmt", not panel.state['trip_signal_k2'], True, panel.state['trip_signal_k2'])
-        if panel.state['trip_signal_k2']:
-            anyTripInputActive = True
-        contactY += contactSpacing
-
-        draw_contact_pygame(screen, contactX, contactY, "B/C KT", not panel.state['trip_signal_kt'], True, panel.state['trip_signal_kt'])
-        if panel.state['trip_signal_kt']:
-            anyTripInputActive = True
-        contactY += contactSpacing
-
-        draw_contact_pygame(screen, contactX, contactY, "B/C Sync", not panel.state['trip_signal_sync'], True, panel.state['trip_signal_sync'])
-        if panel.state['trip_signal_sync']:
-            anyTripInputActive = True
+        upstream = key
+    y = currentY + V_SPACE
+    spring_charged = snapshot.state['spring_charged']
+    draw_text_label_pygame(screen, CCOL1_X, y + 4, f"Spring { 'Ch.' if spring_charged else 'Not Ch.'}",
+                           color=GREEN if spring_charged else RED, energized=live['closing.spring'])
+    draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, live[upstream])
+    currentY = y + COMP_HEIGHT / 2
+    y = currentY + V_SPACE
+    cc_energized = live['closing.cc_coil']
+    draw_coil_pygame(screen, CCOL1_X, y - COMP_HEIGHT / 2, "CC", cc_energized)
+    draw_line_pygame(screen, CCOL1_X, currentY, CCOL1_X, y - COMP_HEIGHT / 2, live['closing.spring'])
+    f5_cc_y = y + V_SPACE
+    draw_mcb_pygame(screen, CCOL1_X, f5_cc_y, "F5(CC)", snapshot.state['dc_ok'], live['closing.f5'])
+    draw_line_pygame(screen, CCOL1_X, y + COMP_HEIGHT / 2, CCOL1_X, f5_cc_y, cc_energized)
+    draw_line_pygame(screen, CCOL1_X, f5_cc_y + 28, CCOL1_X, BUS_Y_BOTTOM, live['closing.f5'], COLOR_DC_NEG)
+
+def draw_tripping_circuit(screen, snapshot):
+    live = snapshot.live
+    closed = snapshot.closed
+    y = BUS_Y_TOP + V_SPACE
+    draw_mcb_pygame(screen, CCOL2_X, y, "F6", snapshot.state['dc_ok'], live['tripping.f6'])
+    draw_line_pygame(screen, CCOL2_X, BUS_Y_TOP, CCOL2_X, y, live['tripping'], COLOR_DC_POS)
+    currentY = y + 28
+    contactY = currentY + V_SPACE * 0.4; contactX = CCOL2_X; contactSpacing = V_SPACE * 0.9
+    draw_line_pygame(screen, contactX, currentY, contactX, contactY + contactSpacing * 6.5, live['tripping.f6']) # Common bus
+    for element, label in TRIP_CONTACTS:
+        key = 'tripping.' + element
+        draw_contact_pygame(screen, contactX, contactY, label, not closed[key], True, live[key])
         contactY += contactSpacing
+    contactY -= contactSpacing
+    inputs_live = live['tripping.trip_inputs']
+    commonOutY = contactY + COMP_HEIGHT / 2
+    draw_line_pygame(screen, contactX, commonOutY - contactSpacing * 6.5, contactX, commonOutY, inputs_live)
+    currentY = commonOutY + V_SPACE * 0.5
+    y = currentY + V_SPACE * 0.5
+    draw_contact_pygame(screen, contactX, y - COMP_HEIGHT / 2, "52a NO", not closed['tripping.cb_52a'], True, live['tripping.cb_52a'])
+    draw_line_pygame(screen, contactX, currentY, contactX, y - COMP_HEIGHT / 2, inputs_live)
+    currentY = y + COMP_HEIGHT / 2
+    y = currentY + V_SPACE
+    tc1_energized = live['tripping.tc1_coil']
+    draw_coil_pygame(screen, contactX, y - COMP_HEIGHT / 2, "TC1", tc1_energized)
+    draw_line_pygame(screen, contactX, currentY, contactX, y - COMP_HEIGHT / 2, live['tripping.cb_52a'])
+    currentY = y + COMP_HEIGHT / 2
+    y = currentY + V_SPACE * 0.5
+    draw_mcb_pygame(screen, contactX, y, "F7", snapshot.state['dc_ok'], live['tripping.f7'])
+    draw_line_pygame(screen, contactX, currentY, contactX, y, tc1_energized)
+    draw_line_pygame(screen, contactX, y + 28, contactX, BUS_Y_BOTTOM, live['tripping.f7'], COLOR_DC_NEG)
+
+def draw_k86_circuit(screen, snapshot):
+    live = snapshot.live
+    y = BUS_Y_TOP + V_SPACE
+    draw_mcb_pygame(screen, CCOL3_X, y, "F8", snapshot.state['dc_ok'], live['k86.f8'])
+    draw_line_pygame(screen, CCOL3_X, BUS_Y_TOP, CCOL3_X, y, live['k86'], COLOR_DC_POS)
+    currentY = y + 28
+    y = currentY + V_SPACE * 0.8; k86InputX = CCOL3_X; p127X = k86InputX - 20; k64X = k86InputX + 20
+    feed = live['k86.f8']
+    draw_line_pygame(screen, k86InputX, currentY, k86InputX, y, feed); draw_line_pygame(screen, k86InputX, y, p127X, y, feed); draw_line_pygame(screen, k86InputX, y, k64X, y, feed)
+    closed = snapshot.closed
+    draw_contact_pygame(screen, p127X, y, "P127 RL1", not closed['k86.p127_rl1'], True, live['k86.p127_rl1']); draw_contact_pygame(screen, k64X, y, "K64 REF", not closed['k86.k64_ref'], True, live['k86.k64_ref'])
+    k86CombineY = y + COMP_HEIGHT + 10; combined = live['k86.k86_inputs']
+    draw_line_pygame(screen, p127X, y + COMP_HEIGHT, p127X, k86CombineY, live['k86.p127_rl1']); draw_line_pygame(screen, k64X, y + COMP_HEIGHT, k64X, k86CombineY, live['k86.k64_ref']); draw_line_pygame(screen, p127X, k86CombineY, k64X, k86CombineY, combined)
+    currentY = k86CombineY
+    y = currentY + V_SPACE * 0.8; k86CoilEnergized = live['k86.k86_coil']
+    draw_coil_pygame(screen, k86InputX, y - COMP_HEIGHT / 2, "K86 Coil", k86CoilEnergized); draw_line_pygame(screen, k86InputX, currentY, k86InputX, y - COMP_HEIGHT / 2, combined); draw_line_pygame(screen, k86InputX, y + COMP_HEIGHT / 2, k86InputX, BUS_Y_BOTTOM, k86CoilEnergized, COLOR_DC_NEG)
+
+def draw_aux_relays(screen, snapshot):
+    live = snapshot.live
+    closed = snapshot.closed
+    for contact, contact_label, coil, coil_label, coil_y in AUX_BRANCHES:
+        contact_key, coil_key = 'aux.' + contact, 'aux.' + coil
+        draw_coil_pygame(screen, CCOL4_X, coil_y - COMP_HEIGHT / 2, coil_label, live[coil_key])
+        draw_contact_pygame(screen, CCOL4_X, coil_y - V_SPACE, contact_label, not closed[contact_key], True, live[contact_key])
+        draw_line_pygame(screen, CCOL4_X, BUS_Y_TOP, CCOL4_X, coil_y - V_SPACE, live['aux'], COLOR_DC_POS)
+        draw_line_pygame(screen, CCOL4_X, coil_y - V_SPACE + COMP_HEIGHT, CCOL4_X, coil_y - COMP_HEIGHT / 2, live[contact_key])
+        draw_line_pygame(screen, CCOL4_X, coil_y + COMP_HEIGHT / 2, CCOL4_X, BUS_Y_BOTTOM, live[coil_key], COLOR_DC_NEG)
+
+def draw_dc_supervision(screen, snapshot):
+    kdc_energized = snapshot.live['kdc.kdc_coil']
+    kdcFill = GREEN_LIGHT if kdc_energized else GRAY_MEDIUM
+    kdc_rect = pygame.Rect(CCOL5_X - KDC_W / 2, KDC_Y, KDC_W, KDC_H)
+    pygame.draw.rect(screen, kdcFill, kdc_rect)
+    pygame.draw.rect(screen, GRAY_DARK, kdc_rect, 1)
+    kdc_text = render_text(SMALL_FONT, "KDC", BLACK)
+    screen.blit(kdc_text, (kdc_rect.centerx - kdc_text.get_width()//2, kdc_rect.centery - kdc_text.get_height()//2))
+    draw_line_pygame(screen, CCOL5_X, BUS_Y_TOP, CCOL5_X, KDC_Y, kdc_energized, COLOR_DC_POS)
+    draw_line_pygame(screen, CCOL5_X, KDC_Y + KDC_H, CCOL5_X, BUS_Y_BOTTOM, kdc_energized, COLOR_DC_NEG)
+    draw_text_label_pygame(screen, CCOL5_X, KDC_Y + KDC_H + 14, "(DC Fail Relay)")
+
+# (name, draw function, screen area, state fields it reads)
+SECTIONS = (
+    ('power', draw_power_circuit, (0, 0, CONTROL_BUS_X_START, SCREEN_HEIGHT), ('breaker_state',)),
+    ('closing', draw_closing_circuit, (CONTROL_BUS_X_START, 0, CCOL1_X + CCOL_WIDTH / 2 - CONTROL_BUS_X_START, SCREEN_HEIGHT),
+     INCOMER.fields('closing')),
+    ('tripping', draw_tripping_circuit, (CCOL2_X - CCOL_WIDTH / 2, 0, CCOL_WIDTH, SCREEN_HEIGHT),
+     INCOMER.fields('tripping')),
+    ('k86', draw_k86_circuit, (CCOL3_X - CCOL_WIDTH / 2, 0, CCOL_WIDTH, SCREEN_HEIGHT),
+     INCOMER.fields('k86')),
+    ('aux', draw_aux_relays, (CCOL4_X - CCOL_WIDTH / 2, 0, CCOL_WIDTH, SCREEN_HEIGHT),
+     INCOMER.fields('aux')),
+    ('kdc', draw_dc_supervision, (CCOL5_X - CCOL_WIDTH / 2, 0, SCREEN_WIDTH - (CCOL5_X - CCOL_WIDTH / 2), SCREEN_HEIGHT),
+     INCOMER.fields('kdc')),
+)
+SECTION_LABEL_OVERHANG = 40 # Contact labels may extend past a column's right edge
+
+def report_draw_error(screen, e):
+    if journal.active: journal.record(DRAW_ERROR, None, str(e))
+    # Optionally draw error on screen
+    error_surf = render_text(DEFAULT_FONT, f"Drawing Error: {e}", RED)
+    return screen.blit(error_surf, (10, SCREEN_HEIGHT - 30))
 
-        draw_contact_pygame(screen, contactX, contactY, "S2 Trip", not panel.state['trip_signal_manual_s2'], True, panel.state['trip_signal_manual_s2'])
-        if panel.state['trip_signal_manual_s2']:
-            anyTripInputActive = True
-        contactY += contactSpacing
-
-        draw_contact_pygame(screen, contactX, contactY, "P127 UV", not panel.state['trip_signal_uv'], True, panel.state['trip_signal_uv'])
-        if panel.state['trip_signal_uv']:
-            anyTripInputActive = True
-        contactY += contactSpacing
-
-        draw_contact_pygame(screen, contactX, contactY, "50BF", not panel.state['trip_signal_bf'], True, panel.state['trip_signal_bf'])
-        if panel.state['trip_signal_bf']:
-            anyTripInputActive = True
-        contactY += contactSpacing
-
-        draw_contact_pygame(screen, contactX, contactY, "K86 NO", not panel.state['trip_signal_k86_no'], True, panel.state['trip_signal_k86_no'])
-        if panel.state['trip_signal_k86_no']:
-            anyTripInputActive = True
-
-        commonOutY = contactY + COMP_HEIGHT / 2; draw_line_pygame(screen, contactX, commonOutY - contactSpacing * 6.5, contactX, commonOutY, anyTripInputActive); currentY = commonOutY + V_SPACE * 0.5;
-        y = currentY + V_SPACE * 0.5; cb_a_open = (panel.state['breaker_state'] != 'CLOSED'); pathAfterParallel = panel.state['dc_ok'] and anyTripInputActive; draw_contact_pygame(screen, contactX, y - COMP_HEIGHT / 2, "52a NO", cb_a_open, True, pathAfterParallel and not cb_a_open); draw_line_pygame(screen, contactX, currentY, contactX, y - COMP_HEIGHT / 2, pathAfterParallel); currentY = y + COMP_HEIGHT / 2; pathEnergized = pathAfterParallel and not cb_a_open;
-        y = currentY + V_SPACE; tc1_active_flag = pathEnergized; panel.state['trip_path_active_tc1'] = tc1_active_flag # Update state for potential future use
-        draw_coil_pygame(screen, contactX, y - COMP_HEIGHT / 2, "TC1", tc1_active_flag); draw_line_pygame(screen, contactX, currentY, contactX, y - COMP_HEIGHT / 2, pathEnergized); currentY = y + COMP_HEIGHT / 2;
-        y = currentY + V_SPACE * 0.5; draw_mcb_pygame(screen, contactX, y, "F7", panel.state['dc_ok'], tc1_active_flag); draw_line_pygame(screen, contactX, currentY, contactX, y, tc1_active_flag); draw_line_pygame(screen, contactX, y + 28, contactX, BUS_Y_BOTTOM, tc1_active_flag, COLOR_DC_NEG);
-
-
-        # --- K86 Circuit (Col 3) ---
-        # ... (Draw F8, P127 RL1 || K64 REF -> K86 Coil as per previous logic, using _pygame functions) ...
-        draw_title(screen, "K86 Circuit", CCOL3_X, BUS_Y_TOP - 25);
-        y = BUS_Y_TOP + V_SPACE; k86PathStartActive = panel.state['dc_ok'] and panel.state['trip_signal_protection']; draw_mcb_pygame(screen, CCOL3_X, y, "F8", panel.state['dc_ok'], k86PathStartActive); draw_line_pygame(screen, CCOL3_X, BUS_Y_TOP, CCOL3_X, y, k86PathStartActive, COLOR_DC_POS); currentY = y + 28;
-        y = currentY + V_SPACE * 0.8; k86InputPathActive = panel.state['dc_ok'] and panel.state['trip_signal_protection']; k86InputX = CCOL3_X; p127X = k86InputX - 20; k64X = k86InputX + 20;
-        draw_line_pygame(screen, k86InputX, currentY, k86InputX, y, k86InputPathActive); draw_line_pygame(screen, k86InputX, y, p127X, y, k86InputPathActive); draw_line_pygame(screen, k86InputX, y, k64X, y, k86InputPathActive);
-        draw_contact_pygame(screen, p127X, y, "P127 RL1", not panel.state['trip_signal_protection'], True, k86InputPathActive); draw_contact_pygame(screen, k64X, y, "K64 REF", not panel.state['trip_signal_protection'], True, k86InputPathActive);
-        k86CombineY = y + COMP_HEIGHT + 10; draw_line_pygame(screen, p127X, y + COMP_HEIGHT, p127X, k86CombineY, k86InputPathActive); draw_line_pygame(screen, k64X, y + COMP_HEIGHT, k64X, k86CombineY, k86InputPathActive); draw_line_pygame(screen, p127X, k86CombineY, k64X, k86CombineY, k86InputPathActive); currentY = k86CombineY;
-        y = currentY + V_SPACE * 0.8; k86CoilEnergized = k86InputPathActive; draw_coil_pygame(screen, k86InputX, y - COMP_HEIGHT / 2, "K86 Coil", k86CoilEnergized); draw_line_pygame(screen, k86InputX, currentY, k86InputX, y- COMP_HEIGHT / 2, k86CoilEnergized); draw_line_pygame(screen, k86InputX, y + COMP_HEIGHT / 2, k86InputX, BUS_Y_BOTTOM, k86CoilEnergized, COLOR_DC_NEG);
-
-
-        # --- K1 / Aux Relays (Col 4) ---
-        # ... (Draw K1, KTC, K94 circuits as per previous logic, using _pygame functions) ...
-        draw_title(screen, "K1 / Aux Relays", CCOL4_X, BUS_Y_TOP - 25)
-        currentY = BUS_Y_TOP + V_SPACE  # Reset Y
-        K1_COIL_Y = currentY + V_SPACE
-        draw_coil_pygame(screen, CCOL4_X, K1_COIL_Y - COMP_HEIGHT / 2, "K1 Coil", panel.state['k1_state'] == 'ENERGIZED')
-        draw_contact_pygame(screen, CCOL4_X, K1_COIL_Y - V_SPACE, "Remote Cmd", not panel.state['remote_close_command_active'], True, panel.state['dc_ok'] and panel.state['remote_close_command_active'])
-        draw_line_pygame(screen, CCOL4_X, BUS_Y_TOP, CCOL4_X, K1_COIL_Y - V_SPACE, panel.state['dc_ok'] and panel.state['remote_close_command_active'], COLOR_DC_POS)
-        draw_line_pygame(screen, CCOL4_X, K1_COIL_Y - V_SPACE + COMP_HEIGHT, CCOL4_X, K1_COIL_Y - COMP_HEIGHT / 2, panel.state['dc_ok'] and panel.state['remote_close_command_active'])
-        draw_line_pygame(screen, CCOL4_X, K1_COIL_Y + COMP_HEIGHT / 2, CCOL4_X, BUS_Y_BOTTOM, panel.state['k1_state'] == 'ENERGIZED', COLOR_DC_NEG)
-        currentY = K1_COIL_Y + COMP_HEIGHT/2 + V_SPACE
-        KTC_COIL_Y = currentY
-        draw_coil_pygame(screen, CCOL4_X, KTC_COIL_Y - COMP_HEIGHT / 2, "KTC Coil", panel.state['ktc_state'] == 'ENERGIZED')
-        draw_contact_pygame(screen, CCOL4_X, KTC_COIL_Y - V_SPACE, "P127 RL2", not panel.state['tc_healthy'], True, panel.state['dc_ok'] and panel.state['tc_healthy'])
-        draw_line_pygame(screen, CCOL4_X, BUS_Y_TOP, CCOL4_X, KTC_COIL_Y - V_SPACE, panel.state['dc_ok'] and panel.state['tc_healthy'], COLOR_DC_POS)
-        draw_line_pygame(screen, CCOL4_X, KTC_COIL_Y - V_SPACE + COMP_HEIGHT, CCOL4_X, KTC_COIL_Y - COMP_HEIGHT / 2, panel.state['dc_ok'] and panel.state['tc_healthy'])
-        draw_line_pygame(screen, CCOL4_X, KTC_COIL_Y + COMP_HEIGHT / 2, CCOL4_X, BUS_Y_BOTTOM, panel.state['ktc_state'] == 'ENERGIZED', COLOR_DC_NEG)
-        currentY += V_SPACE * 2
-        K94_COIL_Y = currentY
-        k94CoilEnergized = (panel.state['breaker_state'] == 'CLOSED' and panel.state['dc_ok'])
-        draw_coil_pygame(screen, CCOL4_X, K94_COIL_Y - COMP_HEIGHT / 2, "K94 Coil", k94CoilEnergized)
-        draw_contact_pygame(screen, CCOL4_X, K94_COIL_Y - V_SPACE, "52a NO", panel.state['breaker_state'] != 'CLOSED', True, k94CoilEnergized)
-        draw_line_pygame(screen, CCOL4_X, BUS_Y_TOP, CCOL4_X, K94_COIL_Y - V_SPACE, k94CoilEnergized, COLOR_DC_POS)
-        draw_line_pygame(screen, CCOL4_X, K94_COIL_Y - V_SPACE + COMP_HEIGHT, CCOL4_X, K94_COIL_Y - COMP_HEIGHT / 2, k94CoilEnergized)
-        draw_line_pygame(screen, CCOL4_X, K94_COIL_Y + COMP_HEIGHT / 2, CCOL4_X, BUS_Y_BOTTOM, k94CoilEnergized, COLOR_DC_NEG)
-
-
-        # --- KDC (Col 5) ---
-        # ... (Draw KDC as per previous logic, using _pygame functions) ...
-        draw_title(screen, "DC Supervision", CCOL5_X, BUS_Y_TOP - 25)
-        KDC_Y = BUS_Y_TOP + V_SPACE * 2
-        KDC_W = 45
-        KDC_H = 35
-        kdcFill = GREEN_LIGHT if panel.state['kdc_state'] == 'ENERGIZED' else GRAY_MEDIUM
-        kdc_rect = pygame.Rect(CCOL5_X - KDC_W / 2, KDC_Y, KDC_W, KDC_H)
-        pygame.draw.rect(screen, kdcFill, kdc_rect)
-        pygame.draw.rect(screen, GRAY_DARK, kdc_rect, 1)
-        kdc_text = SMALL_FONT.render("KDC", True, BLACK)
-        screen.blit(kdc_text, (kdc_rect.centerx - kdc_text.get_width()//2, kdc_rect.centery - kdc_text.get_height()//2))
-        draw_line_pygame(screen, CCOL5_X, BUS_Y_TOP, CCOL5_X, KDC_Y, panel.state['dc_ok'], COLOR_DC_POS)
-        draw_line_pygame(screen, CCOL5_X, KDC_Y + KDC_H, CCOL5_X, BUS_Y_BOTTOM, panel.state['dc_ok'], COLOR_DC_NEG)
-        draw_text_label_pygame(screen, CCOL5_X, KDC_Y + KDC_H + 14, "(DC Fail Relay)")
-
-
-        # --- Debug Rectangle END ---
+# --- Main Drawing Function ---
+def draw_schematic(screen, snapshot):
+    """Draws the entire schematic from a PanelSnapshot (SwitchgearPanel.evaluate())."""
+    init_pygame()
+    draw_static_layer(screen)
+    # --- Debug Rectangle ---
+    pygame.draw.rect(screen, GREEN, (5, 5, 10, 10))
+    failed = False
+    for name, draw, _, _ in SECTIONS:
+        start = profiler.start()
+        try:
+            draw(screen, snapshot)
+        except Exception as e:
+            report_draw_error(screen, e)
+            failed = True
+        profiler.stop(name, start)
+    # --- Debug Rectangle END ---
+    if not failed:
         pygame.draw.rect(screen, RED, (25, 5, 10, 10)) # Red debug rect
 
-    except Exception as e:
-        print(f"Error during drawSchematic: {e}")
-        # Optionally draw error on screen
-        error_surf = DEFAULT_FONT.render(f"Drawing Error: {e}", True, RED)
-        screen.blit(error_surf, (10, SCREEN_HEIGHT - 30))
+# --- Retained-Mode Renderer ---
+class SchematicRenderer:
+    """ Draws the static layer once into a cached Surface, then each frame
+    redraws only the sections whose input fields changed. """
+    def __init__(self, screen):
+        init_pygame()
+        self.screen = screen
+        self.background = pygame.Surface(screen.get_size())
+        draw_static_layer(self.background)
+        self.sections = [(name, draw, pygame.Rect(area), fields_mask(fields))
+                         for name, draw, area, fields in SECTIONS]
+        self._keys = None
+        self._version = None
+        self._changed = None # Accumulated change mask once attached to a panel
+
+    def attach(self, panel):
+        """Takes dirty sections from the panel's change notifications instead
+        of comparing state on every render()."""
+        self._changed = 0
+        panel.subscribe(self._on_change)
+
+    def _on_change(self, panel, changed):
+        self._changed |= changed
+
+    def invalidate(self):
+        """Forces a full redraw on the next render()."""
+        self._keys = None
+
+    def render(self, snapshot):
+        """Draws a PanelSnapshot and returns the dirty rects for pygame.display.update()."""
+        if self._keys is not None:
+            if self._changed is not None:
+                changed, self._changed = self._changed, 0
+                if not changed:
+                    return []
+            elif snapshot.version == self._version:
+                return []
+        self._version = snapshot.version
+        bits = snapshot.bits
+        keys = [bits & mask for _, _, _, mask in self.sections]
+        if self._keys is None:
+            dirty = [self.screen.get_rect()]
+        else:
+            dirty = [section[2] for section, old, new in zip(self.sections, self._keys, keys) if old != new]
+        self._keys = keys
+        for rect in list(dirty):
+            self.screen.set_clip(rect)
+            self.screen.blit(self.background, rect, rect)
+            for name, draw, area, _ in self.sections:
+                extent = area.inflate(SECTION_LABEL_OVERHANG * 2, 0)
+                if extent.colliderect(rect):
+                    start = profiler.start()
+                    try:
+                        draw(self.screen, snapshot)
+                    except Exception as e:
+                        error_rect = pygame.Rect(0, SCREEN_HEIGHT - 30, SCREEN_WIDTH, 30) # Below DC - bus
+                        self.screen.set_clip(None)
+                        self.screen.blit(self.background, error_rect, error_rect)
+                        report_draw_error(self.screen, e)
+                        dirty.append(error_rect)
+                        self.screen.set_clip(rect)
+                    profiler.stop(name, start)
+        self.screen.set_clip(None)
+        return dirty
 
 # --- Pygame Specific Drawing Helpers ---
 # (These wrap the core drawing logic with Pygame functions)
@@ -474,7 +430,7 @@ def draw_contact_pygame(screen, x, y, label, isOpen, isNormallyOpen=True, energi
             pygame.draw.line(screen, line_color, (x, y + COMP_HEIGHT / 2), (x + length, y + COMP_HEIGHT / 2), 2) # Closed bar
             pygame.draw.line(screen, line_color, (x + gap, y), (x + length, y + COMP_HEIGHT), 1) # NC slash
     # Label
-    text_surf = font.render(label, True, BLACK)
+    text_surf = render_text(font, label, BLACK)
     screen.blit(text_surf, (x + length + 6, y + COMP_HEIGHT / 2 - text_surf.get_height() // 2))
 
 def draw_coil_pygame(screen, x, y, label, energized):
@@ -483,7 +439,7 @@ def draw_coil_pygame(screen, x, y, label, energized):
     coil_color = ORANGE if energized else GRAY_MEDIUM
     pygame.draw.circle(screen, coil_color, (x, y + radius), radius)
     pygame.draw.circle(screen, BLACK, (x, y + radius), radius, 1) # Outline
-    text_surf = font.render(label, True, BLACK)
+    text_surf = render_text(font, label, BLACK)
     screen.blit(text_surf, (x - text_surf.get_width() // 2, y + COMP_HEIGHT + 5))
 
 def draw_mcb_pygame(screen, x, y, label, closed, energized=False):
@@ -498,12 +454,12 @@ def draw_mcb_pygame(screen, x, y, label, closed, energized=False):
         pygame.draw.line(screen, diag_color, (rect.left, rect.top + 6), (rect.right, rect.bottom - 6), 2)
     else:
         pygame.draw.line(screen, diag_color, (rect.left, rect.centery), (rect.right, rect.centery), 2)
-    text_surf = font.render(label, True, BLACK)
+    text_surf = render_text(font, label, BLACK)
     screen.blit(text_surf, (x - text_surf.get_width() // 2, y - text_surf.get_height() - 2))
 
 def draw_bus_pygame(screen, y, label, color=GRAY_DARK, x_start=BUS_X_START_CTRL, x_end=BUS_X_END_CTRL):
     pygame.draw.rect(screen, color, (x_start, y - 4, x_end - x_start, 8))
-    text_surf = LABEL_FONT.render(label, True, BLACK)
+    text_surf = render_text(LABEL_FONT, label, BLACK)
     screen.blit(text_surf, (x_start + 8, y - text_surf.get_height() - 6))
 
 def draw_breaker_symbol_pygame(screen, x, y, stateObj, isPowerCircuit=False):
@@ -512,7 +468,7 @@ def draw_breaker_symbol_pygame(screen, x, y, stateObj, isPowerCircuit=False):
     font = LABEL_FONT
     rect = pygame.Rect(x - width / 2, y, width, height)
     pygame.draw.rect(screen, BLACK, rect, 3 if isPowerCircuit else 2)
-    text_surf = font.render("CB", True, BLACK)
+    text_surf = render_text(font, "CB", BLACK)
     screen.blit(text_surf, (rect.centerx - text_surf.get_width() // 2, rect.top - text_surf.get_height() - 2))
     contactYtop = rect.top + 6
     contactYbottom = rect.bottom - 6
@@ -524,9 +480,10 @@ def draw_breaker_symbol_pygame(screen, x, y, stateObj, isPowerCircuit=False):
         pygame.draw.line(screen, CYAN_LIGHT, (x, contactYtop), (x, rect.centery - contactMidGap), line_width)
         pygame.draw.line(screen, CYAN_LIGHT, (x, rect.centery + contactMidGap), (x, contactYbottom), line_width)
 
-def draw_text_label_pygame(screen, x, y, text, color=BLACK, font=SMALL_FONT, align='center', energized=False):
+def draw_text_label_pygame(screen, x, y, text, color=BLACK, font=None, align='center', energized=False):
+    font = font or SMALL_FONT
     text_color = ORANGE if energized else color
-    text_surf = font.render(text, True, text_color)
+    text_surf = render_text(font, text, text_color)
     text_rect = text_surf.get_rect()
     if align == 'center':
         text_rect.center = (x, y)
@@ -537,9 +494,46 @@ def draw_text_label_pygame(screen, x, y, text, color=BLACK, font=SMALL_FONT, ali
     screen.blit(text_surf, text_rect)
 
 def draw_title(screen, text, x, y):
-     title_surf = TITLE_FONT.render(text, True, GRAY_DARK)
+     title_surf = render_text(TITLE_FONT, text, GRAY_DARK)
      screen.blit(title_surf, (x - title_surf.get_width() // 2, y))
 
+PROFILE_OVERLAY_RECT = pygame.Rect(POWER_CIRCUIT_WIDTH + 10, 30, 300, 200)
+
+def draw_profile_overlay(screen, profiler):
+    """Draws p50/p99 per span, FPS and dropped frames; returns the dirty rect."""
+    rect = PROFILE_OVERLAY_RECT
+    pygame.draw.rect(screen, WHITE, rect)
+    pygame.draw.rect(screen, GRAY_DARK, rect, 1)
+    # Not through render_text: changing numbers would evict schematic labels
+    header = f"FPS {profiler.fps:.1f}   frames {profiler.frames}   dropped {profiler.dropped}"
+    screen.blit(SMALL_FONT.render(header, True, BLACK), (rect.x + 6, rect.y + 4))
+    rows = [('span', 'p50 ms', 'p99 ms')]
+    rows += [(name, f"{stats.percentile(50):.2f}", f"{stats.percentile(99):.2f}")
+             for name, stats in profiler.spans.items()]
+    y = rect.y + 20
+    for row in rows[:(rect.height - 20) // 14]:
+        for text, right in zip(row, (None, rect.x + 170, rect.x + 250)):
+            surf = SMALL_FONT.render(text, True, BLACK)
+            screen.blit(surf, (rect.x + 6 if right is None else right - surf.get_width(), y))
+        y += 14
+    return rect
+
+def measure_text_cache(frames=200):
+    """Average full-frame draw_schematic() time (ms) without and with the text cache."""
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    snapshot = SwitchgearPanel().evaluate()
+    results = {}
+    for enabled in (False, True):
+        text_cache.clear()
+        text_cache.enabled = enabled
+        draw_schematic(surface, snapshot) # Warm-up
+        start = time.perf_counter()
+        for _ in range(frames):
+            draw_schematic(surface, snapshot)
+        results['cached' if enabled else 'uncached'] = (time.perf_counter() - start) / frames * 1000
+    text_cache.enabled = True
+    return results
+
 # --- Button Definition ---
 buttons = {} # Dictionary to store button rects and actions
 
@@ -555,13 +549,13 @@ def draw_buttons(screen):
         # Basic button appearance
         pygame.draw.rect(screen, GRAY_LIGHT, rect, border_radius=5)
         pygame.draw.rect(screen, GRAY_DARK, rect, 1, border_radius=5)
-        text_surf = button_font.render(text, True, BLACK)
+        text_surf = render_text(button_font, text, BLACK)
         screen.blit(text_surf, (rect.centerx - text_surf.get_width() // 2, rect.centery - text_surf.get_height() // 2))
 
 def check_button_clicks(panel, pos):
     for text, data in buttons.items():
         if data['rect'].collidepoint(pos):
-            print(f"Button '{text}' clicked")
+            if journal.active: journal.record(BUTTON_CLICKED, panel, text)
             action = data['action']
             args = data['args']
             # Special handling for trip commands needing source name
@@ -583,13 +577,38 @@ def check_button_clicks(panel, pos):
             return True # Click handled
     return False
 
+def wait_for_events(scheduler, max_wait=None):
+    """Blocks until input arrives, the next scheduled transition is due or
+    max_wait seconds have passed."""
+    deadline = scheduler.next_deadline()
+    wait = None if deadline is None else deadline - scheduler.now
+    if max_wait is not None and (wait is None or max_wait < wait):
+        wait = max_wait
+    if wait is None:
+        event = pygame.event.wait()
+    else:
+        event = pygame.event.wait(max(1, math.ceil(wait * 1000)))
+    events = [] if event.type == pygame.NOEVENT else [event]
+    return events + pygame.event.get()
+
 # --- Main Simulation Loop ---
-def main():
+def main(idle=IDLE_MAIN_LOOP, scenario=None):
+    init_pygame()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("11kV Incomer Simulation - Visual")
     clock = pygame.time.Clock()
 
-    panel = SwitchgearPanel()
+    journal.configure(console=True) # Panel messages on the terminal, as before
+    scheduler = EventScheduler()
+    panel = SwitchgearPanel(scheduler)
+    renderer = SchematicRenderer(screen)
+    renderer.attach(panel)
+    history = PanelHistory(panel)
+    scenario_file = None
+    if scenario is not None: # Scripted actions instead of (or on top of) clicks
+        from scenario import feed, read_scenario
+        scenario_file = open(scenario, 'rb')
+        feed(scheduler, panel, read_scenario(scenario_file))
 
     # --- Define Button Areas (Example - Adjust positions/sizes as needed) ---
     button_w, button_h = 180, 35
@@ -606,37 +625,75 @@ def main():
     # create_button(button_x_start, button_y_start + 4*button_y_step, button_w, button_h, "Reset Sim", panel.reset_simulation)
     # Need to map HTML buttons to Pygame Rects and actions
 
+    if idle:
+        pygame.event.set_blocked(pygame.MOUSEMOTION) # Don't wake up for pointer movement
+    last_tick = time.monotonic()
     running = True
     while running:
         # --- Event Handling ---
-        for event in pygame.event.get():
+        # With the overlay on, wake up twice a second so its numbers stay live
+        events = (wait_for_events(scheduler, 0.5 if profiler.enabled else None) if idle
+                  else pygame.event.get())
+        profiler.begin_frame()
+        start = profiler.start()
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1: # Left mouse button
                     # Check if click is on any defined button
                     check_button_clicks(panel, event.pos)
                     # Placeholder: Need to map clicks to the panel methods based on button rects
+            if event.type == pygame.KEYDOWN:
+                if event.key == PROFILE_OVERLAY_KEY:
+                    profiler.enabled = not profiler.enabled
+                    profiler.reset()
+                    renderer.invalidate() # Uncover / clear the overlay area
+                elif event.key == PROFILE_DUMP_KEY:
+                    profiler.dump(PROFILE_DUMP_PATH)
+                elif event.key == HISTORY_BACK_KEY:
+                    history.undo()
+                elif event.key == HISTORY_FORWARD_KEY:
+                    history.redo()
+        profiler.stop('events', start)
 
         # --- Update State (Based on time, previous actions etc.) ---
-        # e.g., Handle delays for closing/tripping animations if implemented
-        # e.g., End K1 pulse after timeout
+        # Advance the virtual clock by the elapsed wall time (real-time mode)
+        start = profiler.start()
+        now = time.monotonic()
+        scheduler.advance(now - last_tick)
+        last_tick = now
 
         # --- Update dependent states (ensure consistency) ---
         panel._update_dependent_states()
+        snapshot = panel.evaluate() # Everything the renderer reads, solved once per tick
+        profiler.stop('update', start)
 
-        # --- Drawing ---
-        draw_schematic(screen, panel)
+        # --- Drawing (only sections whose state changed) ---
+        start = profiler.start()
+        dirty_rects = renderer.render(snapshot)
         # draw_buttons(screen) # Draw the buttons
+        profiler.stop('render', start)
+        if profiler.enabled:
+            dirty_rects.append(draw_profile_overlay(screen, profiler))
 
         # --- Update Display ---
-        pygame.display.flip()
+        start = profiler.start()
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+        profiler.stop('display', start)
+        profiler.end_frame()
 
         # --- Frame Rate Control ---
-        clock.tick(FPS)
+        if not idle:
+            clock.tick(FPS)
 
+    if scenario_file is not None:
+        scenario_file.close()
     pygame.quit()
     sys.exit()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main(scenario=sys.argv[1] if len(sys.argv) > 1 else None)
\ No newline at end of file
@@ -0,0 +1,172 @@
+import time
+from collections import deque
+
+from panel_state import (
+    FIELDS, ENUM_FIELDS, LAYOUT, INITIAL_BITS, DIRECT_TRIP_FLAGS, PanelState,
+)
+from panel_logic import DERIVATIONS, SwitchgearPanel
+
+# --- Action Table ---
+# (name, method, args, guard). Completion steps (finish_*) are only offered while
+# their operation is in flight, the way the main loop would schedule them.
+PT_PHASES = ('R', 'Y', 'B')
+
+def _closing(s):
+    return s['breaker_state'] == 'CLOSING'
+
+def _direct_tripping(flag):
+    return lambda s: s['breaker_state'] == 'TRIPPING' and s[flag]
+
+def _protection_tripping(s):
+    return s['breaker_state'] == 'TRIPPING' and s['trip_signal_protection']
+
+ACTIONS = (
+    [('reset_simulation', 'reset_simulation', (), None),
+     ('attempt_close', 'attempt_close', (), None),
+     ('finish_close', 'finish_close', (), _closing),
+     ('initiate_protection_trip', 'initiate_protection_trip', (), None),
+     ('finish_protection_trip', 'finish_protection_trip', (), _protection_tripping),
+     ('reset_k86', 'reset_k86', (), None),
+     ('toggle_dc', 'toggle_dc', (), None),
+     ('toggle_tc_healthy', 'toggle_tc_healthy', (), None),
+     ('toggle_k1', 'toggle_k1', (), None),
+     ('end_k1_pulse', 'end_k1_pulse', (), None),
+     ('toggle_service_pos', 'toggle_service_pos', (), None),
+     ('toggle_bus_earth', 'toggle_bus_earth', (), None),
+     ('toggle_bus_v_healthy', 'toggle_bus_v_healthy', (), None),
+     ('toggle_buscoupler_interlock', 'toggle_buscoupler_interlock', (), None)]
+    + [(f'initiate_direct_trip {flag}', 'initiate_direct_trip', (flag, flag), None)
+       for flag in DIRECT_TRIP_FLAGS]
+    + [(f'finish_direct_trip {flag}', 'finish_direct_trip', (flag,), _direct_tripping(flag))
+       for flag in DIRECT_TRIP_FLAGS]
+    + [(f'toggle_pt_fail {phase}', 'toggle_pt_fail', (phase,), None) for phase in PT_PHASES]
+)
+
+# --- Safety Invariants ---
+VIOLATIONS = {
+    'closed_with_k86_latched': lambda s: s['breaker_state'] == 'CLOSED' and s['k86_state'] == 'LATCHED',
+    'moving_without_operation': lambda s: (s['breaker_state'] in ('CLOSING', 'TRIPPING')
+                                           and not s['operation_in_progress']),
+    'close_command_without_k1': lambda s: s['remote_close_command_active'] and not s['k1_relay_energized'],
+    'closing_without_dc': lambda s: s['breaker_state'] == 'CLOSING' and not s['dc_ok'],
+}
+
+# Fields computed by _update_dependent_states(); the rest are independent inputs.
+INPUT_FIELDS = tuple(f for f in FIELDS if f not in DERIVATIONS)
+
+# (bits, action name) -> next bits, shared by every exploration in the process
+_transition_cache = {}
+
+
+def transition(panel, bits, action):
+    """Applies one action to the packed state and returns the packed result."""
+    key = (bits, action[0])
+    next_bits = _transition_cache.get(key)
+    if next_bits is None:
+        panel.restore(bits)
+        getattr(panel, action[1])(*action[2])
+        next_bits = _transition_cache[key] = panel.snapshot()
+    return next_bits
+
+def input_key(bits):
+    """Projects a packed state onto its independent input fields."""
+    key = 0
+    for field in INPUT_FIELDS:
+        shift, mask, _ = LAYOUT[field]
+        key = (key << mask.bit_length()) | ((bits >> shift) & mask)
+    return key
+
+
+class ExplorationResult:
+    """ Outcome of an exhaustive exploration, with states as packed ints. """
+    def __init__(self, initial, edges, elapsed):
+        self.initial = initial
+        self.edges = edges # bits -> {action name: next bits}
+        self.elapsed = elapsed
+        self.reachable = set(edges)
+        self.dead_ends = [b for b, out in edges.items() if all(n == b for n in out.values())]
+        self.violations = {}
+        for name, predicate in VIOLATIONS.items():
+            hits = [b for b in edges if predicate(PanelState(b))]
+            if hits:
+                self.violations[name] = hits
+        self.cannot_return = self._cannot_reach(initial)
+
+    def _cannot_reach(self, target):
+        reverse = {b: set() for b in self.edges}
+        for b, out in self.edges.items():
+            for n in out.values():
+                reverse[n].add(b)
+        seen, queue = {target}, deque([target])
+        while queue:
+            for prev in reverse[queue.popleft()]:
+                if prev not in seen:
+                    seen.add(prev)
+                    queue.append(prev)
+        return [b for b in self.edges if b not in seen]
+
+    def unreachable_input_count(self):
+        """Number of input-field combinations that no action sequence reaches."""
+        total = 1
+        for field in INPUT_FIELDS:
+            total *= len(ENUM_FIELDS[field]) if field in ENUM_FIELDS else 2
+        return total - len({input_key(b) for b in self.reachable})
+
+    def path_to(self, target):
+        """Shortest action sequence from the initial state to target."""
+        parents, queue = {self.initial: None}, deque([self.initial])
+        while queue:
+            bits = queue.popleft()
+            if bits == target:
+                path = []
+                while parents[bits] is not None:
+                    bits, name = parents[bits]
+                    path.append(name)
+                return path[::-1]
+            for name, n in self.edges[bits].items():
+                if n not in parents:
+                    parents[n] = (bits, name)
+                    queue.append(n)
+        return None
+
+    def report(self):
+        lines = [
+            f"Reachable states: {len(self.reachable)} (explored in {self.elapsed:.2f} s)",
+            f"Transitions: {sum(len(out) for out in self.edges.values())}",
+            f"Unreachable input combinations: {self.unreachable_input_count()}",
+            f"Dead-end states: {len(self.dead_ends)}",
+            f"States that cannot return to initial: {len(self.cannot_return)}",
+        ]
+        if not self.violations:
+            lines.append("Violations: none")
+        for name, hits in self.violations.items():
+            lines.append(f"Violation {name}: {len(hits)} states, e.g. via {self.path_to(hits[0])}")
+        return "\n".join(lines)
+
+
+def explore(actions=ACTIONS, initial=INITIAL_BITS):
+    """Breadth-first search over every state reachable from initial."""
+    start = time.perf_counter()
+    panel = SwitchgearPanel()
+    edges = {}
+    queue = deque([initial])
+    edges[initial] = None
+    while queue:
+        bits = queue.popleft()
+        out = {}
+        state = PanelState(bits)
+        for action in actions:
+            guard = action[3]
+            if guard is not None and not guard(state):
+                continue
+            next_bits = transition(panel, bits, action)
+            out[action[0]] = next_bits
+            if next_bits not in edges:
+                edges[next_bits] = None
+                queue.append(next_bits)
+        edges[bits] = out
+    return ExplorationResult(initial, edges, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    print(explore().report())
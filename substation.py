@@ -0,0 +1,183 @@
+from collections import deque
+
+from panel_logic import SwitchgearPanel
+from scheduler import DEFAULT_TIMINGS
+
+
+# --- Bus Coupler Panel ---
+class BusCouplerPanel(SwitchgearPanel):
+    """ Bus section coupler. Same control scheme as an incomer, with K86 acting
+    as the 86BC lockout, plus the buscoupler.html checkBCCloseConditions rule
+    that a live source (a closed incomer on either bus) must exist. """
+    def __init__(self, scheduler=None, panel_id=0, timings=DEFAULT_TIMINGS):
+        self.live_source = False # Set by the Substation before super() runs updates
+        super().__init__(scheduler, panel_id, timings)
+        self.trip_select = None # Incomer name tripped on a make-before-break changeover
+
+    def check_closing_interlocks(self):
+        return self.live_source and super().check_closing_interlocks()
+
+
+# --- Substation ---
+class Substation:
+    """ N incomers and M bus couplers on numbered bus sections.
+
+    Cross-panel wiring, re-evaluated only for the bus groups (sections joined by
+    CLOSED couplers) touched by a breaker status change:
+      * Incomer B/C NC (buscoupler_interlock_closed): open while another incomer
+        is CLOSED in the same bus group, so closing would parallel two sources.
+      * Coupler live source: a CLOSED incomer on either side.
+      * Bus earthed: clears bus_not_earthed on every panel on that section.
+      * B/C KT (trip_signal_kt): when a coupler closes onto two live groups, the
+        coupler's trip_select incomer (default: all but the first) is tripped.
+      * B/C Sync (trip_signal_sync): an incomer that closes into a group already
+        fed by another incomer is tripped.
+    """
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+        self.panels = {} # name -> panel
+        self.incomer_bus = {} # incomer name -> bus
+        self.coupler_buses = {} # coupler name -> (bus_a, bus_b)
+        self.bus_incomers = [] # bus -> [incomer names]
+        self.bus_couplers = [] # bus -> [coupler names]
+        self.bus_earthed = []
+        self._incomer_order = {} # incomer name -> index, for the default KT target
+        self._changes = [] # (panel name, became CLOSED) since the last propagate()
+        self._propagate_pending = False
+
+    @classmethod
+    def linear(cls, n_incomers, scheduler=None):
+        """One bus section per incomer, adjacent sections joined by couplers."""
+        substation = cls(scheduler)
+        for i in range(n_incomers):
+            substation.add_incomer(substation.add_bus())
+        for i in range(n_incomers - 1):
+            substation.add_bus_coupler(i, i + 1)
+        substation.propagate()
+        return substation
+
+    def add_bus(self):
+        self.bus_incomers.append([])
+        self.bus_couplers.append([])
+        self.bus_earthed.append(False)
+        return len(self.bus_earthed) - 1
+
+    def _register(self, name, panel):
+        self.panels[name] = panel
+        panel.subscribe(lambda p, changed: self._on_breaker_change(name), fields=('breaker_state',))
+        self._changes.append((name, False)) # Evaluate its interlocks on the next propagate()
+
+    def add_incomer(self, bus, name=None):
+        name = name or f"IC{len(self.incomer_bus) + 1}"
+        panel = SwitchgearPanel(self.scheduler, len(self.panels))
+        self.incomer_bus[name] = bus
+        self._incomer_order[name] = len(self._incomer_order)
+        self.bus_incomers[bus].append(name)
+        self._register(name, panel)
+        return panel
+
+    def add_bus_coupler(self, bus_a, bus_b, name=None):
+        name = name or f"BC{len(self.coupler_buses) + 1}"
+        panel = BusCouplerPanel(self.scheduler, len(self.panels))
+        self.coupler_buses[name] = (bus_a, bus_b)
+        self.bus_couplers[bus_a].append(name)
+        self.bus_couplers[bus_b].append(name)
+        self._register(name, panel)
+        return panel
+
+    # --- Change Handling ---
+    def _on_breaker_change(self, name):
+        self._changes.append((name, self.panels[name].state['breaker_state'] == 'CLOSED'))
+        if self.scheduler is not None and not self._propagate_pending:
+            # Deferred: the notifying panel is still inside finish_close/finish_*_trip
+            self._propagate_pending = True
+            self.scheduler.schedule(0, self.propagate)
+
+    def act(self, name, method, *args):
+        """Calls a panel action and propagates the resulting changes."""
+        result = getattr(self.panels[name], method)(*args)
+        self.propagate()
+        return result
+
+    def set_bus_earthed(self, bus, earthed):
+        self.bus_earthed[bus] = earthed
+        for name in self.bus_incomers[bus]:
+            self._set_input(name, 'bus_not_earthed', not earthed)
+        for name in self.bus_couplers[bus]:
+            a, b = self.coupler_buses[name]
+            self._set_input(name, 'bus_not_earthed', not (self.bus_earthed[a] or self.bus_earthed[b]))
+
+    def _set_input(self, name, field, value):
+        panel = self.panels[name]
+        if panel.state[field] != value:
+            panel.state[field] = value
+            panel._update_dependent_states()
+
+    def bus_group(self, bus):
+        """Bus sections connected to bus through CLOSED couplers."""
+        group, queue = {bus}, deque([bus])
+        while queue:
+            for name in self.bus_couplers[queue.popleft()]:
+                if self.panels[name].state['breaker_state'] != 'CLOSED':
+                    continue
+                for other in self.coupler_buses[name]:
+                    if other not in group:
+                        group.add(other)
+                        queue.append(other)
+        return group
+
+    def _closed_incomers(self, group):
+        return [name for bus in group for name in self.bus_incomers[bus]
+                if self.panels[name].state['breaker_state'] == 'CLOSED']
+
+    def propagate(self):
+        """Re-evaluates the cross-panel interlocks of the bus groups touched by
+        breaker changes since the last call, then issues KT / Sync trips."""
+        self._propagate_pending = False
+        changes, self._changes = self._changes, []
+        if not changes:
+            return 0
+        groups = {} # bus -> frozenset group, shared by every bus of the group
+        closed_in = {} # group -> closed incomers, scanned once per propagate()
+        def group_of(bus):
+            if bus not in groups:
+                group = frozenset(self.bus_group(bus))
+                for member in group:
+                    groups[member] = group
+            return groups[bus]
+        def closed_of(bus):
+            group = group_of(bus)
+            if group not in closed_in:
+                closed_in[group] = self._closed_incomers(group)
+            return closed_in[group]
+
+        trips = []
+        for name, became_closed in changes:
+            if name in self.incomer_bus:
+                closed = closed_of(self.incomer_bus[name]) # Also marks the group for re-evaluation
+                if became_closed and len(closed) > 1:
+                    trips.append((name, 'trip_signal_sync', 'B/C Sync'))
+            else:
+                a, b = self.coupler_buses[name]
+                group_of(b)
+                closed = closed_of(a)
+                if became_closed and len(closed) > 1:
+                    target = self.panels[name].trip_select
+                    targets = [target] if target in closed else sorted(closed, key=self._incomer_order.get)[1:]
+                    trips.extend((t, 'trip_signal_kt', 'B/C KT') for t in targets)
+
+        updated = 0
+        for group in set(groups.values()):
+            closed = set(closed_of(next(iter(group))))
+            for bus in group:
+                for name in self.bus_incomers[bus]:
+                    others = len(closed) - (name in closed)
+                    self._set_input(name, 'buscoupler_interlock_closed', others == 0)
+                    updated += 1
+                for name in self.bus_couplers[bus]:
+                    a, b = self.coupler_buses[name]
+                    self.panels[name].live_source = bool(closed_of(a) or closed_of(b))
+                    updated += 1
+        for name, flag, reason in trips:
+            self.panels[name].initiate_direct_trip(flag, reason)
+        return updated
@@ -0,0 +1,356 @@
+import os
+import json
+import time
+import random
+import argparse
+from array import array
+
+import numpy as np
+
+from panel_state import FIELDS, LAYOUT, STATE_BITS, ENUM_FIELDS, DIRECT_TRIP_FLAGS, encode_value
+from scheduler import EventScheduler
+from panel_logic import SwitchgearPanel
+
+# --- Trace Format ---
+# A trace is a directory of raw little-endian column files, one row per
+# event, plus meta.json. Rows are appended in time order, so the time
+# column is sorted and time ranges are found by bisection.
+#   time.bin   float64  virtual time of the event
+#   panel.bin  uint32   panel_id
+#   code.bin   uint16   event code (EVENT_NAMES)
+#   bits.bin   uint32   packed PanelState after the event
+# <column>.index holds the row numbers grouped by key (ascending within a
+# key) and <column>.offsets where each key's group starts, for the code and
+# panel columns.
+COLUMNS = {
+    'time': ('<f8', 'd'),
+    'panel': ('<u4', 'I'),
+    'code': ('<u2', 'H'),
+    'bits': ('<u4' if STATE_BITS <= 32 else '<u8', 'I' if STATE_BITS <= 32 else 'Q'),
+}
+INDEXED = ('code', 'panel')
+META = 'meta.json'
+
+# --- Event Codes ---
+# One code per (field, new value): a settled state change emits one event
+# per changed field, e.g. 'breaker_state=CLOSED', 'trip_signal_bf=True',
+# 'k86_state=LATCHED'.
+EVENT_NAMES = []
+_CODE_BASE = {} # field -> code of its value 0
+for _field in FIELDS:
+    _CODE_BASE[_field] = len(EVENT_NAMES)
+    EVENT_NAMES.extend(f'{_field}={v}' for v in ENUM_FIELDS.get(_field, (False, True)))
+EVENT_NAMES = tuple(EVENT_NAMES)
+
+def event_code(field, value):
+    """Code of the event 'field became value'."""
+    return _CODE_BASE[field] + encode_value(field, value)
+
+# (field mask, shift, value mask, code of value 0) per field, for the recorder
+_FIELD_EVENTS = tuple((mask << shift, shift, mask, _CODE_BASE[field])
+                      for field, (shift, mask, _) in LAYOUT.items())
+
+def _layout():
+    return {field: [shift, mask] for field, (shift, mask, _) in LAYOUT.items()}
+
+def _map(path, dtype, rows, mode='r'):
+    if not rows: # np.memmap cannot map an empty file
+        return np.empty(0, dtype)
+    return np.memmap(path, dtype, mode, shape=(rows,))
+
+
+# --- Writer ---
+class TraceWriter:
+    """ Appends panel events to a trace directory (created or extended).
+
+    attach() subscribes to panels and records one row per changed field of
+    every settled state change, stamped with the panel's virtual clock.
+    append_many() takes whole columns, e.g. from a batch run. Rows are
+    buffered and written with one write per column; meta.json is replaced
+    after each flush, so a TraceStore opened meanwhile sees whole rows only.
+    close() builds the code and panel indexes.
+    """
+    def __init__(self, path, buffer_rows=1 << 16):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['layout'] != _layout() or meta['events'] != list(EVENT_NAMES):
+                raise ValueError(f"{path} was written with a different state layout")
+            self.rows, self.indexed_rows = meta['rows'], meta['indexed_rows']
+        else:
+            self.rows = self.indexed_rows = 0
+        self.buffer_rows = buffer_rows
+        self._files = {}
+        for name in COLUMNS:
+            f = open(os.path.join(path, f'{name}.bin'), 'r+b' if self.rows else 'wb')
+            f.truncate(self.rows * np.dtype(COLUMNS[name][0]).itemsize) # Drops rows written after the last flush
+            f.seek(0, os.SEEK_END)
+            self._files[name] = f
+        self._buffers = {name: array(typecode) for name, (_, typecode) in COLUMNS.items()}
+        self._panels = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def attach(self, panels):
+        for panel in panels:
+            self._panels.append((panel, panel.subscribe(self._on_change)))
+
+    def _on_change(self, panel, changed):
+        bits = panel.state.bits
+        when = panel.scheduler.now if panel.scheduler is not None else time.monotonic()
+        buffers = self._buffers
+        for field_mask, shift, mask, base in _FIELD_EVENTS:
+            if changed & field_mask:
+                buffers['time'].append(when)
+                buffers['panel'].append(panel.panel_id)
+                buffers['code'].append(base + ((bits >> shift) & mask))
+                buffers['bits'].append(bits)
+        if len(buffers['time']) >= self.buffer_rows:
+            self.flush()
+
+    def append_many(self, times, panels, codes, bits):
+        """Appends whole columns (array-likes of equal length)."""
+        self.flush()
+        columns = {'time': times, 'panel': panels, 'code': codes, 'bits': bits}
+        rows = len(times)
+        for name, values in columns.items():
+            values = np.ascontiguousarray(values, COLUMNS[name][0])
+            if len(values) != rows:
+                raise ValueError("columns differ in length")
+            self._files[name].write(memoryview(values).cast('B'))
+        self.rows += rows
+        self._write_meta()
+
+    def flush(self):
+        buffers = self._buffers
+        rows = len(buffers['time'])
+        if rows:
+            for name, buffer in buffers.items():
+                self._files[name].write(buffer.tobytes())
+                del buffer[:]
+            self.rows += rows
+        for f in self._files.values():
+            f.flush()
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {'rows': self.rows, 'indexed_rows': self.indexed_rows, 'layout': _layout(),
+                'events': list(EVENT_NAMES), 'columns': {name: dtype for name, (dtype, _) in COLUMNS.items()}}
+        temp = os.path.join(self.path, META + '.tmp')
+        with open(temp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp, os.path.join(self.path, META))
+
+    def build_indexes(self, chunk_rows=1 << 24):
+        self.flush()
+        for name in INDEXED:
+            dtype = COLUMNS[name][0]
+            column = _map(os.path.join(self.path, f'{name}.bin'), dtype, self.rows)
+            _build_index(column, os.path.join(self.path, name), chunk_rows)
+        self.indexed_rows = self.rows
+        self._write_meta()
+
+    def close(self):
+        for panel, callback in self._panels:
+            panel.unsubscribe(callback)
+        self._panels = []
+        self.flush() # Buffered rows only count once written
+        if self.indexed_rows != self.rows:
+            self.build_indexes()
+        for f in self._files.values():
+            f.close()
+
+def _build_index(column, base, chunk_rows):
+    """Counting sort of the row numbers by key, one chunk of rows in memory at a time."""
+    rows = len(column)
+    keys = 0
+    for start in range(0, rows, chunk_rows):
+        keys = max(keys, int(column[start:start + chunk_rows].max()) + 1)
+    counts = np.zeros(keys, np.int64)
+    for start in range(0, rows, chunk_rows):
+        counts += np.bincount(column[start:start + chunk_rows], minlength=keys)
+    offsets = np.zeros(keys + 1, np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    offsets.tofile(base + '.offsets')
+    index = _map(base + '.index', np.int64, rows, 'w+')
+    cursor = offsets[:-1].copy()
+    for start in range(0, rows, chunk_rows):
+        block = np.asarray(column[start:start + chunk_rows])
+        order = np.argsort(block, kind='stable')
+        bounds = np.searchsorted(block[order], np.arange(keys + 1))
+        for key in np.flatnonzero(np.diff(bounds)):
+            a, b = bounds[key], bounds[key + 1]
+            index[cursor[key]:cursor[key] + b - a] = order[a:b] + start
+            cursor[key] += b - a
+    if rows:
+        index.flush()
+
+
+# --- Reader ---
+class TraceStore:
+    """ Read-only, memory-mapped view of a trace directory.
+
+    The columns (time, panel, code, bits) are np.memmap arrays; select()
+    returns ascending row numbers, as a zero-copy slice of an index where
+    one index answers the query. Rows appended after the indexes were built
+    are found by scanning only that tail. Field values are decoded from the
+    bits column with field() / where(), e.g. every breaker-failure trip
+    while DC was healthy:
+
+        rows = store.select(code=event_code('trip_signal_bf', True))
+        rows = store.where(rows, dc_ok=True)
+        store.time[rows], store.panel[rows]
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META)) as f:
+            meta = json.load(f)
+        if meta['layout'] != _layout() or meta['events'] != list(EVENT_NAMES):
+            raise ValueError(f"{path} was written with a different state layout")
+        self.rows, self.indexed_rows = meta['rows'], meta['indexed_rows']
+        for name, (dtype, _) in COLUMNS.items():
+            setattr(self, name, _map(os.path.join(path, f'{name}.bin'), dtype, self.rows))
+        self._indexes = {}
+        if self.indexed_rows:
+            for name in INDEXED:
+                base = os.path.join(path, name)
+                self._indexes[name] = (np.fromfile(base + '.offsets', np.int64),
+                                       _map(base + '.index', np.int64, self.indexed_rows))
+
+    def __len__(self):
+        return self.rows
+
+    def time_range(self, start=None, end=None):
+        """Slice of the rows with start <= time <= end."""
+        lo = 0 if start is None else int(np.searchsorted(self.time, start, 'left'))
+        hi = self.rows if end is None else int(np.searchsorted(self.time, end, 'right'))
+        return slice(lo, hi)
+
+    def _rows(self, name, key):
+        """Rows whose column name equals key: index slice + scan of the unindexed tail."""
+        indexed = self.indexed_rows
+        if name in self._indexes:
+            offsets, index = self._indexes[name]
+            rows = index[offsets[key]:offsets[key + 1]] if key + 1 < len(offsets) else index[:0]
+        else:
+            rows = np.empty(0, np.int64)
+        if indexed < self.rows:
+            tail = np.flatnonzero(getattr(self, name)[indexed:] == key) + indexed
+            rows = np.concatenate((rows, tail))
+        return rows
+
+    def select(self, code=None, panel=None, start=None, end=None):
+        """Row numbers (ascending) matching an event code and / or a panel id
+        within a time range."""
+        span = self.time_range(start, end)
+        if code is None and panel is None:
+            return np.arange(span.start, span.stop)
+        by_code = self._rows('code', code) if code is not None else None
+        by_panel = self._rows('panel', panel) if panel is not None else None
+        if by_code is not None and by_panel is not None:
+            # Filter the smaller group on the other column
+            if len(by_code) <= len(by_panel):
+                rows = by_code[self.panel[by_code] == panel]
+            else:
+                rows = by_panel[self.code[by_panel] == code]
+        else:
+            rows = by_code if by_code is not None else by_panel
+        if span.start or span.stop < self.rows:
+            rows = rows[np.searchsorted(rows, span.start):np.searchsorted(rows, span.stop)]
+        return rows
+
+    def field(self, name, rows=slice(None)):
+        """Codes of one state field (panel_state.encode_value) at the given rows."""
+        shift, mask, _ = LAYOUT[name]
+        return (self.bits[rows] >> shift) & mask
+
+    def where(self, rows, **values):
+        """The rows whose state matches every field=value."""
+        keep = np.ones(len(rows), bool)
+        bits = self.bits[rows]
+        for name, value in values.items():
+            shift, mask, _ = LAYOUT[name]
+            keep &= ((bits >> shift) & mask) == encode_value(name, value)
+        return rows[keep]
+
+    def counts(self, rows=slice(None)):
+        """Event name -> number of rows, over the given rows."""
+        counts = np.bincount(self.code[rows], minlength=len(EVENT_NAMES))
+        return {EVENT_NAMES[c]: int(n) for c, n in enumerate(counts) if n}
+
+
+# --- Recording ---
+def record(path, panels=100, seconds=3600.0, step=0.1, seed=0):
+    """Random operator / protection activity on many panels, traced to path."""
+    rng = random.Random(seed)
+    scheduler = EventScheduler()
+    fleet = [SwitchgearPanel(scheduler, i) for i in range(panels)]
+    actions = (lambda p: p.toggle_k1(), lambda p: p.toggle_k1(), lambda p: p.reset_k86(),
+               lambda p: p.initiate_protection_trip(), lambda p: p.toggle_dc(),
+               lambda p: p.initiate_direct_trip(flag := rng.choice(DIRECT_TRIP_FLAGS), flag))
+    with TraceWriter(path) as writer:
+        writer.attach(fleet)
+        while scheduler.now < seconds:
+            for _ in range(max(1, panels // 10)):
+                rng.choice(actions)(rng.choice(fleet))
+            scheduler.advance(step)
+            for panel in fleet:
+                panel._update_dependent_states()
+    return writer.rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Columnar memory-mapped trace of panel events.")
+    sub = parser.add_subparsers(dest='mode', required=True)
+    rec = sub.add_parser('record', help="trace a random run of many panels")
+    rec.add_argument('path')
+    rec.add_argument('--panels', type=int, default=100)
+    rec.add_argument('--seconds', type=float, default=3600.0)
+    query = sub.add_parser('query', help="example queries over a trace")
+    query.add_argument('path')
+    bench = sub.add_parser('bench', help="grow a recorded trace to --rows and time the queries")
+    bench.add_argument('path')
+    bench.add_argument('--rows', type=float, default=1e8)
+    args = parser.parse_args()
+
+    if args.mode == 'record':
+        start = time.perf_counter()
+        rows = record(args.path, args.panels, args.seconds)
+        print(f"{rows:,} events in {time.perf_counter() - start:.2f} s")
+    elif args.mode == 'bench':
+        # Repeats the recorded rows, shifted in time, until the trace holds --rows rows
+        store = TraceStore(args.path)
+        block = {name: np.array(getattr(store, name)) for name in COLUMNS}
+        span = float(block['time'][-1]) + 1.0
+        start = time.perf_counter()
+        with TraceWriter(args.path) as writer:
+            shift = span
+            while writer.rows < args.rows:
+                writer.append_many(block['time'] + shift, block['panel'], block['code'], block['bits'])
+                shift += span
+            appended = time.perf_counter() - start
+        print(f"{writer.rows:,} rows: appended in {appended:.1f} s, "
+              f"indexed in {time.perf_counter() - start - appended:.1f} s")
+
+    store = TraceStore(args.path)
+    queries = {
+        '50BF trips while DC OK': lambda: store.where(store.select(code=event_code('trip_signal_bf', True)), dc_ok=True),
+        'breaker CLOSING -> CLOSED': lambda: store.select(code=event_code('breaker_state', 'CLOSED')),
+        'K86 latches, panel 7': lambda: store.select(code=event_code('k86_state', 'LATCHED'), panel=7),
+        'K86 resets, last 10 %': lambda: store.select(code=event_code('k86_state', 'RESET'),
+                                                       start=float(store.time[int(len(store) * 0.9)])),
+        'scan: trips with K1 energized': lambda: np.flatnonzero(
+            (store.code == event_code('breaker_state', 'TRIPPING')) & (store.field('k1_relay_energized') == 1)),
+    }
+    print(f"{len(store):,} rows in {args.path}")
+    for name, run in queries.items():
+        start = time.perf_counter()
+        rows = run()
+        print(f"  {name:<32} {len(rows):>12,} rows in {(time.perf_counter() - start) * 1000:9.1f} ms")
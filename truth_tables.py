@@ -0,0 +1,89 @@
+import timeit
+import itertools
+
+from panel_state import INITIAL_BITS, fields_mask
+from panel_logic import DERIVATIONS, SwitchgearPanel
+
+# --- Table Inputs / Outputs ---
+DERIVED_OUTPUTS = tuple(DERIVATIONS)
+DERIVED_INPUTS = tuple(dict.fromkeys(f for inputs, _ in DERIVATIONS.values() for f in inputs
+                                     if f not in DERIVATIONS))
+INTERLOCK_INPUTS = ('dc_ok', 'ktc_state', 'k1_state', 'breaker_in_service', 'bus_not_earthed',
+                    'bus_voltage_healthy', 'buscoupler_interlock_closed', 'k86_state',
+                    'k94_state', 'breaker_state', 'spring_charged')
+
+def submasks(mask):
+    """Yields every bit pattern that only uses bits of mask."""
+    sub = mask
+    while True:
+        yield sub
+        if sub == 0:
+            return
+        sub = (sub - 1) & mask
+
+DERIVED_INPUT_MASK = fields_mask(DERIVED_INPUTS)
+DERIVED_OUTPUT_MASK = fields_mask(DERIVED_OUTPUTS)
+INTERLOCK_MASK = fields_mask(INTERLOCK_INPUTS)
+
+
+def build_tables():
+    """Evaluates the reference SwitchgearPanel logic for every input pattern."""
+    panel = SwitchgearPanel()
+    base = INITIAL_BITS & ~(DERIVED_INPUT_MASK | DERIVED_OUTPUT_MASK | INTERLOCK_MASK)
+    derived, interlocks = {}, {}
+    for pattern in submasks(DERIVED_INPUT_MASK):
+        panel.restore(base | pattern)
+        panel._update_dependent_states()
+        derived[pattern] = panel.snapshot() & DERIVED_OUTPUT_MASK
+    for pattern in submasks(INTERLOCK_MASK):
+        panel.restore(base | pattern)
+        interlocks[pattern] = panel.check_closing_interlocks()
+    return derived, interlocks
+
+# Built once at import time
+DERIVED_TABLE, INTERLOCK_TABLE = build_tables()
+
+
+# --- Opt-in Table-Driven Panel ---
+class TruthTablePanel(SwitchgearPanel):
+    """ SwitchgearPanel whose derived relay states and closing permissive are
+    single lookups in the precomputed tables instead of dict walks. """
+    def _update_dependent_states(self):
+        bits = self.state.bits
+        if bits == self._settled_bits:
+            return
+        self.state.restore((bits & ~DERIVED_OUTPUT_MASK) | DERIVED_TABLE[bits & DERIVED_INPUT_MASK])
+        self._notify_changes()
+
+    def check_closing_interlocks(self):
+        return INTERLOCK_TABLE[self.state.bits & INTERLOCK_MASK]
+
+
+# --- Micro-benchmark ---
+DC_LOST_BITS = INITIAL_BITS ^ fields_mask(('dc_ok',)) # Derived fields stale until updated
+
+def _alternating_call(panel, name):
+    """Calls panel.<name>() with DC alternately healthy and lost, so the
+    incremental update always has something to recompute."""
+    method, restore = getattr(panel, name), panel.restore
+    states = itertools.cycle((INITIAL_BITS, DC_LOST_BITS)).__next__
+    def call():
+        restore(states())
+        method()
+    return call
+
+def benchmark(number=200000):
+    """Per-call time (ns) of the dict-walking and table-driven checks."""
+    reference, table = SwitchgearPanel(), TruthTablePanel()
+    results = {}
+    for name in ('_update_dependent_states', 'check_closing_interlocks'):
+        ref_ns = min(timeit.repeat(_alternating_call(reference, name), number=number, repeat=5)) / number * 1e9
+        tab_ns = min(timeit.repeat(_alternating_call(table, name), number=number, repeat=5)) / number * 1e9
+        results[name] = (ref_ns, tab_ns)
+    return results
+
+
+if __name__ == '__main__':
+    print(f"Tables: {len(DERIVED_TABLE)} derived entries, {len(INTERLOCK_TABLE)} interlock entries")
+    for name, (ref_ns, tab_ns) in benchmark().items():
+        print(f"{name}: dict {ref_ns:.0f} ns, table {tab_ns:.0f} ns ({ref_ns / tab_ns:.1f}x)")